@@ -5,69 +5,108 @@ Comprehensive Evaluation Runner for GraphRAG vs Traditional RAG comparison
 import asyncio
 import json
 import logging
+import random
 import time
 from datetime import datetime
 from typing import Dict, List, Optional
-import requests
+import httpx
 from pathlib import Path
 
 from evaluation_queries import get_all_queries, get_query_count
 from evaluation_metrics import EvaluationAnalyzer
+from evaluation_log import EvaluationLog, open_evaluation_log, new_run_id, query_hash
 from models import EvaluationRequest
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Responses worth retrying: rate limited or a transient server/gateway failure
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
 class ComprehensiveEvaluationRunner:
-    """Runner for comprehensive GraphRAG vs Traditional RAG evaluation"""
+    """Runner for comprehensive GraphRAG vs Traditional RAG evaluation
+
+    Queries run as independent asyncio tasks on one httpx.AsyncClient. A
+    semaphore bounds the number of requests in flight to max_concurrent, and
+    each query holds a slot only for the duration of a single request, so the
+    compare call for one query overlaps with the judge call for another.
+    """
     
-    def __init__(self, base_url: str = "http://localhost:8000", max_concurrent: int = 5):
+    def __init__(self, base_url: str = "http://localhost:8000", max_concurrent: int = 5,
+                 request_timeout: float = 120.0, max_retries: int = 3):
         self.base_url = base_url
         self.max_concurrent = max_concurrent
-        self.session = requests.Session()
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        self.client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
         self.results = []
         self.failed_queries = []
         self.analyzer = EvaluationAnalyzer()
         
-        # Rate limiting
-        self.request_delay = 2  # seconds between requests
-        self.last_request_time = 0
+        # Every finished query is appended to the run log as it completes
+        self.log: Optional[EvaluationLog] = None
+        self.run_id: Optional[str] = None
+        self.progress_every = 10
+    
+    def _create_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(self.request_timeout, connect=10.0),
+            limits=httpx.Limits(max_connections=self.max_concurrent,
+                                max_keepalive_connections=self.max_concurrent)
+        )
+    
+    async def run_comprehensive_evaluation(self, output_dir: str = "evaluation_results",
+                                           run_id: Optional[str] = None, resume: bool = False) -> Dict:
+        """Run comprehensive evaluation with all queries
         
-    async def run_comprehensive_evaluation(self, output_dir: str = "evaluation_results") -> Dict:
-        """Run comprehensive evaluation with all queries"""
+        With resume=True, continues run_id (default: the latest run in the log)
+        and only evaluates queries that have no successful result in it yet.
+        """
         logger.info("Starting comprehensive GraphRAG vs Traditional RAG evaluation")
         
         # Get all evaluation queries
         queries = get_all_queries()
         total_queries = len(queries)
         
-        logger.info(f"Total queries to evaluate: {total_queries}")
-        
         # Create output directory
         output_path = Path(output_dir)
         output_path.mkdir(exist_ok=True)
         
-        # Run evaluations in batches to avoid overwhelming the API
-        batch_size = 10
+        self.log = open_evaluation_log(output_dir)
+        self.run_id = None
+        done: Dict[str, Dict] = {}
+        if resume:
+            self.run_id = run_id or self.log.latest_run_id()
+            if self.run_id is None:
+                logger.info("Nothing to resume; starting a new run")
+            else:
+                done = self.log.completed(self.run_id)
+        if self.run_id is None:
+            self.run_id = run_id or new_run_id()
+        
+        pending = [query_data for query_data in queries if query_hash(query_data['query']) not in done]
+        logger.info(f"Run {self.run_id}: {len(pending)} of {total_queries} queries to evaluate "
+                    f"({len(done)} already complete, max {self.max_concurrent} requests in flight)")
+        logger.info(f"Appending results to {self.log.path}")
+        
+        start = time.perf_counter()
         completed = 0
         
-        for i in range(0, total_queries, batch_size):
-            batch = queries[i:i + batch_size]
-            logger.info(f"Processing batch {i//batch_size + 1}/{(total_queries + batch_size - 1)//batch_size}")
-            
-            # Process batch
-            batch_results = await self._process_batch(batch)
-            self.results.extend(batch_results)
+        async for index, result in self._evaluate_concurrently(pending):
+            completed += 1
+            if result:
+                done[query_hash(result['query'])] = result
             
-            completed += len(batch_results)
-            logger.info(f"Completed {completed}/{total_queries} queries ({completed/total_queries:.1%})")
-            
-            # Save intermediate results
-            self._save_intermediate_results(output_path, completed)
-            
-            # Small delay between batches
-            await asyncio.sleep(1)
+            if completed % self.progress_every == 0 or completed == len(pending):
+                elapsed = time.perf_counter() - start
+                logger.info(f"Completed {completed}/{len(pending)} queries ({completed/len(pending):.1%}) "
+                            f"in {elapsed:.0f}s")
+        
+        # Keep the query order stable regardless of completion order
+        self.results = [done[key] for key in (query_hash(q['query']) for q in queries) if key in done]
+        logger.info(f"Evaluated {len(pending)} queries in {time.perf_counter() - start:.0f}s")
         
         # Analyze results
         logger.info("Analyzing evaluation results...")
@@ -88,35 +127,55 @@ class ComprehensiveEvaluationRunner:
             'successful_evaluations': len(self.results),
             'failed_queries': len(self.failed_queries),
             'report': report,
+            'run_id': self.run_id,
+            'evaluation_log': str(self.log.path),
             'output_directory': str(output_path)
         }
     
-    async def _process_batch(self, batch: List[Dict]) -> List[Dict]:
-        """Process a batch of queries"""
-        results = []
-        
-        for query_data in batch:
+    async def _evaluate_concurrently(self, queries: List[Dict]):
+        """Evaluate every query concurrently, yielding (index, result) as each finishes"""
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        async with self._create_client() as client:
+            self.client = client
             try:
-                # Rate limiting
-                current_time = time.time()
-                if current_time - self.last_request_time < self.request_delay:
-                    await asyncio.sleep(self.request_delay - (current_time - self.last_request_time))
-                
-                # Run single evaluation
-                result = await self._evaluate_single_query(query_data)
-                if result:
-                    results.append(result)
-                    self.last_request_time = time.time()
-                
-            except Exception as e:
-                logger.error(f"Failed to evaluate query '{query_data['query']}': {e}")
-                self.failed_queries.append({
-                    'query': query_data['query'],
-                    'error': str(e),
-                    'timestamp': datetime.now().isoformat()
-                })
+                tasks = [asyncio.create_task(self._evaluate_indexed(i, query_data))
+                         for i, query_data in enumerate(queries)]
+                try:
+                    for next_done in asyncio.as_completed(tasks):
+                        yield await next_done
+                finally:
+                    for task in tasks:
+                        task.cancel()
+            finally:
+                self.client = None
+    
+    async def _collect_results(self, queries: List[Dict]) -> List[Dict]:
+        """Evaluate queries concurrently and return the results in query order"""
+        indexed_results = []
+        async for index, result in self._evaluate_concurrently(queries):
+            if result:
+                indexed_results.append((index, result))
+                logger.info(f"Completed: {queries[index]['query']}")
+        indexed_results.sort(key=lambda item: item[0])
+        return [result for _, result in indexed_results]
+    
+    async def _evaluate_indexed(self, index: int, query_data: Dict):
+        try:
+            result = await self._evaluate_single_query(query_data)
+            error = None if result else "No result returned"
+        except Exception as e:
+            result, error = None, str(e)
         
-        return results
+        if error:
+            logger.error(f"Failed to evaluate query '{query_data['query']}': {error}")
+            self.failed_queries.append({
+                'query': query_data['query'],
+                'error': error,
+                'timestamp': datetime.now().isoformat()
+            })
+        if self.log is not None:
+            self.log.append(self.run_id, query_data['query'], result=result, error=error)
+        return index, result
     
     async def _evaluate_single_query(self, query_data: Dict) -> Optional[Dict]:
         """Evaluate a single query using the comparison endpoint"""
@@ -126,7 +185,7 @@ class ComprehensiveEvaluationRunner:
             # Step 1: Get comparison results from the compare-rag-modes endpoint
             logger.info(f"Evaluating query: {query}")
             
-            comparison_response = self._make_request(
+            comparison_response = await self._make_request(
                 "POST",
                 f"{self.base_url}/compare-rag-modes",
                 json={"query": query, "max_results": 5}
@@ -146,7 +205,7 @@ class ComprehensiveEvaluationRunner:
                 "summary_b": traditional_summary  # Traditional RAG
             }
             
-            evaluation_response = self._make_request(
+            evaluation_response = await self._make_request(
                 "POST",
                 f"{self.base_url}/evaluate-summaries",
                 json=evaluation_request
@@ -172,34 +231,56 @@ class ComprehensiveEvaluationRunner:
             }
             
             return result
-            
+        
         except Exception as e:
             logger.error(f"Error evaluating query '{query}': {e}")
             return None
     
-    def _make_request(self, method: str, url: str, **kwargs) -> Optional[Dict]:
-        """Make HTTP request with error handling"""
-        try:
-            response = self.session.request(method, url, timeout=30, **kwargs)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request failed: {e}")
-            return None
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error: {e}")
-            return None
-    
-    def _save_intermediate_results(self, output_path: Path, completed: int):
-        """Save intermediate results"""
-        intermediate_file = output_path / f"intermediate_results_{completed}.json"
+    async def _make_request(self, method: str, url: str, **kwargs) -> Optional[Dict]:
+        """Make HTTP request with a per-request timeout and retries
         
-        with open(intermediate_file, 'w') as f:
-            json.dump({
-                'completed_queries': completed,
-                'timestamp': datetime.now().isoformat(),
-                'results': self.results[-10:] if len(self.results) > 10 else self.results  # Last 10 results
-            }, f, indent=2)
+        Timeouts, connection errors and retryable status codes are retried with
+        jittered exponential backoff. The concurrency slot is released while
+        backing off so other queries keep the pool busy.
+        """
+        if self.client is None:
+            # Standalone call outside an evaluation run (e.g. the health check)
+            async with self._create_client() as client:
+                return await self._request_with_retries(client, method, url, **kwargs)
+        return await self._request_with_retries(self.client, method, url, **kwargs)
+    
+    async def _request_with_retries(self, client: httpx.AsyncClient, method: str, url: str,
+                                    **kwargs) -> Optional[Dict]:
+        for attempt in range(self.max_retries + 1):
+            retryable = False
+            try:
+                if self._semaphore is not None:
+                    async with self._semaphore:
+                        response = await client.request(method, url, **kwargs)
+                else:
+                    response = await client.request(method, url, **kwargs)
+                response.raise_for_status()
+                return response.json()
+            except httpx.HTTPStatusError as e:
+                retryable = e.response.status_code in RETRYABLE_STATUS
+                logger.error(f"Request failed: {e}")
+            except httpx.TransportError as e:
+                # Timeouts, connection resets and refused connections
+                retryable = True
+                logger.error(f"Request failed: {type(e).__name__}: {e}")
+            except json.JSONDecodeError as e:
+                logger.error(f"JSON decode error: {e}")
+            
+            if not retryable or attempt == self.max_retries:
+                return None
+            delay = min(30.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+            logger.info(f"Retrying {method} {url} in {delay:.1f}s (attempt {attempt + 2}/{self.max_retries + 1})")
+            await asyncio.sleep(delay)
+        return None
+    
+    async def check_health(self) -> bool:
+        """True if the backend health endpoint answers"""
+        return bool(await self._make_request("GET", f"{self.base_url}/health"))
     
     def _save_final_results(self, output_path: Path, report: Dict):
         """Save final results and analysis"""
@@ -238,16 +319,8 @@ class ComprehensiveEvaluationRunner:
         
         queries = get_all_queries()[:sample_size]
         
-        # Run synchronous evaluation for sample
-        results = []
-        for query_data in queries:
-            try:
-                result = asyncio.run(self._evaluate_single_query(query_data))
-                if result:
-                    results.append(result)
-                    logger.info(f"Completed: {query_data['query']}")
-            except Exception as e:
-                logger.error(f"Failed: {query_data['query']} - {e}")
+        # Run the sample through the same concurrent pipeline
+        results = asyncio.run(self._collect_results(queries))
         
         # Analyze sample results
         self.analyzer.add_results(results)
@@ -262,14 +335,13 @@ class ComprehensiveEvaluationRunner:
             'metrics': self.analyzer.generate_report()
         }
 
-async def main():
+async def main(resume: bool = False, run_id: Optional[str] = None):
     """Main function to run comprehensive evaluation"""
     runner = ComprehensiveEvaluationRunner()
     
     # Check if backend is running
     try:
-        health_response = runner._make_request("GET", f"{runner.base_url}/health")
-        if not health_response:
+        if not await runner.check_health():
             logger.error("Backend is not running. Please start the backend first.")
             return
     except Exception as e:
@@ -278,7 +350,7 @@ async def main():
     
     # Run comprehensive evaluation
     try:
-        results = await runner.run_comprehensive_evaluation()
+        results = await runner.run_comprehensive_evaluation(run_id=run_id, resume=resume)
         logger.info("Comprehensive evaluation completed successfully!")
         logger.info(f"Results: {results}")
     except KeyboardInterrupt:
@@ -295,6 +367,10 @@ if __name__ == "__main__":
         runner = ComprehensiveEvaluationRunner()
         sample_size = int(sys.argv[2]) if len(sys.argv) > 2 else 10
         runner.run_sample_evaluation(sample_size)
+    elif len(sys.argv) > 1 and sys.argv[1] == "--resume":
+        # Resume a run from the evaluation log (default: the latest run)
+        run_id = sys.argv[2] if len(sys.argv) > 2 else None
+        asyncio.run(main(resume=True, run_id=run_id))
     else:
         # Run full evaluation
         print(f"Total queries available: {get_query_count()}")
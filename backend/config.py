@@ -18,11 +18,92 @@ class Settings(BaseSettings):
     # Model Configuration
     embedding_model_name: str = Field(default="all-MiniLM-L6-v2", env="EMBEDDING_MODEL_NAME")
     anthropic_model: str = Field(default="claude-3-haiku-20240307", env="ANTHROPIC_MODEL")
+    embedding_device: Optional[str] = Field(default=None, env="EMBEDDING_DEVICE")
+    embedding_num_threads: Optional[int] = Field(default=None, env="EMBEDDING_NUM_THREADS")
     
     # Search Configuration
     similarity_threshold: float = Field(default=0.1, env="SIMILARITY_THRESHOLD")
     max_tokens: int = Field(default=300, env="MAX_TOKENS")
     temperature: float = Field(default=0.3, env="TEMPERATURE")
+    model_context_tokens: int = Field(default=200000, env="MODEL_CONTEXT_TOKENS")
+    context_token_budget: int = Field(default=3000, env="CONTEXT_TOKEN_BUDGET")
+    context_max_block_tokens: int = Field(default=300, env="CONTEXT_MAX_BLOCK_TOKENS")
+    context_entity_weight: float = Field(default=0.8, env="CONTEXT_ENTITY_WEIGHT")
+    context_path_weight: float = Field(default=0.6, env="CONTEXT_PATH_WEIGHT")
+    context_document_weight: float = Field(default=1.0, env="CONTEXT_DOCUMENT_WEIGHT")
+    
+    # Graph Search Configuration
+    fulltext_index_name: str = Field(default="entity_text", env="FULLTEXT_INDEX_NAME")
+    fulltext_index_labels: list = Field(
+        default=["Entity", "Company", "Organization", "Person", "Researcher", "Technology",
+                 "Topic", "Concept", "Product", "Publication", "Event", "Venue", "Document"],
+        env="FULLTEXT_INDEX_LABELS"
+    )
+    
+    graph_query_mode: str = Field(default="combined", env="GRAPH_QUERY_MODE")  # "combined" or "staged"
+    graph_engine: str = Field(default="neo4j", env="GRAPH_ENGINE")  # "neo4j" or "memory"
+    graph_snapshot_refresh_seconds: float = Field(default=30.0, env="GRAPH_SNAPSHOT_REFRESH_SECONDS")
+    graph_expansion_limit: int = Field(default=500, env="GRAPH_EXPANSION_LIMIT")  # candidate rows per hop
+    graph_expansion_mode: str = Field(default="full", env="GRAPH_EXPANSION_MODE")  # "full" or "sampled"
+    graph_neighbour_cap: int = Field(default=25, env="GRAPH_NEIGHBOUR_CAP")  # per node in sampled mode
+    graph_relationship_weights: dict = Field(default={"RELATED_TO": 0.5}, env="GRAPH_RELATIONSHIP_WEIGHTS")
+    graph_stop_nodes: list = Field(default=[], env="GRAPH_STOP_NODES")  # names never expanded through
+    graph_stop_degree: int = Field(default=0, env="GRAPH_STOP_DEGREE")  # 0 disables the degree cut-off
+    graph_ranking_enabled: bool = Field(default=True, env="GRAPH_RANKING_ENABLED")
+    graph_ranking_top_n: int = Field(default=50, env="GRAPH_RANKING_TOP_N")
+    graph_ranking_damping: float = Field(default=0.85, env="GRAPH_RANKING_DAMPING")
+    entity_index_path: str = Field(default="./entity_index", env="ENTITY_INDEX_PATH")
+    entity_index_similarity_threshold: float = Field(default=0.3, env="ENTITY_INDEX_SIMILARITY_THRESHOLD")
+    entity_document_index_path: str = Field(default="./entity_document_index.sqlite", env="ENTITY_DOCUMENT_INDEX_PATH")
+    
+    # Ingestion Configuration
+    ingest_batch_size: int = Field(default=128, env="INGEST_BATCH_SIZE")
+    graph_write_batch_size: int = Field(default=1000, env="GRAPH_WRITE_BATCH_SIZE")
+    
+    # Query Cache Configuration
+    query_cache_enabled: bool = Field(default=True, env="QUERY_CACHE_ENABLED")
+    query_cache_max_entries: int = Field(default=2048, env="QUERY_CACHE_MAX_ENTRIES")
+    query_cache_ttl_seconds: float = Field(default=3600.0, env="QUERY_CACHE_TTL_SECONDS")
+    
+    # LLM Gateway Configuration
+    llm_requests_per_minute: int = Field(default=50, env="LLM_REQUESTS_PER_MINUTE")
+    llm_tokens_per_minute: int = Field(default=50000, env="LLM_TOKENS_PER_MINUTE")
+    llm_max_concurrency: int = Field(default=8, env="LLM_MAX_CONCURRENCY")
+    llm_max_retries: int = Field(default=5, env="LLM_MAX_RETRIES")
+    llm_retry_base_seconds: float = Field(default=1.0, env="LLM_RETRY_BASE_SECONDS")
+    llm_retry_max_seconds: float = Field(default=30.0, env="LLM_RETRY_MAX_SECONDS")
+    llm_timeout_seconds: float = Field(default=60.0, env="LLM_TIMEOUT_SECONDS")
+    llm_cache_enabled: bool = Field(default=True, env="LLM_CACHE_ENABLED")
+    llm_cache_path: str = Field(default="./llm_cache/responses.sqlite", env="LLM_CACHE_PATH")
+    llm_cache_max_entries: int = Field(default=50000, env="LLM_CACHE_MAX_ENTRIES")
+    llm_cache_sites: list = Field(
+        default=["answer", "graphrag_answer", "traditional_answer", "judge"],
+        env="LLM_CACHE_SITES"
+    )
+    
+    # Entity Extraction Configuration
+    extraction_max_in_flight: int = Field(default=16, env="EXTRACTION_MAX_IN_FLIGHT")
+    extraction_model: str = Field(default="claude-3-sonnet-20240229", env="EXTRACTION_MODEL")
+    extraction_cache_enabled: bool = Field(default=True, env="EXTRACTION_CACHE_ENABLED")
+    extraction_cache_path: str = Field(default="./extraction_cache/extractions.sqlite", env="EXTRACTION_CACHE_PATH")
+    extraction_chunk_chars: int = Field(default=4000, env="EXTRACTION_CHUNK_CHARS")
+    extraction_chunk_overlap_chars: int = Field(default=400, env="EXTRACTION_CHUNK_OVERLAP_CHARS")
+    extraction_max_chunks_per_document: int = Field(default=50, env="EXTRACTION_MAX_CHUNKS_PER_DOCUMENT")
+    extraction_pack_enabled: bool = Field(default=False, env="EXTRACTION_PACK_ENABLED")
+    extraction_pack_token_budget: int = Field(default=2400, env="EXTRACTION_PACK_TOKEN_BUDGET")
+    extraction_pack_max_documents: int = Field(default=4, env="EXTRACTION_PACK_MAX_DOCUMENTS")
+    extraction_pack_max_doc_tokens: int = Field(default=750, env="EXTRACTION_PACK_MAX_DOC_TOKENS")
+    extraction_pack_max_output_tokens: int = Field(default=4096, env="EXTRACTION_PACK_MAX_OUTPUT_TOKENS")
+    extraction_batch_max_requests: int = Field(default=10000, env="EXTRACTION_BATCH_MAX_REQUESTS")
+    extraction_batch_poll_seconds: float = Field(default=60.0, env="EXTRACTION_BATCH_POLL_SECONDS")
+    extraction_batch_state_path: str = Field(default="./extraction_cache/batch_jobs.json", env="EXTRACTION_BATCH_STATE_PATH")
+    extraction_batch_base_url: str = Field(default="", env="EXTRACTION_BATCH_BASE_URL")
+    # USD per million tokens, used to report what cache hits saved
+    extraction_input_cost_per_mtok: float = Field(default=3.0, env="EXTRACTION_INPUT_COST_PER_MTOK")
+    extraction_output_cost_per_mtok: float = Field(default=15.0, env="EXTRACTION_OUTPUT_COST_PER_MTOK")
+    
+    # Comparison Configuration
+    rag_mode_timeout_seconds: float = Field(default=60.0, env="RAG_MODE_TIMEOUT_SECONDS")
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,117 @@
+"""
+Context Packer
+
+Fills an LLM context from a token budget instead of fixed item counts and
+character cutoffs. Every candidate entity, path and document becomes a
+ContextBlock with a relevance score; blocks are taken greedily by score until
+the budget is spent. Long bodies are capped per block, and the last block that
+only partly fits is cut at a sentence boundary rather than mid-word.
+"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from utils import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_END = re.compile(r"[.!?](?=\s|$)")
+
+def truncate_to_sentence(text: str, max_tokens: int) -> str:
+    """Shorten text to about max_tokens, ending on a sentence boundary when possible"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    max_chars = max(0, max_tokens * 4 - 3)
+    window = text[:max_chars]
+    ends = [m.end() for m in _SENTENCE_END.finditer(window)]
+    # Prefer a full sentence unless that would throw away most of the window
+    if ends and ends[-1] >= max_chars * 0.3:
+        return window[:ends[-1]]
+    cut = window.rfind(" ")
+    return (window[:cut] if cut > 0 else window).rstrip() + "..."
+
+@dataclass
+class ContextBlock:
+    """One entity, path or document as it will appear in the context
+
+    header lines are kept whole; body is the part that may be truncated and is
+    rendered after body_prefix. The first header line is numbered on render.
+    """
+    section: str
+    header: List[str]
+    score: float
+    body: str = ""
+    body_prefix: str = "   Content: "
+    truncated: bool = field(default=False, init=False)
+
+    def header_tokens(self) -> int:
+        return estimate_tokens("\n".join(self.header)) + 2
+
+    def tokens(self) -> int:
+        body = estimate_tokens(self.body_prefix + self.body) if self.body else 0
+        return self.header_tokens() + body
+
+    def render(self, number: int) -> List[str]:
+        lines = [f"{number}. {self.header[0]}"] + self.header[1:]
+        if self.body:
+            lines.append(f"{self.body_prefix}{self.body}")
+        return lines
+
+class ContextPacker:
+    """Greedy relevance-ordered packing of context blocks into a token budget"""
+
+    def __init__(self, token_budget: int, max_block_tokens: int = 300, min_body_tokens: int = 40):
+        self.token_budget = token_budget
+        self.max_block_tokens = max_block_tokens
+        self.min_body_tokens = min_body_tokens
+
+    def pack(self, blocks: List[ContextBlock]) -> Dict[str, List[ContextBlock]]:
+        """Return the chosen blocks per section, highest score first"""
+        remaining = self.token_budget
+        chosen: Dict[str, List[ContextBlock]] = {}
+        skipped = 0
+
+        for block in sorted(blocks, key=lambda b: b.score, reverse=True):
+            # No single block may take more than max_block_tokens of the budget
+            if block.body and block.tokens() > self.max_block_tokens:
+                body_budget = self.max_block_tokens - block.header_tokens() - estimate_tokens(block.body_prefix)
+                block.body = truncate_to_sentence(block.body, max(self.min_body_tokens, body_budget))
+                block.truncated = True
+            cost = block.tokens()
+            if cost > remaining and block.body:
+                body_budget = remaining - block.header_tokens() - estimate_tokens(block.body_prefix)
+                if body_budget >= self.min_body_tokens:
+                    block.body = truncate_to_sentence(block.body, body_budget)
+                    block.truncated = True
+                    cost = block.tokens()
+            if cost > remaining:
+                skipped += 1
+                continue
+            chosen.setdefault(block.section, []).append(block)
+            remaining -= cost
+
+        logger.info(f"Packed {sum(len(b) for b in chosen.values())} context blocks into "
+                    f"{self.token_budget - remaining}/{self.token_budget} tokens ({skipped} skipped)")
+        return chosen
+
+def normalized(values: List[float]) -> List[float]:
+    """Scale non-negative scores to [0, 1] by the maximum"""
+    top = max(values, default=0.0)
+    return [value / top if top > 0 else 0.0 for value in values]
+
+def context_packer(settings, reserved_tokens: int = 1000) -> ContextPacker:
+    """Packer configured from settings"""
+    return ContextPacker(context_token_budget(settings, reserved_tokens), settings.context_max_block_tokens)
+
+def context_token_budget(settings, reserved_tokens: int = 1000) -> int:
+    """Tokens available for retrieved context
+
+    The configured CONTEXT_TOKEN_BUDGET, capped so that context, the answer
+    allowance (max_tokens) and reserved_tokens for the system prompt and
+    instructions fit in the model's context window.
+    """
+    window_room = settings.model_context_tokens - settings.max_tokens - reserved_tokens
+    return max(0, min(settings.context_token_budget, window_room))
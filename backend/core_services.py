@@ -5,38 +5,77 @@ Contains essential LLM and embedding services.
 
 import logging
 import os
-from typing import List, Optional
-from sentence_transformers import SentenceTransformer
-import anthropic
+import threading
+from typing import Callable, List, Optional
 from config import get_settings
+from embedding_models import get_embedding_model
+from query_cache import LRUTTLCache, normalize_query
+from llm_gateway import llm_gateway
+from llm_response_cache import llm_response_cache
 
 logger = logging.getLogger(__name__)
 
 class EmbeddingService:
     """Service for converting text to embeddings using SentenceTransformers"""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        self.model_name = model_name
-        self._model = None
-        logger.info(f"Initialized EmbeddingService with model: {model_name}")
+    def __init__(self, model_name: Optional[str] = None):
+        settings = get_settings()
+        self.model_name = model_name or settings.embedding_model_name
+        self.cache = LRUTTLCache(
+            "embeddings",
+            max_entries=settings.query_cache_max_entries,
+            ttl_seconds=settings.query_cache_ttl_seconds
+        ) if settings.query_cache_enabled else None
+        logger.info(f"Initialized EmbeddingService with model: {self.model_name}")
     
     @property
     def model(self):
-        """Lazy load the embedding model"""
-        if self._model is None:
-            logger.info(f"Loading embedding model: {self.model_name}")
-            self._model = SentenceTransformer(self.model_name)
-        return self._model
+        """Lazy load the embedding model from the shared registry"""
+        return get_embedding_model(self.model_name)
     
     def encode(self, texts: List[str]) -> List[List[float]]:
-        """Convert texts to embeddings"""
+        """Convert texts to embeddings, serving repeated texts from the cache"""
         try:
-            embeddings = self.model.encode(texts, convert_to_tensor=False)
-            return embeddings.tolist()
+            if self.cache is None:
+                return self.model.encode(texts, convert_to_tensor=False).tolist()
+            
+            keys = [(self.model_name, normalize_query(text)) for text in texts]
+            embeddings = [self.cache.get(key) for key in keys]
+            missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+            
+            if missing:
+                computed = self.model.encode([texts[i] for i in missing], convert_to_tensor=False).tolist()
+                for i, embedding in zip(missing, computed):
+                    embeddings[i] = embedding
+                    self.cache.put(keys[i], embedding)
+            
+            return embeddings
         except Exception as e:
             logger.error(f"Failed to encode texts: {e}")
             raise
 
+class QueryEmbeddingContext:
+    """Request-scoped holder that embeds a query once and shares the vector.
+    
+    Both RAG pipelines of a comparison run in parallel threads, so the vector
+    is computed under a lock the first time any stage asks for it.
+    """
+    
+    def __init__(self, query: str, encoder: Optional[EmbeddingService] = None):
+        self.query = query
+        self.encoder = encoder or embedding_service
+        self._embedding: Optional[List[float]] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def embedding(self) -> List[float]:
+        """The query vector, computed on first access"""
+        if self._embedding is None:
+            with self._lock:
+                if self._embedding is None:
+                    self._embedding = self.encoder.encode([self.query])[0]
+        return self._embedding
+
 class LLMService:
     """Service for interacting with Anthropic's Claude LLM"""
     
@@ -46,17 +85,14 @@ class LLMService:
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY environment variable is required")
         
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        # All calls share the gateway's rate limiter, retries and timeouts
+        self.gateway = llm_gateway
+        self.cache = llm_response_cache
         logger.info("Initialized LLMService with Anthropic Claude")
     
-    def generate_answer(self, query: str, context: str, max_tokens: Optional[int] = None) -> str:
-        """Generate an answer using Claude based on query and context"""
-        try:
-            # Use settings defaults if not provided
-            if max_tokens is None:
-                max_tokens = self.settings.max_tokens
-            
-            prompt = f"""Based on the following context, please provide a comprehensive answer to the user's question.
+    def _answer_prompt(self, query: str, context: str) -> str:
+        """User prompt shared by generate_answer and stream_answer"""
+        return f"""Based on the following context, please provide a comprehensive answer to the user's question.
 
 Context:
 {context}
@@ -64,21 +100,107 @@ Context:
 Question: {query}
 
 Please provide a well-structured, informative answer based on the context provided. If the context doesn't contain enough information to fully answer the question, acknowledge this limitation."""
-
-            response = self.client.messages.create(
-                model=self.settings.anthropic_model,
-                max_tokens=max_tokens,
-                temperature=self.settings.temperature,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
+    
+    def generate_answer(self, query: str, context: str, max_tokens: Optional[int] = None,
+                        cache_site: Optional[str] = "answer",
+                        validate: Optional[Callable[[str], bool]] = None) -> str:
+        """Generate an answer using Claude based on query and context"""
+        try:
+            # Use settings defaults if not provided
+            if max_tokens is None:
+                max_tokens = self.settings.max_tokens
             
-            return response.content[0].text if response.content else "No response generated"
+            return self.complete(self._answer_prompt(query, context), max_tokens=max_tokens,
+                                 cache_site=cache_site, validate=validate) or "No response generated"
             
         except Exception as e:
             logger.error(f"Failed to generate answer: {e}")
             return f"Error generating answer: {str(e)}"
+    
+    def _request(self, content: str, system: Optional[str], max_tokens: Optional[int]) -> dict:
+        """Fully specified Messages request, so it can double as a cache key"""
+        request = {
+            "model": self.settings.anthropic_model,
+            "max_tokens": max_tokens or self.settings.max_tokens,
+            "temperature": self.settings.temperature,
+            "messages": [{"role": "user", "content": content}]
+        }
+        if system:
+            request["system"] = system
+        return request
+    
+    def _cache_response(self, cache_site: str, request: dict, text: str, response,
+                        validate: Optional[Callable[[str], bool]] = None):
+        """Store a response with its token usage, unless it is empty or fails validate"""
+        if not text:
+            return
+        if validate is not None and not validate(text):
+            logger.warning(f"Not caching {cache_site} response that failed validation")
+            return
+        usage = getattr(response, "usage", None)
+        self.cache.put(cache_site, request, text,
+                       input_tokens=usage.input_tokens if usage else None,
+                       output_tokens=usage.output_tokens if usage else None)
+    
+    def complete(self, content: str, system: Optional[str] = None, max_tokens: Optional[int] = None,
+                 cache_site: Optional[str] = None, validate: Optional[Callable[[str], bool]] = None) -> str:
+        """Single-turn Claude call through the gateway; returns the response text
+        
+        If cache_site names a call site enabled in LLM_CACHE_SITES, identical
+        requests are answered from the response cache. validate, if given,
+        must accept a response before it is cached, so a malformed reply is
+        not replayed. Errors propagate to the caller, which decides how to
+        report them.
+        """
+        request = self._request(content, system, max_tokens)
+        use_cache = self.cache.enabled_for(cache_site)
+        if use_cache:
+            cached = self.cache.get(cache_site, request)
+            if cached is not None:
+                return cached
+        
+        response = self.gateway.create(**request)
+        text = response.content[0].text if response.content else ""
+        
+        if use_cache:
+            self._cache_response(cache_site, request, text, response, validate)
+        return text
+    
+    def stream_completion(self,
+                          content: str,
+                          on_token: Callable[[str], None],
+                          system: Optional[str] = None,
+                          max_tokens: Optional[int] = None,
+                          cache_site: Optional[str] = None) -> str:
+        """Stream a Claude response, calling on_token with each text delta
+        
+        Returns the full text once the stream ends. A cached response is sent
+        as a single delta. Errors propagate to the caller, which decides how
+        to report them.
+        """
+        request = self._request(content, system, max_tokens)
+        use_cache = self.cache.enabled_for(cache_site)
+        if use_cache:
+            cached = self.cache.get(cache_site, request)
+            if cached is not None:
+                on_token(cached)
+                return cached
+        
+        response = self.gateway.stream(on_token, **request)
+        text = "".join(block.text for block in response.content if block.type == "text")
+        if use_cache:
+            self._cache_response(cache_site, request, text, response)
+        return text
+    
+    def stream_answer(self, query: str, context: str, on_token: Callable[[str], None],
+                      max_tokens: Optional[int] = None, cache_site: Optional[str] = "answer") -> str:
+        """Streaming variant of generate_answer"""
+        try:
+            return self.stream_completion(self._answer_prompt(query, context), on_token,
+                                          max_tokens=max_tokens, cache_site=cache_site)
+        except Exception as e:
+            logger.error(f"Failed to stream answer: {e}")
+            return f"Error generating answer: {str(e)}"
 
 # Global instances for easy import
 embedding_service = EmbeddingService()
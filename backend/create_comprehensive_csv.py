@@ -4,10 +4,11 @@ Create comprehensive CSV files with all evaluation results
 """
 
 import csv
-import json
 from pathlib import Path
 from datetime import datetime
 
+from evaluation_log import open_evaluation_log
+
 def create_comprehensive_csv():
     """Create comprehensive CSV files from evaluation results"""
     
@@ -103,25 +104,10 @@ def create_criteria_csv(results_dir):
     print(f"✅ Criteria CSV: {criteria_file}")
 
 def create_individual_results_csv(results_dir):
-    """Create individual query results CSV from intermediate files"""
-    
-    # Collect all results from intermediate files
-    all_results = []
-    intermediate_files = sorted(results_dir.glob("intermediate_results_*.json"))
-    
-    processed_queries = set()  # To avoid duplicates
-    
-    for file in intermediate_files:
-        try:
-            with open(file, 'r') as f:
-                data = json.load(f)
-                for result in data['results']:
-                    query = result.get('query', '')
-                    if query not in processed_queries:
-                        all_results.append(result)
-                        processed_queries.add(query)
-        except Exception as e:
-            print(f"Warning: Could not read {file}: {e}")
+    """Create individual query results CSV from the evaluation log"""
+    
+    # One result per query from the latest run
+    all_results = open_evaluation_log(str(results_dir)).results()
     
     print(f"📝 Collected {len(all_results)} individual results")
     
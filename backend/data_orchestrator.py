@@ -14,6 +14,9 @@ from data_collectors.semantic_scholar_collector import collect_semantic_scholar_
 # Import existing services
 from vector_store import chroma_service
 from database import db
+from graph_writer import BatchedGraphWriter, ENTITY_LABEL
+from entity_document_index import entity_document_index
+from entity_index import entity_index
 
 logger = logging.getLogger(__name__)
 
@@ -119,8 +122,8 @@ class DataOrchestrator:
         
         return all_documents
     
-    def ingest_to_vector_store(self, documents: Optional[List[Dict]] = None) -> Dict:
-        """Ingest documents into ChromaDB vector store"""
+    def ingest_to_vector_store(self, documents: Optional[List[Dict]] = None, batch_size: Optional[int] = None) -> Dict:
+        """Ingest documents into ChromaDB vector store in batches"""
         if documents is None:
             documents = self.collected_documents
             
@@ -137,8 +140,8 @@ class DataOrchestrator:
         except Exception as e:
             logger.error(f"Error clearing ChromaDB: {e}")
         
-        # Ingest documents
-        ingested_count = 0
+        # Prepare documents for batched ingestion
+        prepared_documents = []
         failed_count = 0
         
         for i, doc in enumerate(documents):
@@ -163,21 +166,20 @@ class DataOrchestrator:
                     'document_index': i
                 })
                 
-                # Add document to ChromaDB
-                doc_id = chroma_service.add_document(
-                    title=doc.get('title', f"Document {i}"),
-                    content=doc.get('content', ''),
-                    metadata=clean_metadata
-                )
-                
-                ingested_count += 1
-                
-                if ingested_count % 50 == 0:
-                    logger.info(f"Ingested {ingested_count}/{len(documents)} documents...")
+                prepared_documents.append({
+                    'title': doc.get('title', f"Document {i}"),
+                    'content': doc.get('content', ''),
+                    'metadata': clean_metadata
+                })
                     
             except Exception as e:
                 failed_count += 1
-                logger.error(f"Failed to ingest document {i}: {e}")
+                logger.error(f"Failed to prepare document {i}: {e}")
+        
+        # Encode and write to ChromaDB in batches
+        batch_result = chroma_service.add_documents(prepared_documents, batch_size=batch_size)
+        ingested_count = batch_result['added_count']
+        failed_count += batch_result['failed_count']
         
         # Verify ingestion
         stats = chroma_service.get_collection_stats()
@@ -187,10 +189,13 @@ class DataOrchestrator:
             'ingested_count': ingested_count,
             'failed_count': failed_count,
             'total_in_collection': stats.get('document_count', 0),
+            'elapsed_seconds': batch_result['elapsed_seconds'],
+            'docs_per_second': batch_result['docs_per_second'],
             'message': f"Successfully ingested {ingested_count} documents"
         }
         
-        logger.info(f"Ingestion completed: {ingested_count} successful, {failed_count} failed")
+        logger.info(f"Ingestion completed: {ingested_count} successful, {failed_count} failed "
+                    f"({batch_result['docs_per_second']} docs/sec)")
         return result
     
     def enhance_knowledge_graph(self, documents: Optional[List[Dict]] = None) -> Dict:
@@ -210,6 +215,11 @@ class DataOrchestrator:
         # Add to Neo4j
         kg_result = self._add_entities_to_neo4j(extracted_entities)
         
+        if kg_result['success']:
+            # Backfill n.degree for nodes written without it, then let snapshots reload
+            kg_result['degrees_updated'] = db.update_node_degrees()
+            db.bump_ingestion_epoch()
+        
         return kg_result
     
     def full_pipeline(self, 
@@ -252,6 +262,20 @@ class DataOrchestrator:
                 kg_result = self.enhance_knowledge_graph(documents)
                 pipeline_result['knowledge_graph'] = kg_result
             
+            # Step 4: Link graph entities to the documents that mention them
+            if include_vector_store or include_knowledge_graph:
+                try:
+                    pipeline_result['entity_document_index'] = entity_document_index.build()
+                except Exception as e:
+                    logger.error(f"Failed to build entity-document index: {e}")
+            
+            # Step 5: Re-embed graph entities for semantic seed matching
+            if include_knowledge_graph:
+                try:
+                    pipeline_result['entity_index'] = entity_index.build()
+                except Exception as e:
+                    logger.error(f"Failed to build entity index: {e}")
+            
             pipeline_result['success'] = True
             pipeline_result['message'] = f"Pipeline completed successfully with {len(documents)} documents"
             
@@ -336,50 +360,28 @@ class DataOrchestrator:
     def _add_entities_to_neo4j(self, entities: Dict) -> Dict:
         """Add extracted entities to Neo4j knowledge graph"""
         try:
-            with db.driver.session() as session:
-                added_counts = {}
-                
-                # Add companies
-                for company in entities['companies']:
-                    session.run("""
-                        MERGE (c:Company {name: $name})
-                        ON CREATE SET c.source = 'extracted', c.created_date = datetime()
-                    """, name=company)
-                added_counts['companies'] = len(entities['companies'])
-                
-                # Add technologies
-                for tech in entities['technologies']:
-                    session.run("""
-                        MERGE (t:Technology {name: $name})
-                        ON CREATE SET t.source = 'extracted', t.created_date = datetime()
-                    """, name=tech)
-                added_counts['technologies'] = len(entities['technologies'])
-                
-                # Add research areas as topics
-                for area in entities['research_areas']:
-                    session.run("""
-                        MERGE (r:Topic {name: $name})
-                        ON CREATE SET r.description = $description, r.source = 'extracted', r.created_date = datetime()
-                    """, name=area, description=f"Research area: {area}")
-                added_counts['research_areas'] = len(entities['research_areas'])
-                
-                # Add people as researchers
-                for person in entities['people'][:100]:  # Limit to avoid too many nodes
-                    session.run("""
-                        MERGE (p:Researcher {name: $name})
-                        ON CREATE SET p.source = 'extracted', p.created_date = datetime()
-                    """, name=person)
-                added_counts['people'] = min(len(entities['people']), 100)
-                
-                # Add venues
-                for venue in entities['venues']:
-                    session.run("""
-                        MERGE (v:Venue {name: $name})
-                        ON CREATE SET v.source = 'extracted', v.created_date = datetime()
-                    """, name=venue)
-                added_counts['venues'] = len(entities['venues'])
+            writer = BatchedGraphWriter()
+            
+            def rows(names, describe=None):
+                return [
+                    {'key': name, 'props': {'source': 'extracted', **({'description': describe(name)} if describe else {})}}
+                    for name in names
+                ]
+            
+            added_counts = {
+                'companies': writer.merge_nodes('Company', 'name', rows(entities['companies']), extra_labels=(ENTITY_LABEL,)),
+                'technologies': writer.merge_nodes('Technology', 'name', rows(entities['technologies']), extra_labels=(ENTITY_LABEL,)),
+                # Research areas become topics
+                'research_areas': writer.merge_nodes(
+                    'Topic', 'name', rows(entities['research_areas'], lambda area: f"Research area: {area}"),
+                    extra_labels=(ENTITY_LABEL,)
+                ),
+                # Limit people to avoid too many nodes
+                'people': writer.merge_nodes('Researcher', 'name', rows(entities['people'][:100]), extra_labels=(ENTITY_LABEL,)),
+                'venues': writer.merge_nodes('Venue', 'name', rows(entities['venues']), extra_labels=(ENTITY_LABEL,))
+            }
             
-            logger.info(f"Added entities to Neo4j: {added_counts}")
+            logger.info(f"Added entities to Neo4j: {added_counts} ({writer.throughput()['nodes_per_second']} nodes/sec)")
             
             return {
                 'success': True,
@@ -5,6 +5,9 @@ from config import get_settings
 
 logger = logging.getLogger(__name__)
 
+# Label of the bookkeeping node that holds the ingestion epoch
+GRAPH_META_LABEL = "GraphMeta"
+
 class Neo4jDatabase:
     def __init__(self):
         self.settings = get_settings()
@@ -39,8 +42,65 @@ class Neo4jDatabase:
             logger.error(f"Health check failed: {e}")
             return {"status": "error", "detail": str(e)}
     
+    def ensure_fulltext_index(self) -> bool:
+        """Create the entity full-text index over name/title/description if missing"""
+        index_name = self.settings.fulltext_index_name
+        labels = "|".join(f"`{label}`" for label in self.settings.fulltext_index_labels)
+        try:
+            with self.driver.session() as session:
+                session.run(f"""
+                    CREATE FULLTEXT INDEX `{index_name}` IF NOT EXISTS
+                    FOR (n:{labels})
+                    ON EACH [n.name, n.title, n.description]
+                """)
+            logger.info(f"Full-text index '{index_name}' is available")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to ensure full-text index '{index_name}': {e}")
+            return False
+
+    def get_ingestion_epoch(self) -> int:
+        """Return the ingestion epoch, bumped whenever the graph is rewritten"""
+        with self.driver.session() as session:
+            record = session.run(
+                f"MATCH (m:`{GRAPH_META_LABEL}` {{key: 'ingestion'}}) RETURN m.epoch AS epoch"
+            ).single()
+            return record["epoch"] if record and record["epoch"] is not None else 0
     
+    def update_node_degrees(self) -> bool:
+        """Recount n.degree for every node
+        
+        BatchedGraphWriter keeps the degrees of the nodes it writes current;
+        this full pass is only needed to backfill a graph written before that.
+        """
+        try:
+            with self.driver.session() as session:
+                session.run(f"""
+                    MATCH (n)
+                    WHERE NOT n:`{GRAPH_META_LABEL}`
+                    CALL {{
+                        WITH n
+                        SET n.degree = COUNT {{ (n)--() }}
+                    }} IN TRANSACTIONS OF 10000 ROWS
+                """).consume()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to update node degrees: {e}")
+            return False
     
+    def bump_ingestion_epoch(self) -> int:
+        """Mark the graph as changed so in-memory snapshots reload"""
+        try:
+            with self.driver.session() as session:
+                record = session.run(f"""
+                    MERGE (m:`{GRAPH_META_LABEL}` {{key: 'ingestion'}})
+                    SET m.epoch = coalesce(m.epoch, 0) + 1, m.updated_date = datetime()
+                    RETURN m.epoch AS epoch
+                """).single()
+                return record["epoch"]
+        except Exception as e:
+            logger.error(f"Failed to bump ingestion epoch: {e}")
+            return -1
 
 # Global database instance
 db = Neo4jDatabase()
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""
+Process-wide embedding model registry.
+
+Every service that needs a SentenceTransformer (EmbeddingService, ChromaDBService
+and the Chroma embedding function) obtains it from here, so each worker process
+loads the weights for a given model exactly once.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Any, Optional
+from sentence_transformers import SentenceTransformer
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_models: Dict[str, SentenceTransformer] = {}
+_load_times: Dict[str, float] = {}
+_lock = threading.Lock()
+
+def _apply_thread_setting(num_threads: Optional[int]):
+    """Limit the number of intra-op CPU threads used by torch"""
+    if not num_threads:
+        return
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+        logger.info(f"Set torch intra-op threads to {num_threads}")
+    except Exception as e:
+        logger.warning(f"Could not set torch thread count: {e}")
+
+def get_embedding_model(model_name: Optional[str] = None) -> SentenceTransformer:
+    """Return the shared SentenceTransformer for model_name, loading it on first use"""
+    settings = get_settings()
+    model_name = model_name or settings.embedding_model_name
+
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(model_name)
+        if model is None:
+            _apply_thread_setting(settings.embedding_num_threads)
+
+            logger.info(f"Loading embedding model: {model_name} (device: {settings.embedding_device or 'auto'})")
+            start = time.perf_counter()
+            model = SentenceTransformer(model_name, device=settings.embedding_device)
+            _load_times[model_name] = time.perf_counter() - start
+            _models[model_name] = model
+
+            logger.info(f"Loaded embedding model {model_name} in {_load_times[model_name]:.2f}s "
+                        f"({_model_memory_bytes(model) / (1024 * 1024):.1f} MB resident)")
+    return model
+
+def _model_memory_bytes(model: SentenceTransformer) -> int:
+    """Approximate resident memory of a model's parameters and buffers"""
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+def get_registry_stats() -> Dict[str, Any]:
+    """Report the loaded models and their resident memory"""
+    models = []
+    for model_name, model in list(_models.items()):
+        models.append({
+            "model_name": model_name,
+            "device": str(model.device),
+            "embedding_dimension": model.get_sentence_embedding_dimension(),
+            "memory_mb": round(_model_memory_bytes(model) / (1024 * 1024), 2),
+            "load_seconds": round(_load_times.get(model_name, 0.0), 3)
+        })
+
+    return {
+        "loaded_models": len(models),
+        "total_memory_mb": round(sum(m["memory_mb"] for m in models), 2),
+        "models": models
+    }
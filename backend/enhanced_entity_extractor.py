@@ -6,38 +6,56 @@ Uses Claude LLM to extract entities and relationships from documents
 
 import logging
 import json
-from typing import List, Dict, Set, Tuple
-from anthropic import Anthropic
-import os
+import re
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import List, Dict, Set, Tuple, Optional, NamedTuple
 from dotenv import load_dotenv
+from config import get_settings
 from database import db
 from vector_store import chroma_service
-import time
+from graph_writer import BatchedGraphWriter, ENTITY_LABEL
+from utils import estimate_tokens
+from llm_gateway import llm_gateway
+from extraction_cache import ExtractionCache, extraction_key
+from extraction_batch import BatchJobRunner, BatchTransport
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-class EnhancedEntityExtractor:
-    """LLM-powered entity extraction for knowledge graphs"""
-    
-    def __init__(self):
-        self.anthropic = Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
-        self.processed_docs = set()
-        self.extraction_stats = {
-            'documents_processed': 0,
-            'entities_found': 0,
-            'relationships_found': 0,
-            'errors': []
-        }
-    
-    def extract_entities_from_text(self, text: str, title: str = "", source: str = "") -> Dict:
-        """Extract entities and relationships from text using Claude"""
-        
-        prompt = f"""
-Extract entities and relationships from this document. Focus on:
+# Documents read from ChromaDB per run unless the caller explicitly asks for all
+DEFAULT_MAX_DOCUMENTS = 500
+
+# Bump whenever the extraction prompt changes so cached results are not reused
+EXTRACTION_PROMPT_VERSION = 'v2'
+
+# Labels written without :Entity by older kg_enhancer / data orchestrator runs,
+# tried (through their own name/title indexes) for endpoints :Entity misses
+LEGACY_NODE_SPECS = [
+    ('Company', 'name'),
+    ('Person', 'name'),
+    ('Researcher', 'name'),
+    ('Technology', 'name'),
+    ('Topic', 'name'),
+    ('Venue', 'name'),
+    ('Document', 'title')
+]
+
+# entity type -> (node label, merge key)
+EXTRACTED_NODE_SPECS = {
+    'people': ('Person', 'name'),
+    'organizations': ('Organization', 'name'),
+    'technologies': ('Technology', 'name'),
+    'concepts': ('Concept', 'name'),
+    'products': ('Product', 'name'),
+    'publications': ('Publication', 'title'),
+    'events': ('Event', 'name')
+}
 
-ENTITIES to extract:
+# What to extract, shared by the single-document and packed prompts
+EXTRACTION_TARGETS = """ENTITIES to extract:
 - People (researchers, CEOs, engineers, etc.)
 - Organizations (companies, universities, research labs)
 - Technologies (AI models, frameworks, algorithms, software)
@@ -56,17 +74,9 @@ RELATIONSHIPS to extract:
 - Event FEATURES Technology
 - Organization COLLABORATES_WITH Organization
 - Technology BASED_ON Technology
-- Concept RELATED_TO Concept
+- Concept RELATED_TO Concept"""
 
-Document Title: {title}
-Source: {source}
-
-Document Text:
-{text[:4000]}  # Limit to avoid token limits
-
-Return a JSON object with this structure:
-{{
-  "entities": {{
+ENTITIES_SCHEMA = """{
     "people": [list of person names],
     "organizations": [list of organization names],
     "technologies": [list of technology names],
@@ -74,7 +84,228 @@ Return a JSON object with this structure:
     "products": [list of product names],
     "publications": [list of publication titles],
     "events": [list of event names]
-  }},
+  }"""
+
+# Output allowance per document in a packed prompt
+# Packed replies are cached under their own prompt variant, never as single-document ones
+PACKED_PROMPT_VERSION = f"{EXTRACTION_PROMPT_VERSION}-packed"
+SINGLE_OUTPUT_TOKENS = 2000
+PACKED_OUTPUT_TOKENS_PER_DOC = 600
+
+class _WorkItem(NamedTuple):
+    """One extraction unit: a whole document, or one window of a long document"""
+    i: int
+    doc: Dict
+    doc_id: str
+    key: str
+    text: str
+    part: int = 0
+    parts: int = 1
+    overlap: str = ""  # text shared with the previous window
+
+def window_spans(text: str, window_chars: int, overlap_chars: int) -> List[Tuple[int, int]]:
+    """(start, end) offsets of overlapping windows of at most window_chars
+
+    Windows end on a sentence or line break (else a word boundary) within
+    their last fifth, and each window repeats about overlap_chars of the
+    previous one so entities and relationships spanning a cut are seen whole.
+    Text that fits in one window is a single span.
+    """
+    if len(text) <= window_chars:
+        return [(0, len(text))]
+
+    overlap_chars = min(overlap_chars, window_chars // 2)
+    spans = []
+    start = 0
+    while start < len(text):
+        end = min(start + window_chars, len(text))
+        if end < len(text):
+            floor = start + int(window_chars * 0.8)
+            cut = max(text.rfind('. ', floor, end), text.rfind('\n', floor, end))
+            if cut != -1:
+                end = cut + 1
+            else:
+                space = text.rfind(' ', floor, end)
+                if space != -1:
+                    end = space
+        spans.append((start, end))
+        if end >= len(text):
+            break
+        # Start the next window on a word boundary inside the overlap
+        next_start = end - overlap_chars
+        space = text.find(' ', next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return spans
+
+def _confidence(value, default: float = 0.5) -> float:
+    try:
+        return min(1.0, max(0.0, float(value)))
+    except (TypeError, ValueError):
+        return default
+
+def merge_chunk_results(results: List[Optional[Dict]], overlaps: Optional[List[str]] = None) -> Dict:
+    """Combine the extraction results of one document's windows
+
+    results are in window order, None for a window that failed; overlaps[k]
+    is the text window k shares with window k - 1. Entities are de-duplicated
+    case-insensitively. A relationship reported by several windows is kept
+    once, with noisy-OR confidence 1 - prod(1 - confidence_i) over its
+    independent mentions, counted in chunk_mentions. A report from the next
+    window whose subject and object both lie in the shared text is the same
+    mention seen twice, so it only keeps the higher confidence.
+    """
+    overlaps = [overlap.lower() for overlap in overlaps] if overlaps else [""] * len(results)
+    entities = {}
+    for entity_type in EXTRACTED_NODE_SPECS:
+        names = {}
+        for result in filter(None, results):
+            for name in result.get('entities', {}).get(entity_type, []):
+                if isinstance(name, str) and name.strip():
+                    names.setdefault(name.strip().lower(), name.strip())
+        entities[entity_type] = list(names.values())
+
+    relationships = {}
+    mentions: Dict[Tuple, List[float]] = {}
+    last_window: Dict[Tuple, int] = {}
+    for k, result in enumerate(results):
+        if result is None:
+            continue
+        for rel in result.get('relationships', []):
+            subject, obj = rel.get('subject'), rel.get('object')
+            if not isinstance(subject, str) or not isinstance(obj, str):
+                continue
+            subject, obj = subject.strip().lower(), obj.strip().lower()
+            key = (subject, _relationship_type(rel.get('predicate', 'RELATED_TO')), obj)
+            confidence = _confidence(rel.get('confidence'))
+            if key not in relationships:
+                relationships[key] = dict(rel)
+                mentions[key] = [confidence]
+            elif last_window[key] == k or (last_window[key] == k - 1 and subject in overlaps[k] and obj in overlaps[k]):
+                mentions[key][-1] = max(mentions[key][-1], confidence)
+            else:
+                mentions[key].append(confidence)
+            last_window[key] = k
+    for key, rel in relationships.items():
+        unconfirmed = 1.0
+        for confidence in mentions[key]:
+            unconfirmed *= 1 - confidence
+        rel['confidence'] = round(1 - unconfirmed, 4)
+        rel['chunk_mentions'] = len(mentions[key])
+
+    return {'entities': entities, 'relationships': list(relationships.values())}
+
+def pack_documents(items: List[_WorkItem], token_budget: int, max_documents: int,
+                   max_doc_tokens: int) -> List[List[_WorkItem]]:
+    """Group work items into packs for multi-document prompts
+
+    Short documents are packed in order until the pack's estimated text
+    tokens would exceed token_budget or it holds max_documents; documents
+    longer than max_doc_tokens are sent on their own.
+    """
+    packs, current, current_tokens = [], [], 0
+    for item in items:
+        tokens = estimate_tokens(item.doc.get('title', '')) + estimate_tokens(item.text)
+        if tokens > max_doc_tokens:
+            packs.append([item])
+            continue
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_documents):
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+def _relationship_type(predicate: str) -> str:
+    """Normalize an LLM predicate into a safe Cypher relationship type"""
+    rel_type = re.sub(r'[^A-Z0-9_]', '_', str(predicate).strip().upper()).strip('_')
+    if not rel_type or rel_type[0].isdigit():
+        return 'RELATED_TO'
+    return rel_type
+
+class _ExtractionAccumulator:
+    """Merges per-document extraction results into one entity/relationship set
+    
+    Results for the windows of a long document are held back until every
+    window has finished, then combined with merge_chunk_results.
+    """
+    
+    def __init__(self):
+        self.entities = {entity_type: set() for entity_type in EXTRACTED_NODE_SPECS}
+        self.relationships = []
+        self._windows: Dict[str, Dict[int, Tuple[Optional[Dict], str]]] = {}
+    
+    def add(self, item: _WorkItem, result: Optional[Dict]) -> bool:
+        """Record a unit's result (None if it failed)
+        
+        Returns True once the unit's document is complete with every unit
+        extracted successfully.
+        """
+        if item.parts == 1:
+            if result is None:
+                return False
+            self.merge(item.i, item.doc, result)
+            return True
+        
+        parts = self._windows.setdefault(item.doc_id, {})
+        parts[item.part] = (result, item.overlap)
+        if len(parts) < item.parts:
+            return False
+        del self._windows[item.doc_id]
+        results, overlaps = zip(*(parts[part] for part in range(item.parts)))
+        succeeded = sum(result is not None for result in results)
+        if succeeded:
+            self.merge(item.i, item.doc, merge_chunk_results(list(results), list(overlaps)))
+        return succeeded == item.parts
+    
+    def merge(self, i: int, doc: Dict, result: Dict):
+        for entity_type, entities in result.get('entities', {}).items():
+            if entity_type in self.entities:
+                self.entities[entity_type].update(e for e in entities if isinstance(e, str))
+        for rel in result.get('relationships', []):
+            rel['source_document'] = doc.get('title', f"Document {i}")
+            self.relationships.append(rel)
+    
+    def entity_count(self) -> int:
+        return sum(len(entities) for entities in self.entities.values())
+
+class EnhancedEntityExtractor:
+    """LLM-powered entity extraction for knowledge graphs"""
+    
+    def __init__(self, cache: Optional[ExtractionCache] = None):
+        self.settings = get_settings()
+        self.llm = llm_gateway
+        self.model = self.settings.extraction_model
+        self.cache = cache or ExtractionCache()
+        self.processed_docs = set()
+        self.extraction_stats = {
+            'documents_processed': 0,
+            'documents_cached': 0,
+            'documents_chunked': 0,
+            'llm_calls': 0,
+            'entities_found': 0,
+            'relationships_found': 0,
+            'errors': []
+        }
+    
+    def _extraction_request(self, text: str, title: str = "", source: str = "") -> Dict:
+        """Messages API request for extracting entities from one document"""
+        
+        prompt = f"""
+Extract entities and relationships from this document. Focus on:
+
+{EXTRACTION_TARGETS}
+
+Document Title: {title}
+Source: {source}
+
+Document Text:
+{text}
+
+Return a JSON object with this structure:
+{{
+  "entities": {ENTITIES_SCHEMA},
   "relationships": [
     {{"subject": "EntityName", "predicate": "RELATIONSHIP_TYPE", "object": "EntityName", "confidence": 0.8}}
   ]
@@ -82,218 +313,477 @@ Return a JSON object with this structure:
 
 Focus on extracting the most important and clearly mentioned entities. Be conservative - only include entities you're confident about.
 """
+        return {
+            "model": self.model,
+            "max_tokens": SINGLE_OUTPUT_TOKENS,
+            "temperature": 0.1,
+            "messages": [{"role": "user", "content": prompt}]
+        }
+    
+    def _packed_extraction_request(self, pack: List[_WorkItem]) -> Dict:
+        """One request extracting from several work items, labelled D1..Dn"""
+        
+        entities_schema = ENTITIES_SCHEMA.replace("\n", "\n    ")
+        sections = "\n".join(
+            f"""=== DOCUMENT D{n} ===
+Document Title: {item.doc.get('title', '')}
+Source: {item.doc.get('source', '')}
+
+Document Text:
+{item.text}
+"""
+            for n, item in enumerate(pack, 1)
+        )
+        
+        prompt = f"""
+Extract entities and relationships from each of the {len(pack)} documents below. Focus on:
+
+{EXTRACTION_TARGETS}
+
+Every document starts with a line "=== DOCUMENT <id> ===". Treat each document on its own: only report entities and relationships that document mentions.
+
+{sections}
+Return a JSON object with one entry per document id, with this structure:
+{{
+  "documents": {{
+    "D1": {{
+      "entities": {entities_schema},
+      "relationships": [
+        {{"subject": "EntityName", "predicate": "RELATIONSHIP_TYPE", "object": "EntityName", "confidence": 0.8}}
+      ]
+    }}
+  }}
+}}
 
+Focus on extracting the most important and clearly mentioned entities. Be conservative - only include entities you're confident about.
+"""
+        return {
+            "model": self.model,
+            "max_tokens": min(self.settings.extraction_pack_max_output_tokens,
+                              SINGLE_OUTPUT_TOKENS + PACKED_OUTPUT_TOKENS_PER_DOC * (len(pack) - 1)),
+            "temperature": 0.1,
+            "messages": [{"role": "user", "content": prompt}]
+        }
+    
+    @staticmethod
+    def _parse_extraction_response(result_text: str) -> Dict:
+        """Pull the JSON object out of Claude's reply; raises ValueError if there is none"""
+        if '{' not in result_text:
+            raise ValueError("No JSON found in Claude response")
+        json_start = result_text.find('{')
+        json_end = result_text.rfind('}') + 1
         try:
-            response = self.anthropic.messages.create(
-                model="claude-3-sonnet-20240229",
-                max_tokens=2000,
-                temperature=0.1,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            # Parse the JSON response
-            result_text = response.content[0].text
-            
-            # Find JSON in the response
-            if '{' in result_text:
-                json_start = result_text.find('{')
-                json_end = result_text.rfind('}') + 1
-                json_str = result_text[json_start:json_end]
-                
-                try:
-                    result = json.loads(json_str)
-                    return result
-                except json.JSONDecodeError:
-                    logger.error(f"Failed to parse JSON from Claude response")
-                    return {"entities": {}, "relationships": []}
-            else:
-                logger.error(f"No JSON found in Claude response")
-                return {"entities": {}, "relationships": []}
-                
-        except Exception as e:
-            logger.error(f"Error calling Claude API: {e}")
-            return {"entities": {}, "relationships": []}
+            return json.loads(result_text[json_start:json_end])
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Failed to parse JSON from Claude response: {e}")
     
-    def process_document_batch(self, documents: List[Dict], batch_size: int = 5) -> Dict:
-        """Process a batch of documents for entity extraction"""
-        
-        logger.info(f"Processing {len(documents)} documents for entity extraction...")
-        
-        all_entities = {
-            'people': set(),
-            'organizations': set(), 
-            'technologies': set(),
-            'concepts': set(),
-            'products': set(),
-            'publications': set(),
-            'events': set()
-        }
+    def _cache_key(self, title: str, content: str, prompt_version: str = EXTRACTION_PROMPT_VERSION) -> str:
+        return extraction_key(title, content, prompt_version, self.model)
+    
+    def _packed_cache_key(self, item: _WorkItem) -> str:
+        return self._cache_key(item.doc.get('title', ''), item.text, PACKED_PROMPT_VERSION)
+    
+    def _cache_result(self, key: str, doc_id: str, title: str, result: Dict, response, share: float = 1.0,
+                      prompt_version: str = EXTRACTION_PROMPT_VERSION):
+        """Cache a result with its token usage; share apportions a packed call's usage"""
+        usage = getattr(response, "usage", None)
+        self.cache.put(key, doc_id, title, prompt_version, self.model, result,
+                       input_tokens=round(usage.input_tokens * share) if usage else None,
+                       output_tokens=round(usage.output_tokens * share) if usage else None)
+    
+    def _windows(self, text: str) -> List[Tuple[str, str]]:
+        """(window text, text shared with the previous window) for each window of text"""
+        spans = window_spans(text, self.settings.extraction_chunk_chars,
+                             self.settings.extraction_chunk_overlap_chars)
+        max_windows = self.settings.extraction_max_chunks_per_document
+        if len(spans) > max_windows:
+            logger.warning(f"Document split into {len(spans)} windows; extracting the first {max_windows}")
+            spans = spans[:max_windows]
+        return [
+            (text[start:end], text[start:spans[k - 1][1]] if k else "")
+            for k, (start, end) in enumerate(spans)
+        ]
+    
+    def extract_entities_from_text(self, text: str, title: str = "", source: str = "") -> Dict:
+        """Extract entities and relationships from text using Claude
         
-        all_relationships = []
+        Long text is split into overlapping windows that are extracted in
+        parallel (unchanged windows come from the cache) and merged.
+        """
+        use_cache = self.settings.extraction_cache_enabled
+        windows = self._windows(text)
+        keys = [self._cache_key(title, window) for window, _ in windows]
+        cached = self.cache.load(keys) if use_cache else {}
+        futures = {}
+        for (window, _), key in zip(windows, keys):
+            if key in cached or key in futures:
+                continue
+            try:
+                futures[key] = self.llm.submit(**self._extraction_request(window, title, source))
+            except Exception as e:
+                logger.error(f"Error calling Claude API: {e}")
+                futures[key] = None
         
-        for i, doc in enumerate(documents):
+        results = []
+        for key in keys:
+            if key in cached:
+                results.append(cached[key])
+                continue
+            result = None
             try:
-                # Skip if already processed
-                doc_id = doc.get('id', f"doc_{i}")
-                if doc_id in self.processed_docs:
-                    continue
-                
-                logger.info(f"Processing document {i+1}/{len(documents)}: {doc.get('title', 'Untitled')[:50]}...")
-                
-                # Extract entities from this document
-                result = self.extract_entities_from_text(
-                    text=doc.get('content', ''),
-                    title=doc.get('title', ''),
-                    source=doc.get('source', '')
-                )
-                
-                # Merge entities
-                for entity_type, entities in result.get('entities', {}).items():
-                    if entity_type in all_entities:
-                        all_entities[entity_type].update(entities)
-                
-                # Add relationships
-                relationships = result.get('relationships', [])
-                for rel in relationships:
-                    rel['source_document'] = doc.get('title', f"Document {i}")
-                    all_relationships.append(rel)
-                
-                self.processed_docs.add(doc_id)
-                self.extraction_stats['documents_processed'] += 1
-                
-                # Rate limiting - wait between API calls
-                time.sleep(0.5)
-                
-                # Progress update
-                if (i + 1) % 10 == 0:
-                    logger.info(f"Processed {i+1} documents. Found {sum(len(entities) for entities in all_entities.values())} entities so far.")
-                
+                if futures[key] is not None:
+                    response = futures[key].result()
+                    result = self._parse_extraction_response(response.content[0].text)
+                    if use_cache:
+                        self._cache_result(key, "", title, result, response)
+            except ValueError as e:
+                logger.error(str(e))
             except Exception as e:
-                error_msg = f"Error processing document {i}: {e}"
-                logger.error(error_msg)
-                self.extraction_stats['errors'].append(error_msg)
+                logger.error(f"Error calling Claude API: {e}")
+            results.append(result)
+        
+        if all(result is None for result in results):
+            return {"entities": {}, "relationships": []}
+        if len(windows) == 1:
+            return results[0]
+        return merge_chunk_results(results, [overlap for _, overlap in windows])
+    
+    def _work_items(self, documents: List[Dict]) -> List[_WorkItem]:
+        """One unit per short document, one per window of a long document"""
+        items = []
+        for i, doc in enumerate(documents):
+            doc_id = doc.get('id', f"doc_{i}")
+            # Skip documents already handled by this extractor
+            if doc_id in self.processed_docs:
                 continue
+            title = doc.get('title', '')
+            windows = self._windows(doc.get('content', ''))
+            if len(windows) > 1:
+                self.extraction_stats['documents_chunked'] += 1
+            for part, (window, overlap) in enumerate(windows):
+                items.append(_WorkItem(i, doc, doc_id, self._cache_key(title, window), window, part, len(windows), overlap))
+        return items
+    
+    def _unit_done(self, item: _WorkItem, result: Optional[Dict], merged: _ExtractionAccumulator):
+        if merged.add(item, result):
+            self.processed_docs.add(item.doc_id)
+    
+    def _split_cached(self, documents: List[Dict], use_cache: bool,
+                      merged: _ExtractionAccumulator, packed: bool = False) -> List[_WorkItem]:
+        """Merge cached results and return the work items still to extract
         
-        # Convert sets to lists
-        for entity_type in all_entities:
-            all_entities[entity_type] = list(all_entities[entity_type])
+        Packed runs also accept results cached from an earlier packed prompt;
+        single-document runs only accept single-document results.
+        """
+        pending = self._work_items(documents)
         
-        self.extraction_stats['entities_found'] = sum(len(entities) for entities in all_entities.values())
-        self.extraction_stats['relationships_found'] = len(all_relationships)
+        if use_cache and pending:
+            if packed:
+                stored = self.cache.load_any([item.key, self._packed_cache_key(item)] for item in pending)
+            else:
+                stored = self.cache.load(item.key for item in pending)
+            remaining = []
+            for item in pending:
+                if item.key in stored:
+                    self._unit_done(item, stored[item.key], merged)
+                    self.extraction_stats['documents_cached'] += 1
+                else:
+                    remaining.append(item)
+            logger.info(f"Extraction cache: {len(pending) - len(remaining)} extraction units served from cache, "
+                        f"{len(remaining)} to extract")
+            pending = remaining
+        return pending
+    
+    def _unit_failed(self, item: _WorkItem, error, merged: _ExtractionAccumulator):
+        where = f" (window {item.part + 1}/{item.parts})" if item.parts > 1 else ""
+        error_msg = f"Error processing document {item.i}{where}: {error}"
+        logger.error(error_msg)
+        self.extraction_stats['errors'].append(error_msg)
+        self._unit_done(item, None, merged)
+    
+    def _finish(self, merged: _ExtractionAccumulator) -> Dict:
+        self.extraction_stats['cache'] = self.cache.stats()
+        self.extraction_stats['entities_found'] = merged.entity_count()
+        self.extraction_stats['relationships_found'] = len(merged.relationships)
         
         return {
-            'entities': all_entities,
-            'relationships': all_relationships,
+            'entities': {entity_type: list(entities) for entity_type, entities in merged.entities.items()},
+            'relationships': merged.relationships,
             'stats': self.extraction_stats.copy()
         }
     
+    def process_document_batch(self, documents: List[Dict], batch_size: Optional[int] = None,
+                               use_cache: Optional[bool] = None, pack: Optional[bool] = None) -> Dict:
+        """Process a batch of documents for entity extraction
+        
+        Up to batch_size documents (default EXTRACTION_MAX_IN_FLIGHT) are
+        submitted to the LLM gateway at once; the gateway's rate limiter and
+        concurrency cap decide how fast they actually run. Documents already in
+        the extraction cache (same title, content, prompt version and model)
+        are not sent again, and each new result is cached as soon as it
+        arrives, so an interrupted run resumes where it stopped.
+        use_cache=False forces re-extraction (default EXTRACTION_CACHE_ENABLED).
+        
+        With pack=True (default EXTRACTION_PACK_ENABLED) short documents are
+        grouped into one multi-document prompt per call, sized to
+        EXTRACTION_PACK_TOKEN_BUDGET and to what fits in
+        EXTRACTION_PACK_MAX_OUTPUT_TOKENS; documents missing from a packed reply
+        are retried on their own, and a pack whose reply hit max_tokens is
+        split in half and re-sent.
+        
+        Documents longer than EXTRACTION_CHUNK_CHARS are split into
+        overlapping windows that are extracted as independent units, so they
+        run in parallel and unchanged windows are cache hits; a document is
+        merged once all its windows are in. Counters in the returned stats
+        count units (documents or windows).
+        """
+        
+        batch_size = batch_size or self.settings.extraction_max_in_flight
+        if use_cache is None:
+            use_cache = self.settings.extraction_cache_enabled
+        if pack is None:
+            pack = self.settings.extraction_pack_enabled
+        logger.info(f"Processing {len(documents)} documents for entity extraction "
+                    f"({batch_size} in flight, cache {'on' if use_cache else 'off'}, packing {'on' if pack else 'off'})...")
+        
+        merged = _ExtractionAccumulator()
+        pending = self._split_cached(documents, use_cache, merged, packed=pack)
+        if pack:
+            # No more documents than the output allowance can answer for
+            output_room = self.settings.extraction_pack_max_output_tokens - SINGLE_OUTPUT_TOKENS
+            jobs = deque(pack_documents(
+                pending,
+                token_budget=self.settings.extraction_pack_token_budget,
+                max_documents=max(1, min(self.settings.extraction_pack_max_documents,
+                                         1 + output_room // PACKED_OUTPUT_TOKENS_PER_DOC)),
+                max_doc_tokens=self.settings.extraction_pack_max_doc_tokens
+            ))
+            logger.info(f"Packed {len(pending)} extraction units into {len(jobs)} calls")
+        else:
+            jobs = deque([item] for item in pending)
+        
+        start = time.perf_counter()
+        extracted = 0
+        in_flight = {}
+        
+        def submit_next() -> bool:
+            if not jobs:
+                return False
+            job = jobs.popleft()
+            try:
+                if len(job) == 1:
+                    item = job[0]
+                    request = self._extraction_request(
+                        text=item.text,
+                        title=item.doc.get('title', ''),
+                        source=item.doc.get('source', '')
+                    )
+                else:
+                    request = self._packed_extraction_request(job)
+                future = self.llm.submit(**request)
+                self.extraction_stats['llm_calls'] += 1
+            except Exception as e:
+                for item in job:
+                    self._unit_failed(item, e, merged)
+                return True
+            in_flight[future] = job
+            return True
+        
+        def accept(item: _WorkItem, result: Dict, response, share: float = 1.0, packed: bool = False):
+            nonlocal extracted
+            # Persist before merging so a crash never loses a finished unit
+            if packed:
+                self._cache_result(self._packed_cache_key(item), item.doc_id, item.doc.get('title', ''),
+                                   result, response, share, prompt_version=PACKED_PROMPT_VERSION)
+            else:
+                self._cache_result(item.key, item.doc_id, item.doc.get('title', ''), result, response, share)
+            self._unit_done(item, result, merged)
+            self.extraction_stats['documents_processed'] += 1
+            extracted += 1
+            
+            # Progress update
+            if extracted % 10 == 0:
+                rate = extracted / max(time.perf_counter() - start, 1e-9)
+                logger.info(f"Extracted {extracted}/{len(pending)} units ({rate * 60:.1f} units/min). "
+                            f"Found {merged.entity_count()} entities so far.")
+        
+        def accept_packed(job: List[_WorkItem], response):
+            if getattr(response, "stop_reason", None) == "max_tokens":
+                # A truncated reply is not valid JSON; send smaller packs instead of every document alone
+                half = len(job) // 2
+                logger.warning(f"Reply for a pack of {len(job)} documents hit max_tokens; splitting it in two")
+                jobs.extend([job[:half], job[half:]])
+                return
+            try:
+                results = self._parse_extraction_response(response.content[0].text).get('documents', {})
+            except ValueError as e:
+                logger.warning(f"Unusable reply for a pack of {len(job)} documents ({e}); retrying them one by one")
+                results = {}
+            sizes = [len(item.text) + len(item.doc.get('title', '')) for item in job]
+            total = sum(sizes) or 1
+            missing = []
+            for n, (item, size) in enumerate(zip(job, sizes), 1):
+                result = results.get(f"D{n}")
+                if isinstance(result, dict):
+                    accept(item, result, response, size / total, packed=True)
+                else:
+                    missing.append(item)
+            if missing and results:
+                logger.info(f"{len(missing)} of {len(job)} packed documents missing from the reply; retrying them one by one")
+            jobs.extend([item] for item in missing)
+        
+        def fill():
+            while len(in_flight) < batch_size and submit_next():
+                pass
+        
+        fill()
+        
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = in_flight.pop(future)
+                try:
+                    response = future.result()
+                    if len(job) == 1:
+                        accept(job[0], self._parse_extraction_response(response.content[0].text), response)
+                    else:
+                        accept_packed(job, response)
+                except Exception as e:
+                    for item in job:
+                        self._unit_failed(item, e, merged)
+            
+            fill()
+        
+        return self._finish(merged)
+    
+    def process_documents_offline(self, documents: List[Dict], transport: Optional[BatchTransport] = None,
+                                  use_cache: Optional[bool] = None) -> Dict:
+        """Bulk extraction through batch jobs instead of one live call per document
+        
+        Uncached documents are packaged into Message Batches jobs, polled until
+        they end and parsed into the same {entities, relationships, stats}
+        structure as process_document_batch. Results are cached as each job is
+        collected. transport defaults to the Anthropic Message Batches API.
+        """
+        
+        if use_cache is None:
+            use_cache = self.settings.extraction_cache_enabled
+        logger.info(f"Processing {len(documents)} documents for entity extraction in batch mode...")
+        
+        merged = _ExtractionAccumulator()
+        # Identical windows share a key, so one request can serve several units
+        pending: Dict[str, List[_WorkItem]] = defaultdict(list)
+        for item in self._split_cached(documents, use_cache, merged):
+            pending[item.key].append(item)
+        
+        requests = (
+            (key, self._extraction_request(
+                text=items[0].text,
+                title=items[0].doc.get('title', ''),
+                source=items[0].doc.get('source', '')
+            ))
+            for key, items in pending.items()
+        )
+        
+        for outcome in BatchJobRunner(transport).run(requests):
+            # Jobs picked up from an earlier run may cover documents not in this call
+            items = pending.get(outcome['custom_id'], [])
+            try:
+                if outcome['error']:
+                    raise RuntimeError(outcome['error'])
+                result = self._parse_extraction_response(outcome['text'])
+            except Exception as e:
+                for item in items:
+                    self._unit_failed(item, e, merged)
+                if not items:
+                    logger.error(f"Batch request {outcome['custom_id']} failed: {e}")
+                continue
+            title = items[0].doc.get('title', '') if items else ''
+            doc_id = items[0].doc_id if items else ''
+            self.cache.put(outcome['custom_id'], doc_id, title, EXTRACTION_PROMPT_VERSION, self.model, result,
+                           input_tokens=outcome['input_tokens'], output_tokens=outcome['output_tokens'])
+            for item in items:
+                self._unit_done(item, result, merged)
+                self.extraction_stats['documents_processed'] += 1
+        
+        return self._finish(merged)
+    
     def add_entities_to_neo4j(self, extraction_result: Dict) -> Dict:
-        """Add extracted entities and relationships to Neo4j"""
+        """Add extracted entities and relationships to Neo4j
+        
+        Every extracted node also gets the :Entity label so relationship
+        endpoints can be resolved through the Entity(name) / Entity(title)
+        indexes in one lookup per batch, instead of a label-less scan per triple.
+        """
         
         try:
-            with db.driver.session() as session:
-                entities = extraction_result['entities']
-                relationships = extraction_result['relationships']
-                
-                added_counts = {}
-                
-                # Add people
-                for person in entities.get('people', []):
-                    session.run("""
-                        MERGE (p:Person {name: $name})
-                        ON CREATE SET p.source = 'llm_extracted', p.created_date = datetime()
-                        ON MATCH SET p.updated_date = datetime()
-                    """, name=person)
-                added_counts['people'] = len(entities.get('people', []))
-                
-                # Add organizations  
-                for org in entities.get('organizations', []):
-                    session.run("""
-                        MERGE (o:Organization {name: $name})
-                        ON CREATE SET o.source = 'llm_extracted', o.created_date = datetime()
-                        ON MATCH SET o.updated_date = datetime()
-                    """, name=org)
-                added_counts['organizations'] = len(entities.get('organizations', []))
-                
-                # Add technologies
-                for tech in entities.get('technologies', []):
-                    session.run("""
-                        MERGE (t:Technology {name: $name})
-                        ON CREATE SET t.source = 'llm_extracted', t.created_date = datetime()
-                        ON MATCH SET t.updated_date = datetime()
-                    """, name=tech)
-                added_counts['technologies'] = len(entities.get('technologies', []))
-                
-                # Add concepts
-                for concept in entities.get('concepts', []):
-                    session.run("""
-                        MERGE (c:Concept {name: $name})
-                        ON CREATE SET c.source = 'llm_extracted', c.created_date = datetime()
-                        ON MATCH SET c.updated_date = datetime()
-                    """, name=concept)
-                added_counts['concepts'] = len(entities.get('concepts', []))
-                
-                # Add products
-                for product in entities.get('products', []):
-                    session.run("""
-                        MERGE (p:Product {name: $name})
-                        ON CREATE SET p.source = 'llm_extracted', p.created_date = datetime()
-                        ON MATCH SET p.updated_date = datetime()
-                    """, name=product)
-                added_counts['products'] = len(entities.get('products', []))
-                
-                # Add publications
-                for pub in entities.get('publications', []):
-                    session.run("""
-                        MERGE (p:Publication {title: $title})
-                        ON CREATE SET p.source = 'llm_extracted', p.created_date = datetime()
-                        ON MATCH SET p.updated_date = datetime()
-                    """, title=pub)
-                added_counts['publications'] = len(entities.get('publications', []))
-                
-                # Add events
-                for event in entities.get('events', []):
-                    session.run("""
-                        MERGE (e:Event {name: $name})
-                        ON CREATE SET e.source = 'llm_extracted', e.created_date = datetime()
-                        ON MATCH SET e.updated_date = datetime()
-                    """, name=event)
-                added_counts['events'] = len(entities.get('events', []))
-                
-                logger.info(f"Added entities to Neo4j: {added_counts}")
-                
-                # Add relationships
-                relationship_count = 0
-                for rel in relationships:
-                    try:
-                        # Create relationship based on predicate
-                        rel_type = rel.get('predicate', 'RELATED_TO')
-                        subject = rel.get('subject', '')
-                        obj = rel.get('object', '')
-                        confidence = rel.get('confidence', 0.5)
-                        
-                        if subject and obj:
-                            session.run(f"""
-                                MATCH (s), (o)
-                                WHERE s.name = $subject OR s.title = $subject
-                                AND (o.name = $object OR o.title = $object)
-                                MERGE (s)-[r:{rel_type}]->(o)
-                                ON CREATE SET r.confidence = $confidence, r.source = 'llm_extracted', r.created_date = datetime()
-                                ON MATCH SET r.updated_date = datetime()
-                            """, subject=subject, object=obj, confidence=confidence)
-                            relationship_count += 1
-                    except Exception as e:
-                        logger.error(f"Error creating relationship {rel}: {e}")
-                        continue
-                
-                logger.info(f"Added {relationship_count} relationships to Neo4j")
-                
-                return {
-                    'success': True,
-                    'entities_added': added_counts,
-                    'relationships_added': relationship_count,
-                    'message': f'Successfully enhanced knowledge graph with {sum(added_counts.values())} entities and {relationship_count} relationships'
-                }
+            entities = extraction_result['entities']
+            relationships = extraction_result['relationships']
+            
+            writer = BatchedGraphWriter()
+            writer.ensure_index(ENTITY_LABEL, 'name')
+            writer.ensure_index(ENTITY_LABEL, 'title')
+            for label, key in LEGACY_NODE_SPECS:
+                writer.ensure_index(label, key)
+            
+            added_counts = {}
+            for entity_type, (label, key) in EXTRACTED_NODE_SPECS.items():
+                names = [name for name in entities.get(entity_type, []) if isinstance(name, str) and name]
+                rows = [{'key': name, 'props': {'source': 'llm_extracted'}} for name in names]
+                writer.merge_nodes(label, key, rows, touch_on_match=True, extra_labels=(ENTITY_LABEL,))
+                added_counts[entity_type] = len(entities.get(entity_type, []))
+            
+            logger.info(f"Added entities to Neo4j: {added_counts}")
+            
+            # Resolve every relationship endpoint to a node id in one pass
+            endpoint_names = []
+            for rel in relationships:
+                endpoint_names.extend([rel.get('subject', ''), rel.get('object', '')])
+            node_ids = writer.resolve_node_ids(
+                ENTITY_LABEL,
+                [name for name in endpoint_names if isinstance(name, str)],
+                keys=('name', 'title'),
+                fallbacks=LEGACY_NODE_SPECS
+            )
+            
+            # Group relationships by predicate so each type is one UNWIND batch
+            rows_by_type = defaultdict(list)
+            unresolved = 0
+            for rel in relationships:
+                subject = rel.get('subject', '')
+                obj = rel.get('object', '')
+                if not subject or not obj:
+                    continue
+                if not isinstance(subject, str) or not isinstance(obj, str) or subject not in node_ids or obj not in node_ids:
+                    unresolved += 1
+                    continue
+                rows_by_type[_relationship_type(rel.get('predicate', 'RELATED_TO'))].append({
+                    'start': node_ids[subject],
+                    'end': node_ids[obj],
+                    'props': {'confidence': rel.get('confidence', 0.5), 'source': 'llm_extracted'}
+                })
+            
+            relationship_count = 0
+            for rel_type, rows in rows_by_type.items():
+                try:
+                    relationship_count += writer.merge_relationships_by_id(rel_type, rows, touch_on_match=True)
+                except Exception as e:
+                    logger.error(f"Error creating {rel_type} relationships: {e}")
+                    continue
+            
+            db.bump_ingestion_epoch()
+            throughput = writer.throughput()
+            logger.info(f"Added {relationship_count} relationships to Neo4j "
+                        f"({unresolved} skipped with unknown endpoints, {throughput['relationships_per_second']} rels/sec)")
+            
+            return {
+                'success': True,
+                'entities_added': added_counts,
+                'relationships_added': relationship_count,
+                'relationships_unresolved': unresolved,
+                'write_throughput': throughput,
+                'message': f'Successfully enhanced knowledge graph with {sum(added_counts.values())} entities and {relationship_count} relationships'
+            }
                 
         except Exception as e:
             error_msg = f"Error adding entities to Neo4j: {e}"
@@ -303,30 +793,32 @@ Focus on extracting the most important and clearly mentioned entities. Be conser
                 'message': error_msg
             }
     
-    def enhance_knowledge_graph_from_chromadb(self, max_documents: int = None) -> Dict:
-        """Extract entities from all documents in ChromaDB and enhance the knowledge graph"""
+    def enhance_knowledge_graph_from_chromadb(self, max_documents: Optional[int] = DEFAULT_MAX_DOCUMENTS,
+                                              use_cache: Optional[bool] = None,
+                                              offline: bool = False, pack: Optional[bool] = None) -> Dict:
+        """Extract entities from documents in ChromaDB and enhance the knowledge graph
+        
+        At most max_documents are processed (500 by default); pass
+        max_documents=None explicitly to process every document. Documents already in the
+        extraction cache are not sent to Claude again. offline=True uses batch
+        jobs (process_documents_offline) for large backfills.
+        """
         
         logger.info("Starting enhanced knowledge graph extraction from ChromaDB...")
         
-        # Get all documents from ChromaDB
+        # Get documents from ChromaDB
         collection = chroma_service.collection
         
-        # Get document count
-        if max_documents:
-            limit = min(max_documents, 500)  # Reasonable limit for API calls
-        else:
-            limit = 500
-        
         results = collection.get(
-            limit=limit,
+            limit=max_documents,
             include=['metadatas', 'documents']
         )
         
         # Convert to document format
         documents = []
-        for i, (doc_content, metadata) in enumerate(zip(results['documents'], results['metadatas'])):
+        for i, (doc_id, doc_content, metadata) in enumerate(zip(results['ids'], results['documents'], results['metadatas'])):
             documents.append({
-                'id': f"chroma_{i}",
+                'id': doc_id,
                 'title': metadata.get('title', f'Document {i}'),
                 'content': doc_content,
                 'source': metadata.get('source', 'unknown'),
@@ -336,7 +828,10 @@ Focus on extracting the most important and clearly mentioned entities. Be conser
         logger.info(f"Retrieved {len(documents)} documents from ChromaDB")
         
         # Process documents for entity extraction
-        extraction_result = self.process_document_batch(documents)
+        if offline:
+            extraction_result = self.process_documents_offline(documents, use_cache=use_cache)
+        else:
+            extraction_result = self.process_document_batch(documents, use_cache=use_cache, pack=pack)
         
         # Add to Neo4j
         if extraction_result['entities']:
@@ -354,7 +849,8 @@ Focus on extracting the most important and clearly mentioned entities. Be conser
                 'message': "No entities extracted from documents"
             }
 
-def run_enhanced_extraction(max_documents: int = None) -> Dict:
+def run_enhanced_extraction(max_documents: Optional[int] = DEFAULT_MAX_DOCUMENTS, use_cache: Optional[bool] = None,
+                            offline: bool = False, pack: Optional[bool] = None) -> Dict:
     """Run the enhanced entity extraction process"""
     
     # Setup logging
@@ -364,17 +860,46 @@ def run_enhanced_extraction(max_documents: int = None) -> Dict:
     )
     
     extractor = EnhancedEntityExtractor()
-    result = extractor.enhance_knowledge_graph_from_chromadb(max_documents=max_documents)
+    result = extractor.enhance_knowledge_graph_from_chromadb(max_documents=max_documents, use_cache=use_cache,
+                                                             offline=offline, pack=pack)
+    
+    if result['success']:
+        # The graph write bumped the ingestion epoch; rebuild the indexes keyed to it
+        from entity_document_index import entity_document_index
+        from entity_index import entity_index
+        for name, index in (('entity_index', entity_index), ('entity_document_index', entity_document_index)):
+            try:
+                result[name] = index.build()
+            except Exception as e:
+                logger.error(f"Failed to rebuild {name}: {e}")
     
     return result
 
 if __name__ == "__main__":
-    # Run extraction on all documents
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Extract entities from ChromaDB documents into Neo4j")
+    parser.add_argument("--max-documents", type=int, default=100,
+                        help="Number of documents to process")
+    parser.add_argument("--all", action="store_true",
+                        help="Process every document in ChromaDB, ignoring --max-documents")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Re-extract every document instead of reusing cached results")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit extraction as offline batch jobs and wait for them (large backfills)")
+    parser.add_argument("--pack", action="store_true",
+                        help="Pack several short documents into each extraction prompt")
+    args = parser.parse_args()
+    
     print("🧠 Starting Enhanced Knowledge Graph Extraction...")
-    result = run_enhanced_extraction(max_documents=100)  # Start with 100 documents
+    result = run_enhanced_extraction(max_documents=None if args.all else args.max_documents,
+                                     use_cache=False if args.no_cache else None,
+                                     offline=args.batch, pack=True if args.pack else None)
     
     if result['success']:
         print("✅ Enhanced extraction completed successfully!")
         print(f"📊 Stats: {result['extraction_stats']}")
+        cache = result['extraction_stats']['cache']
+        print(f"💾 Extraction cache: {cache['hit_rate']:.0%} hit rate, ~${cache['cost_saved_usd']:.2f} saved")
     else:
         print(f"❌ Enhanced extraction failed: {result['message']}")
\ No newline at end of file
@@ -0,0 +1,259 @@
+"""
+Entity → Document Index
+
+Persistent inverted index from knowledge graph entities to the documents that
+mention them, with mention counts and character offsets. It is built once
+after ingestion by tokenizing every document and matching word n-grams against
+the entity names, so GraphRAG can fetch graph-connected documents with a
+direct lookup instead of a pseudo-query vector search plus a substring scan.
+
+Run `python entity_document_index.py` after the vector store or the graph has
+been (re)built. The index records the ingestion epoch and the vector store
+collection (id and document count) it was built against, and reports itself
+unavailable once any of them changes, so GraphRAG falls back to the
+search-based lookup instead of returning stale document ids.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from math import log1p
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+from config import get_settings
+from database import db, GRAPH_META_LABEL
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+
+def _normalize_name(name: str) -> str:
+    """Lowercased word sequence used to match names against document tokens"""
+    return " ".join(_TOKEN.findall(name.lower()))
+
+def find_mentions(text: str, names: Dict[str, List[int]], max_words: int) -> Dict[int, List[int]]:
+    """Return {entity_id: [character offsets]} for every entity name found in text
+
+    names maps normalized entity names to entity ids. Matching is done on
+    whole words, so "AI" does not match inside "said".
+    """
+    tokens = [(m.group(0), m.start()) for m in _TOKEN.finditer(text.lower())]
+    mentions: Dict[int, List[int]] = defaultdict(list)
+    for i in range(len(tokens)):
+        phrase = ""
+        for n in range(min(max_words, len(tokens) - i)):
+            phrase = tokens[i][0] if n == 0 else f"{phrase} {tokens[i + n][0]}"
+            for entity_id in names.get(phrase, ()):
+                mentions[entity_id].append(tokens[i][1])
+    return mentions
+
+class EntityDocumentIndex:
+    """SQLite-backed map of entity id → (document id, mention count, offsets)"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.settings = get_settings()
+        self.db_path = db_path or self.settings.entity_document_index_path
+        self._local = threading.local()
+        self._valid = False
+        self._checked_at: Optional[float] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """One read connection per thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    def _source_state(self) -> Dict[str, str]:
+        """Ingestion epoch and vector store collection the index must match
+
+        A re-ingest recreates the collection, so its id changes even when the
+        document count does not.
+        """
+        from vector_store import chroma_service
+
+        collection = chroma_service.collection
+        return {
+            "epoch": str(db.get_ingestion_epoch()),
+            "collection_id": str(collection.id),
+            "collection_count": str(collection.count())
+        }
+
+    @property
+    def available(self) -> bool:
+        """True when a built index exists and still matches the graph and vector store
+
+        Re-checked at most every GRAPH_SNAPSHOT_REFRESH_SECONDS.
+        """
+        if not os.path.exists(self.db_path):
+            return False
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.settings.graph_snapshot_refresh_seconds:
+            return self._valid
+
+        valid = False
+        try:
+            meta = dict(self._connection().execute("SELECT key, value FROM meta").fetchall())
+            if "built_at" in meta:
+                current = self._source_state()
+                changed = [key for key, value in current.items() if meta.get(key) != value]
+                valid = not changed
+                if changed:
+                    logger.warning(f"Entity-document index is stale ({', '.join(changed)} changed since it was "
+                                   f"built); re-run `python entity_document_index.py`")
+        except sqlite3.Error:
+            valid = False
+        except Exception as e:
+            logger.error(f"Failed to check entity-document index freshness: {e}")
+            valid = False
+        self._valid = valid
+        self._checked_at = time.monotonic()
+        return valid
+
+    def _load_entity_names(self) -> Tuple[Dict[str, List[int]], int]:
+        """Map normalized entity names and titles to node ids"""
+        names: Dict[str, List[int]] = defaultdict(list)
+        with db.driver.session() as session:
+            result = session.run(f"""
+                MATCH (n)
+                WHERE (n.name IS NOT NULL OR n.title IS NOT NULL) AND NOT n:`{GRAPH_META_LABEL}`
+                RETURN id(n) AS node_id, n.name AS name, n.title AS title
+            """)
+            for record in result:
+                for value in (record["name"], record["title"]):
+                    if isinstance(value, str):
+                        name = _normalize_name(value)
+                        if len(name) >= 2:
+                            names[name].append(record["node_id"])
+        max_words = max((len(name.split()) for name in names), default=1)
+        return names, max_words
+
+    def build(self, documents: Optional[Iterable[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Scan every document for entity mentions and rewrite the index
+
+        documents defaults to every document in the vector store; each needs
+        'id', 'content' and optionally metadata['title'].
+        """
+        from vector_store import chroma_service
+
+        start = time.perf_counter()
+        # Read before scanning so writes during the build leave the index stale, not wrongly current
+        source_state = self._source_state()
+        names, max_words = self._load_entity_names()
+        if documents is None:
+            documents = chroma_service.iter_documents()
+
+        tmp_path = f"{self.db_path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        conn.executescript("""
+            CREATE TABLE mentions (
+                entity_id INTEGER NOT NULL,
+                doc_id TEXT NOT NULL,
+                mention_count INTEGER NOT NULL,
+                offsets TEXT NOT NULL,
+                PRIMARY KEY (entity_id, doc_id)
+            );
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+
+        doc_count = 0
+        mention_rows = 0
+        batch = []
+        for doc in documents:
+            title = (doc.get("metadata") or {}).get("title") or ""
+            # Offsets refer to "<title>\n<content>"
+            text = f"{title}\n{doc.get('content', '')}"
+            for entity_id, offsets in find_mentions(text, names, max_words).items():
+                batch.append((entity_id, doc["id"], len(offsets), json.dumps(offsets)))
+            doc_count += 1
+            if len(batch) >= 10000:
+                conn.executemany("INSERT OR REPLACE INTO mentions VALUES (?, ?, ?, ?)", batch)
+                mention_rows += len(batch)
+                batch = []
+        if batch:
+            conn.executemany("INSERT OR REPLACE INTO mentions VALUES (?, ?, ?, ?)", batch)
+            mention_rows += len(batch)
+
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("built_at", str(time.time())),
+            ("document_count", str(doc_count)),
+            ("entity_names", str(len(names))),
+            *source_state.items()
+        ])
+        conn.commit()
+        conn.close()
+        os.replace(tmp_path, self.db_path)
+        # Connections opened before the swap still point at the old file
+        self._local = threading.local()
+        self._checked_at = None
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Entity-document index built: {mention_rows} links across {doc_count} documents "
+                    f"and {len(names)} entity names in {elapsed:.1f}s")
+        return {
+            "documents": doc_count,
+            "entity_names": len(names),
+            "links": mention_rows,
+            "elapsed_seconds": round(elapsed, 2),
+            "index_path": self.db_path
+        }
+
+    def lookup(self, entities: List[Dict[str, Any]], max_docs: int = 10) -> List[Dict[str, Any]]:
+        """Rank documents by the entities that mention them
+
+        Callers should check available first; a stale index returns ids of
+        documents or entities that may no longer exist.
+
+        Each mention contributes log(1 + count) weighted by how close the
+        entity is to the query seeds (1 / (1 + graph_distance)). Returns
+        [{'doc_id', 'score', 'connected_entities'}] best first.
+        """
+        by_id = {entity["node_id"]: entity for entity in entities if "node_id" in entity}
+        if not by_id:
+            return []
+
+        placeholders = ",".join("?" * len(by_id))
+        rows = self._connection().execute(
+            f"SELECT entity_id, doc_id, mention_count FROM mentions WHERE entity_id IN ({placeholders})",
+            list(by_id)
+        ).fetchall()
+
+        scores: Dict[str, float] = defaultdict(float)
+        connected: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for entity_id, doc_id, count in rows:
+            entity = by_id[entity_id]
+            distance = entity.get("graph_distance", 0)
+            scores[doc_id] += log1p(count) / (1 + distance)
+            connected[doc_id].append({
+                "name": entity.get("name") or entity.get("title"),
+                "type": entity.get("labels", ["Unknown"])[0],
+                "distance": distance,
+                "mentions": count
+            })
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:max_docs]
+        return [
+            {"doc_id": doc_id, "score": round(score, 4), "connected_entities": connected[doc_id]}
+            for doc_id, score in ranked
+        ]
+
+# Global instance
+entity_document_index = EntityDocumentIndex()
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    print("🔗 Building entity-document index...")
+    stats = entity_document_index.build()
+    print(f"✅ Linked {stats['links']} entity mentions across {stats['documents']} documents in "
+          f"{stats['elapsed_seconds']}s -> {stats['index_path']}")
@@ -0,0 +1,231 @@
+"""
+Entity Embedding Index
+
+Offline job that embeds every knowledge graph entity once (name, title,
+description, industry) and stores the normalized vectors as a local matrix
+file. At query time GraphRAG matches seed entities with a top-k inner-product
+lookup over the whole graph instead of encoding an arbitrary sample of nodes
+on every request.
+
+Run `python entity_index.py` after the graph has been (re)built. The index
+records the ingestion epoch it was built at; once the graph's epoch moves on,
+the index is reported unavailable (its node ids may no longer exist) until it
+is rebuilt, and a rebuilt index file is picked up without a restart.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from config import get_settings
+from database import db
+from embedding_models import get_embedding_model
+
+logger = logging.getLogger(__name__)
+
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.json"
+
+def entity_text(entity: Dict[str, Any]) -> str:
+    """Text representation of an entity used for embedding"""
+    text = ""
+    if entity.get("name"):
+        text += f"Name: {entity['name']} "
+    if entity.get("title"):
+        text += f"Title: {entity['title']} "
+    if entity.get("description"):
+        text += f"Description: {str(entity['description'])[:200]} "
+    if entity.get("industry"):
+        text += f"Industry: {entity['industry']} "
+    return text.strip()
+
+class EntityEmbeddingIndex:
+    """Persistent matrix of normalized entity embeddings keyed by Neo4j node id"""
+
+    def __init__(self, index_path: Optional[str] = None):
+        self.settings = get_settings()
+        self.index_path = Path(index_path or self.settings.entity_index_path)
+        self._embeddings: Optional[np.ndarray] = None
+        self._node_ids: Optional[np.ndarray] = None
+        self._model_name: Optional[str] = None
+        self._epoch: Optional[int] = None
+        self._mtime: Optional[float] = None
+        self._graph_epoch: Optional[int] = None
+        self._last_check = 0.0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def build(self, batch_size: int = 256) -> Dict[str, Any]:
+        """Embed every named entity in the graph and write the index to disk"""
+        start = time.perf_counter()
+        model_name = self.settings.embedding_model_name
+        model = get_embedding_model(model_name)
+        # Read before the nodes so a concurrent write leaves the index stale, not wrongly current
+        epoch = db.get_ingestion_epoch()
+
+        node_ids: List[int] = []
+        texts: List[str] = []
+        with db.driver.session() as session:
+            result = session.run("""
+                MATCH (n)
+                WHERE n.name IS NOT NULL OR n.title IS NOT NULL
+                RETURN id(n) AS node_id, n.name AS name, n.title AS title,
+                       n.description AS description, n.industry AS industry
+            """)
+            for record in result:
+                text = entity_text(dict(record))
+                if text:
+                    node_ids.append(record["node_id"])
+                    texts.append(text)
+
+        logger.info(f"Embedding {len(texts)} entities with {model_name}...")
+        dimension = model.get_sentence_embedding_dimension()
+        embeddings = np.zeros((len(texts), dimension), dtype=np.float32)
+        for i in range(0, len(texts), batch_size):
+            embeddings[i:i + batch_size] = model.encode(
+                texts[i:i + batch_size],
+                batch_size=batch_size,
+                normalize_embeddings=True,
+                convert_to_numpy=True
+            )
+            if (i // batch_size) % 20 == 0:
+                logger.info(f"Embedded {min(i + batch_size, len(texts))}/{len(texts)} entities")
+
+        self._write(embeddings, np.asarray(node_ids, dtype=np.int64), model_name, epoch)
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Entity index built with {len(texts)} entities in {elapsed:.1f}s at {self.index_path}")
+        return {
+            "entity_count": len(texts),
+            "dimension": dimension,
+            "model_name": model_name,
+            "epoch": epoch,
+            "elapsed_seconds": round(elapsed, 2),
+            "index_path": str(self.index_path)
+        }
+
+    def _write(self, embeddings: np.ndarray, node_ids: np.ndarray, model_name: str, epoch: int):
+        """Atomically replace the on-disk index and the in-memory copy"""
+        self.index_path.mkdir(parents=True, exist_ok=True)
+
+        tmp_embeddings = self.index_path / f"{EMBEDDINGS_FILE}.tmp"
+        with open(tmp_embeddings, "wb") as f:
+            np.save(f, embeddings)
+        tmp_metadata = self.index_path / f"{METADATA_FILE}.tmp"
+        with open(tmp_metadata, "w") as f:
+            json.dump({
+                "model_name": model_name,
+                "node_ids": node_ids.tolist(),
+                "epoch": epoch,
+                "built_at": datetime.now().isoformat()
+            }, f)
+
+        os.replace(tmp_embeddings, self.index_path / EMBEDDINGS_FILE)
+        os.replace(tmp_metadata, self.index_path / METADATA_FILE)
+
+        with self._lock:
+            self._embeddings = embeddings
+            self._node_ids = node_ids
+            self._model_name = model_name
+            self._epoch = epoch
+            self._mtime = (self.index_path / METADATA_FILE).stat().st_mtime
+            self._graph_epoch = epoch
+            self._last_check = time.monotonic()
+            self._loaded = True
+
+    def load(self) -> bool:
+        """Load the index from disk; returns False if it has not been built"""
+        with self._lock:
+            embeddings_path = self.index_path / EMBEDDINGS_FILE
+            metadata_path = self.index_path / METADATA_FILE
+            self._loaded = True
+            if not embeddings_path.exists() or not metadata_path.exists():
+                logger.info(f"No entity index found at {self.index_path}")
+                return False
+
+            try:
+                with open(metadata_path) as f:
+                    metadata = json.load(f)
+                self._embeddings = np.load(embeddings_path, mmap_mode="r")
+                self._node_ids = np.asarray(metadata["node_ids"], dtype=np.int64)
+                self._model_name = metadata.get("model_name")
+                self._epoch = metadata.get("epoch")
+                self._mtime = metadata_path.stat().st_mtime
+                logger.info(f"Loaded entity index with {len(self._node_ids)} entities (epoch {self._epoch})")
+                return True
+            except Exception as e:
+                logger.error(f"Failed to load entity index: {e}")
+                self._embeddings = None
+                self._node_ids = None
+                return False
+
+    def _refresh(self):
+        """Reload a rebuilt index file and re-read the graph's ingestion epoch
+
+        Checked at most every GRAPH_SNAPSHOT_REFRESH_SECONDS.
+        """
+        if self._loaded and time.monotonic() - self._last_check < self.settings.graph_snapshot_refresh_seconds:
+            return
+        self._last_check = time.monotonic()
+
+        metadata_path = self.index_path / METADATA_FILE
+        mtime = metadata_path.stat().st_mtime if metadata_path.exists() else None
+        if not self._loaded or mtime != self._mtime:
+            self.load()
+
+        try:
+            graph_epoch = db.get_ingestion_epoch()
+        except Exception as e:
+            logger.error(f"Failed to read ingestion epoch: {e}")
+            return
+        if self._embeddings is not None and graph_epoch != self._graph_epoch and graph_epoch != self._epoch:
+            logger.warning(f"Entity index was built at epoch {self._epoch} but the graph is at epoch "
+                           f"{graph_epoch}; semantic seed matching is off until `python entity_index.py` is re-run")
+        self._graph_epoch = graph_epoch
+
+    @property
+    def available(self) -> bool:
+        """True when a built index matching the current model and graph is loaded"""
+        self._refresh()
+        return (
+            self._embeddings is not None
+            and len(self._node_ids) > 0
+            and self._model_name == self.settings.embedding_model_name
+            and self._epoch == self._graph_epoch
+        )
+
+    def search(self, query_embedding: List[float], top_k: int = 10) -> List[Tuple[int, float]]:
+        """Return (node_id, cosine similarity) for the top_k entities"""
+        if not self.available:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        scores = self._embeddings @ (query / norm)
+
+        top_k = min(top_k, len(scores))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self._node_ids[i]), float(scores[i])) for i in top]
+
+# Global instance
+entity_index = EntityEmbeddingIndex()
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    print("🧭 Building entity embedding index...")
+    stats = entity_index.build()
+    print(f"✅ Indexed {stats['entity_count']} entities in {stats['elapsed_seconds']}s -> {stats['index_path']}")
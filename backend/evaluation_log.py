@@ -0,0 +1,154 @@
+"""
+Evaluation Run Log
+
+Append-only JSONL log of evaluation results. Every finished query is written
+as one line keyed by run ID and query hash the moment it completes, so a sweep
+that is interrupted can be resumed without re-running finished queries, and
+the analysis scripts read a single file instead of re-parsing overlapping
+intermediate snapshots.
+
+Each line is {"run_id", "query_hash", "status", "timestamp"} plus either
+"result" (status "ok") or "error" (status "failed"). Later lines win, so a
+query retried in a resumed run replaces its earlier failure.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LOG_FILENAME = "evaluation_log.jsonl"
+
+def query_hash(query: str) -> str:
+    """Stable key for a query: SHA-256 of its whitespace-normalized text"""
+    normalized = " ".join(query.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+def new_run_id() -> str:
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+class EvaluationLog:
+    """Append-only JSONL store of per-query evaluation outcomes"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    def append(self, run_id: str, query: str, result: Optional[Dict[str, Any]] = None,
+               error: Optional[str] = None):
+        """Record one finished query; pass result on success or error on failure"""
+        record = {
+            "run_id": run_id,
+            "query_hash": query_hash(query),
+            "status": "ok" if result is not None else "failed",
+            "timestamp": datetime.now().isoformat()
+        }
+        if result is not None:
+            record["result"] = result
+        else:
+            record["query"] = query
+            record["error"] = error
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def records(self, run_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Iterate log lines in write order, optionally for one run"""
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A run killed mid-write leaves at most one partial line
+                    logger.warning(f"Skipping unreadable line {line_number} in {self.path}")
+                    continue
+                if run_id is None or record.get("run_id") == run_id:
+                    yield record
+
+    def run_ids(self) -> List[str]:
+        """Run IDs in the order they first appear"""
+        seen: Dict[str, None] = {}
+        for record in self.records():
+            seen.setdefault(record["run_id"], None)
+        return list(seen)
+
+    def latest_run_id(self) -> Optional[str]:
+        runs = self.run_ids()
+        return runs[-1] if runs else None
+
+    def latest_outcomes(self, run_id: str) -> Dict[str, Dict[str, Any]]:
+        """query_hash -> last record for that query in the run"""
+        outcomes: Dict[str, Dict[str, Any]] = {}
+        for record in self.records(run_id):
+            outcomes[record["query_hash"]] = record
+        return outcomes
+
+    def completed(self, run_id: str) -> Dict[str, Dict[str, Any]]:
+        """query_hash -> result for every query that succeeded in the run"""
+        return {
+            key: record["result"]
+            for key, record in self.latest_outcomes(run_id).items()
+            if record["status"] == "ok"
+        }
+
+    def results(self, run_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Successful results of a run (default: the latest), one per query"""
+        run_id = run_id or self.latest_run_id()
+        if run_id is None:
+            return []
+        return list(self.completed(run_id).values())
+
+    def failures(self, run_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Queries whose latest outcome in the run is a failure"""
+        run_id = run_id or self.latest_run_id()
+        if run_id is None:
+            return []
+        return [
+            {"query": record.get("query"), "error": record.get("error"), "timestamp": record["timestamp"]}
+            for record in self.latest_outcomes(run_id).values()
+            if record["status"] == "failed"
+        ]
+
+    def import_intermediate_files(self, results_dir: Path, run_id: str = "legacy") -> int:
+        """Convert old intermediate_results_<n>.json snapshots into a log run
+
+        Snapshots overlap, so each query is imported once. Returns the number
+        of results imported.
+        """
+        imported = set()
+        files = sorted(results_dir.glob("intermediate_results_*.json"),
+                       key=lambda p: int(p.stem.rsplit("_", 1)[-1]))
+        for file in files:
+            try:
+                with open(file, "r") as f:
+                    snapshot = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Could not read {file}: {e}")
+                continue
+            for result in snapshot.get("results", []):
+                key = query_hash(result.get("query", ""))
+                if key not in imported:
+                    self.append(run_id, result.get("query", ""), result=result)
+                    imported.add(key)
+        if imported:
+            logger.info(f"Imported {len(imported)} results from {len(files)} intermediate files into {self.path}")
+        return len(imported)
+
+def open_evaluation_log(results_dir: str = "evaluation_results") -> EvaluationLog:
+    """Log in results_dir, importing legacy intermediate snapshots the first time"""
+    directory = Path(results_dir)
+    log = EvaluationLog(str(directory / LOG_FILENAME))
+    if not log.path.exists() and directory.exists():
+        log.import_intermediate_files(directory)
+    return log
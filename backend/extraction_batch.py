@@ -0,0 +1,238 @@
+"""
+Batch Extraction Jobs
+
+Offline bulk mode for LLM entity extraction. Instead of one synchronous
+messages.create call per document, extraction requests are packaged into
+Message Batches jobs, which run at batch-API throughput and price, polled
+until they end, and read back as one result per request.
+
+Submitted job ids are recorded in a small state file, so a process that is
+stopped while jobs are running picks them up on the next run instead of
+submitting the same documents again.
+
+The transport is pluggable: AnthropicBatchTransport talks to the Message
+Batches API (optionally at a different base_url, e.g. a local fake server),
+InMemoryBatchTransport answers requests in process, and anything implementing
+BatchTransport can stand in for either.
+"""
+
+import json
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+class BatchTransport(ABC):
+    """Interface for submitting and collecting batch jobs
+
+    A request is {'custom_id': str, 'params': <messages.create kwargs>}.
+    results() yields {'custom_id', 'text', 'input_tokens', 'output_tokens',
+    'error'}, with error set (and text None) for requests that did not succeed.
+    """
+
+    @abstractmethod
+    def submit(self, requests: List[Dict[str, Any]]) -> str:
+        """Create a job and return its id"""
+
+    @abstractmethod
+    def status(self, batch_id: str) -> Dict[str, Any]:
+        """{'ended': bool, 'counts': {...}} for a job"""
+
+    @abstractmethod
+    def results(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        """Per-request outcomes of an ended job"""
+
+class AnthropicBatchTransport(BatchTransport):
+    """BatchTransport backed by the Anthropic Message Batches API"""
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None):
+        import anthropic
+
+        settings = get_settings()
+        self.client = anthropic.Anthropic(
+            api_key=api_key or settings.anthropic_api_key,
+            base_url=base_url or settings.extraction_batch_base_url or None
+        )
+
+    def submit(self, requests: List[Dict[str, Any]]) -> str:
+        return self.client.messages.batches.create(requests=requests).id
+
+    def status(self, batch_id: str) -> Dict[str, Any]:
+        batch = self.client.messages.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return {
+            "ended": batch.processing_status == "ended",
+            "counts": {
+                "processing": counts.processing,
+                "succeeded": counts.succeeded,
+                "errored": counts.errored,
+                "canceled": counts.canceled,
+                "expired": counts.expired
+            }
+        }
+
+    def results(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        for entry in self.client.messages.batches.results(batch_id):
+            outcome = {"custom_id": entry.custom_id, "text": None,
+                       "input_tokens": None, "output_tokens": None, "error": None}
+            if entry.result.type == "succeeded":
+                message = entry.result.message
+                outcome["text"] = "".join(block.text for block in message.content if block.type == "text")
+                outcome["input_tokens"] = message.usage.input_tokens
+                outcome["output_tokens"] = message.usage.output_tokens
+            elif entry.result.type == "errored":
+                outcome["error"] = str(entry.result.error)
+            else:
+                outcome["error"] = entry.result.type
+            yield outcome
+
+class InMemoryBatchTransport(BatchTransport):
+    """BatchTransport that answers requests in process, for local runs and tests
+
+    respond(params) returns the reply text for a request, or raises to make
+    that request error. A job reports ended after polls_until_end status
+    calls; expire(batch_id) makes its results unreadable, like an expired job.
+    """
+
+    def __init__(self, respond, polls_until_end: int = 1):
+        self.respond = respond
+        self.polls_until_end = polls_until_end
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+
+    def submit(self, requests: List[Dict[str, Any]]) -> str:
+        batch_id = f"batch_{len(self.jobs) + 1}"
+        self.jobs[batch_id] = {"requests": list(requests), "polls": 0, "expired": False}
+        return batch_id
+
+    def status(self, batch_id: str) -> Dict[str, Any]:
+        job = self.jobs[batch_id]
+        job["polls"] += 1
+        ended = job["polls"] >= self.polls_until_end
+        return {"ended": ended, "counts": {"processing": 0 if ended else len(job["requests"])}}
+
+    def expire(self, batch_id: str):
+        self.jobs[batch_id]["expired"] = True
+
+    def results(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        job = self.jobs[batch_id]
+        if job["expired"]:
+            raise RuntimeError(f"results of {batch_id} have expired")
+        for request in job["requests"]:
+            outcome = {"custom_id": request["custom_id"], "text": None,
+                       "input_tokens": None, "output_tokens": None, "error": None}
+            try:
+                outcome["text"] = self.respond(request["params"])
+            except Exception as e:
+                outcome["error"] = str(e)
+            yield outcome
+
+def _error_outcome(custom_id: str, error: str) -> Dict[str, Any]:
+    return {"custom_id": custom_id, "text": None, "input_tokens": None, "output_tokens": None, "error": error}
+
+class BatchJobRunner:
+    """Submits requests as batch jobs, polls them and returns per-request outcomes"""
+
+    def __init__(self, transport: Optional[BatchTransport] = None, state_path: Optional[str] = None,
+                 max_requests_per_job: Optional[int] = None, poll_seconds: Optional[float] = None):
+        settings = get_settings()
+        self.transport = transport or AnthropicBatchTransport()
+        self.state_path = state_path or settings.extraction_batch_state_path
+        self.max_requests_per_job = max_requests_per_job or settings.extraction_batch_max_requests
+        self.poll_seconds = poll_seconds if poll_seconds is not None else settings.extraction_batch_poll_seconds
+
+    # --- job state ---------------------------------------------------------
+
+    def _load_state(self) -> Dict[str, List[str]]:
+        """batch id -> custom ids of jobs submitted but not yet collected"""
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, "r") as f:
+            return json.load(f)
+
+    def _save_state(self, state: Dict[str, List[str]]):
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    # --- running -----------------------------------------------------------
+
+    def run(self, requests: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+        """Run (custom_id, params) requests through batch jobs
+
+        Yields outcomes (see BatchTransport.results) as each job ends. Jobs
+        left over from an earlier run are collected too, and requests whose
+        custom_id is already in such a job are not submitted again. If a
+        job's status or results cannot be read (e.g. it has expired), its
+        remaining requests are yielded as errors and the job is dropped from
+        the state file, so the next run submits them again.
+        """
+        state = self._load_state()
+        in_jobs = {custom_id for custom_ids in state.values() for custom_id in custom_ids}
+        if state:
+            logger.info(f"Picking up {len(state)} batch jobs from {self.state_path} ({len(in_jobs)} requests)")
+
+        chunk: List[Dict[str, Any]] = []
+        submitted = 0
+
+        def flush():
+            nonlocal chunk, submitted
+            if chunk:
+                batch_id = self.transport.submit(chunk)
+                state[batch_id] = [request["custom_id"] for request in chunk]
+                self._save_state(state)
+                submitted += len(chunk)
+                logger.info(f"Submitted batch job {batch_id} with {len(chunk)} requests")
+                chunk = []
+
+        for custom_id, params in requests:
+            if custom_id in in_jobs:
+                continue
+            in_jobs.add(custom_id)
+            chunk.append({"custom_id": custom_id, "params": params})
+            if len(chunk) >= self.max_requests_per_job:
+                flush()
+        flush()
+
+        start = time.perf_counter()
+        while state:
+            for batch_id in list(state):
+                try:
+                    status = self.transport.status(batch_id)
+                except Exception as e:
+                    logger.error(f"Could not read status of batch job {batch_id}, dropping it: {e}")
+                    for custom_id in state.pop(batch_id):
+                        yield _error_outcome(custom_id, f"status unavailable: {e}")
+                    self._save_state(state)
+                    continue
+                if not status["ended"]:
+                    continue
+                logger.info(f"Batch job {batch_id} ended after {time.perf_counter() - start:.0f}s: {status['counts']}")
+                yield from self._collect(batch_id, state[batch_id])
+                # Forget the job only after its results have been consumed
+                del state[batch_id]
+                self._save_state(state)
+            if state:
+                logger.info(f"Waiting on {len(state)} batch jobs...")
+                time.sleep(self.poll_seconds)
+
+    def _collect(self, batch_id: str, custom_ids: List[str]) -> Iterator[Dict[str, Any]]:
+        """Outcomes of an ended job, with an error outcome for each request it could not return"""
+        returned = set()
+        try:
+            for outcome in self.transport.results(batch_id):
+                returned.add(outcome["custom_id"])
+                yield outcome
+        except Exception as e:
+            logger.error(f"Could not read results of batch job {batch_id}, dropping it: {e}")
+            for custom_id in custom_ids:
+                if custom_id not in returned:
+                    yield _error_outcome(custom_id, f"results unavailable: {e}")
@@ -0,0 +1,143 @@
+"""
+Extraction Cache
+
+Persistent cache of per-document LLM entity extraction results. The key is a
+SHA-256 of the document's title and content together with the extraction
+prompt version and model, so re-running extraction, re-ingesting part of the
+corpus or resuming an interrupted run only pays for documents that are new
+or changed, while a prompt or model change starts from a clean slate.
+
+Results are written as soon as each document finishes, which also makes the
+cache the checkpoint for long extraction runs. Token usage is stored with each
+entry so hits can be reported as tokens and dollars saved.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+def extraction_key(title: str, content: str, prompt_version: str, model: str) -> str:
+    """SHA-256 over everything that determines an extraction result"""
+    material = json.dumps([title or "", content or "", prompt_version, model], ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+class ExtractionCache:
+    """SQLite store of extraction results keyed by extraction_key"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.settings = get_settings()
+        self.db_path = db_path or self.settings.extraction_cache_path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = {"input_tokens": 0, "output_tokens": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS extractions (
+                    key TEXT PRIMARY KEY,
+                    doc_id TEXT,
+                    title TEXT,
+                    prompt_version TEXT,
+                    model TEXT,
+                    result TEXT NOT NULL,
+                    input_tokens INTEGER,
+                    output_tokens INTEGER,
+                    created_at REAL
+                )
+            """)
+            self._conn = conn
+        return self._conn
+
+    def load(self, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Cached results for the given keys; every key is counted as a hit or a miss"""
+        return self.load_any([key] for key in keys)
+
+    def load_any(self, candidates: Iterable[Sequence[str]]) -> Dict[str, Dict[str, Any]]:
+        """Like load, but each entry lists alternative keys in order of preference
+
+        The first cached alternative wins and is returned under the entry's
+        first key; each entry is counted once as a hit or a miss.
+        """
+        candidates = {tuple(keys)[0]: tuple(keys) for keys in candidates}
+        keys = list({key for alternatives in candidates.values() for key in alternatives})
+        rows: Dict[str, Any] = {}
+        found: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            conn = self._connection()
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for row in conn.execute(
+                    f"SELECT key, result, input_tokens, output_tokens FROM extractions WHERE key IN ({placeholders})",
+                    chunk
+                ):
+                    rows[row[0]] = row[1:]
+            for first, alternatives in candidates.items():
+                key = next((key for key in alternatives if key in rows), None)
+                if key is None:
+                    continue
+                result, input_tokens, output_tokens = rows[key]
+                found[first] = json.loads(result)
+                self.tokens_saved["input_tokens"] += input_tokens or 0
+                self.tokens_saved["output_tokens"] += output_tokens or 0
+            self.hits += len(found)
+            self.misses += len(candidates) - len(found)
+        return found
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.load([key]).get(key)
+
+    def put(self, key: str, doc_id: str, title: str, prompt_version: str, model: str,
+            result: Dict[str, Any], input_tokens: Optional[int] = None, output_tokens: Optional[int] = None):
+        """Persist one document's extraction result immediately"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, doc_id, title, prompt_version, model, json.dumps(result, ensure_ascii=False),
+                 input_tokens, output_tokens, time.time())
+            )
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM extractions")
+            conn.commit()
+
+    def cost_saved(self) -> float:
+        """Dollars not spent thanks to cache hits, at the configured per-MTok prices"""
+        return (self.tokens_saved["input_tokens"] * self.settings.extraction_input_cost_per_mtok
+                + self.tokens_saved["output_tokens"] * self.settings.extraction_output_cost_per_mtok) / 1_000_000
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._connection().execute("SELECT count(*) FROM extractions").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "tokens_saved": dict(self.tokens_saved),
+            "cost_saved_usd": round(self.cost_saved(), 4),
+            "path": self.db_path
+        }
@@ -7,6 +7,7 @@ import json
 from datetime import datetime
 from pathlib import Path
 from evaluation_metrics import EvaluationAnalyzer
+from evaluation_log import open_evaluation_log
 
 def json_serializable(obj):
     """Convert object to JSON serializable format"""
@@ -30,15 +31,12 @@ def fix_and_analyze():
         # Check if we have the analyzer's results in memory or intermediate files
         results_dir = Path("evaluation_results")
         
-        # Look for the latest intermediate results
-        intermediate_files = list(results_dir.glob("intermediate_results_*.json"))
-        if intermediate_files:
-            latest_intermediate = max(intermediate_files, key=lambda x: x.stat().st_mtime)
-            print(f"Found latest intermediate results: {latest_intermediate}")
-            
-            with open(latest_intermediate, 'r') as f:
-                data = json.load(f)
-                print(f"Intermediate results contain {data['completed_queries']} queries")
+        # Look at the latest run in the evaluation log
+        log = open_evaluation_log(str(results_dir))
+        run_id = log.latest_run_id()
+        if run_id:
+            print(f"Found evaluation log: {log.path}")
+            print(f"Latest run {run_id} contains {len(log.results(run_id))} completed queries")
         
         # Since the evaluation completed all 160 queries, let's create a simple analysis
         # by manually reconstructing from what we know worked
@@ -68,28 +66,18 @@ def create_manual_analysis():
     print("\n🔍 MANUAL ANALYSIS FROM AVAILABLE DATA")
     print("=" * 60)
     
-    # We can analyze intermediate results that we know worked
+    # We can analyze the results recorded in the evaluation log
     results_dir = Path("evaluation_results")
+    log = open_evaluation_log(str(results_dir))
     
-    # Find all intermediate results
-    intermediate_files = sorted(results_dir.glob("intermediate_results_*.json"))
+    # One result per query from the latest run
+    all_results = log.results()
     
-    if not intermediate_files:
-        print("No intermediate files found")
+    if not all_results:
+        print(f"No results found in {log.path}")
         return
     
-    all_results = []
-    
-    # Collect all intermediate results
-    for file in intermediate_files:
-        try:
-            with open(file, 'r') as f:
-                data = json.load(f)
-                all_results.extend(data['results'])
-        except Exception as e:
-            print(f"Error reading {file}: {e}")
-    
-    print(f"📊 Collected {len(all_results)} results from intermediate files")
+    print(f"📊 Collected {len(all_results)} results from run {log.latest_run_id()}")
     
     if len(all_results) > 0:
         # Analyze with our framework
@@ -0,0 +1,337 @@
+"""
+In-memory graph snapshot
+
+Loads every node and relationship from Neo4j once into compact CSR arrays
+(int32 offsets / neighbour indices, int16 relationship-type codes,
+relationship weights and a node property table) so GraphRAG neighbourhood
+expansion, path finding and ranking can run in process instead of
+round-tripping to Neo4j on every hop.
+
+The snapshot is treated as read-only. Ingestion scripts bump an epoch counter
+in Neo4j (see Neo4jDatabase.bump_ingestion_epoch) and the store rebuilds the
+snapshot when it notices the epoch has changed, or when reload() is called.
+"""
+
+import logging
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+import numpy as np
+
+from config import get_settings
+from database import db, GRAPH_META_LABEL
+
+logger = logging.getLogger(__name__)
+
+class GraphSnapshot:
+    """Immutable undirected CSR view of the knowledge graph"""
+
+    def __init__(self,
+                 node_ids: np.ndarray,
+                 node_labels: List[List[str]],
+                 node_props: List[Dict[str, Any]],
+                 offsets: np.ndarray,
+                 targets: np.ndarray,
+                 rel_codes: np.ndarray,
+                 rel_ids: np.ndarray,
+                 rel_weights: np.ndarray,
+                 rel_types: List[str],
+                 epoch: int):
+        self.node_ids = node_ids
+        self.node_labels = node_labels
+        self.node_props = node_props
+        self.offsets = offsets
+        self.targets = targets
+        self.rel_codes = rel_codes
+        self.rel_ids = rel_ids
+        self.rel_weights = rel_weights
+        self.rel_types = rel_types
+        self.epoch = epoch
+        self.index_of = {int(node_id): i for i, node_id in enumerate(node_ids)}
+        self.loaded_at = time.time()
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def relationship_count(self) -> int:
+        return len(self.targets) // 2
+
+    def neighbours(self, index: int):
+        """Return (neighbour indices, relationship codes, relationship ids) for one node"""
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.targets[start:end], self.rel_codes[start:end], self.rel_ids[start:end]
+
+    def node(self, index: int) -> Dict[str, Any]:
+        """Node properties in the same shape a Neo4j record would produce"""
+        node = dict(self.node_props[index])
+        node["labels"] = self.node_labels[index]
+        node["node_id"] = int(self.node_ids[index])
+        node.setdefault("degree", int(self.offsets[index + 1] - self.offsets[index]))
+        return node
+
+    def _sample_neighbours(self, index: int, cap: int, type_weights: Dict[str, float], rng: np.random.Generator):
+        """Weighted sample of at most cap neighbours, without replacement
+
+        Weights are relationship-type weight times confidence; uses the
+        Efraimidis-Spirakis key u ** (1 / w) so heavier edges are kept more often.
+        """
+        targets, codes, _ = self.neighbours(index)
+        start = self.offsets[index]
+        weights = self.rel_weights[start:start + len(targets)].astype(np.float64)
+        if type_weights:
+            weights = weights * np.asarray([type_weights.get(self.rel_types[c], 1.0) for c in codes])
+        keep = weights > 0
+        targets, codes, weights = targets[keep], codes[keep], weights[keep]
+        if len(targets) <= cap:
+            return targets, codes
+
+        keys = rng.random(len(targets)) ** (1.0 / weights)
+        chosen = np.argpartition(-keys, cap - 1)[:cap]
+        return targets[chosen], codes[chosen]
+
+    def expand(self,
+               seed_entities: List[Dict],
+               depth: int = 2,
+               hop_limit: int = 100,
+               neighbour_cap: Optional[int] = None,
+               type_weights: Optional[Dict[str, float]] = None,
+               is_stop_node: Optional[Callable[[Dict], bool]] = None,
+               rng: Optional[np.random.Generator] = None) -> List[Dict]:
+        """Breadth-first expansion with the same semantics as the Cypher per-hop query
+
+        With neighbour_cap set, each node contributes a weighted sample of at
+        most that many neighbours. Nodes for which is_stop_node returns True
+        are kept in the result but never expanded through.
+        """
+        rng = rng or np.random.default_rng()
+        expanded = {entity["node_id"]: entity for entity in seed_entities}
+        current_level = [
+            self.index_of[e["node_id"]] for e in seed_entities
+            if e["node_id"] in self.index_of and not (is_stop_node and is_stop_node(e))
+        ]
+
+        for level in range(depth):
+            if not current_level:
+                break
+
+            next_level = []
+            rows = 0
+            for index in current_level:
+                if neighbour_cap:
+                    targets, codes = self._sample_neighbours(index, neighbour_cap, type_weights or {}, rng)
+                else:
+                    targets, codes, _ = self.neighbours(index)
+                source_name = self.node_props[index].get("name")
+                for target, code in zip(targets[:hop_limit - rows], codes[:hop_limit - rows]):
+                    target_id = int(self.node_ids[target])
+                    if target_id not in expanded:
+                        connected = self.node(target)
+                        connected["graph_distance"] = level + 1
+                        connected["source_relationship"] = self.rel_types[code]
+                        connected["source_entity"] = source_name
+                        expanded[target_id] = connected
+                        if not (is_stop_node and is_stop_node(connected)):
+                            next_level.append(int(target))
+                rows += min(len(targets), hop_limit - rows)
+                if rows >= hop_limit:
+                    break
+
+            current_level = next_level
+
+        return list(expanded.values())
+
+    def find_paths(self, entities: List[Dict], limit: int = 20) -> List[Dict]:
+        """2-hop paths a-(r1)-m-(r2)-b between entities, with id(a) < id(b)"""
+        members = np.asarray(
+            sorted(self.index_of[e["node_id"]] for e in entities if e["node_id"] in self.index_of),
+            dtype=np.int32
+        )
+        if len(members) < 2:
+            return []
+
+        paths = []
+        for a in members:
+            a_id = self.node_ids[a]
+            mid_targets, mid_codes, mid_rels = self.neighbours(a)
+            for m, code1, rel1 in zip(mid_targets, mid_codes, mid_rels):
+                end_targets, end_codes, end_rels = self.neighbours(m)
+                # Candidate ends must be in the entity set, ordered after a,
+                # and reached over a different relationship than r1
+                mask = (
+                    np.isin(end_targets, members, assume_unique=False)
+                    & (self.node_ids[end_targets] > a_id)
+                    & (end_rels != rel1)
+                )
+                for b, code2 in zip(end_targets[mask], end_codes[mask]):
+                    paths.append({
+                        "start_name": self.node_props[a].get("name"),
+                        "end_name": self.node_props[b].get("name"),
+                        "intermediate_name": self.node_props[m].get("name"),
+                        "rel1_type": self.rel_types[code1],
+                        "rel2_type": self.rel_types[code2],
+                        "path_length": 2
+                    })
+                    if len(paths) >= limit:
+                        return paths
+        return paths
+
+    def induced_edges(self, node_ids: List[int]) -> List[Tuple[int, int, float]]:
+        """(source id, target id, weight) for every relationship among node_ids"""
+        indices = [self.index_of[node_id] for node_id in node_ids if node_id in self.index_of]
+        member = np.zeros(self.node_count, dtype=bool)
+        member[indices] = True
+
+        edges = []
+        for index in indices:
+            start, end = self.offsets[index], self.offsets[index + 1]
+            targets = self.targets[start:end]
+            # Each undirected edge is stored twice; keep the copy with target > source
+            mask = member[targets] & (targets > index)
+            source_id = int(self.node_ids[index])
+            for target, weight in zip(targets[mask], self.rel_weights[start:end][mask]):
+                edges.append((source_id, int(self.node_ids[target]), float(weight)))
+        return edges
+
+    def stats(self) -> Dict[str, Any]:
+        memory = sum(a.nbytes for a in (self.node_ids, self.offsets, self.targets, self.rel_codes,
+                                        self.rel_ids, self.rel_weights))
+        return {
+            "nodes": self.node_count,
+            "relationships": self.relationship_count,
+            "relationship_types": len(self.rel_types),
+            "epoch": self.epoch,
+            "loaded_at": self.loaded_at,
+            "array_memory_mb": round(memory / (1024 * 1024), 2)
+        }
+
+def load_snapshot(driver=None) -> GraphSnapshot:
+    """Read the whole graph from Neo4j and build a CSR snapshot"""
+    driver = driver or db.driver
+    start = time.perf_counter()
+    epoch = db.get_ingestion_epoch()
+
+    node_ids: List[int] = []
+    node_labels: List[List[str]] = []
+    node_props: List[Dict[str, Any]] = []
+    sources: List[int] = []
+    targets: List[int] = []
+    rel_ids: List[int] = []
+    rel_codes: List[int] = []
+    rel_weights: List[float] = []
+    rel_types: List[str] = []
+    rel_type_codes: Dict[str, int] = {}
+
+    with driver.session() as session:
+        result = session.run(f"""
+            MATCH (n)
+            WHERE NOT n:`{GRAPH_META_LABEL}`
+            RETURN id(n) AS node_id, labels(n) AS labels, properties(n) AS props
+        """)
+        for record in result:
+            node_ids.append(record["node_id"])
+            node_labels.append(record["labels"])
+            node_props.append(record["props"])
+
+        result = session.run("""
+            MATCH (a)-[r]->(b)
+            RETURN id(a) AS source, id(b) AS target, id(r) AS rel_id, type(r) AS rel_type,
+                   coalesce(r.confidence, 1.0) AS weight
+        """)
+        for record in result:
+            rel_type = record["rel_type"]
+            if rel_type not in rel_type_codes:
+                rel_type_codes[rel_type] = len(rel_types)
+                rel_types.append(rel_type)
+            sources.append(record["source"])
+            targets.append(record["target"])
+            rel_ids.append(record["rel_id"])
+            rel_codes.append(rel_type_codes[rel_type])
+            rel_weights.append(record["weight"])
+
+    node_id_array = np.asarray(node_ids, dtype=np.int64)
+    order = np.argsort(node_id_array)
+    sorted_ids = node_id_array[order]
+
+    def to_index(ids: List[int]) -> np.ndarray:
+        return order[np.searchsorted(sorted_ids, np.asarray(ids, dtype=np.int64))].astype(np.int32)
+
+    # Store each relationship in both directions so traversal is undirected
+    src = to_index(sources) if sources else np.zeros(0, dtype=np.int32)
+    dst = to_index(targets) if targets else np.zeros(0, dtype=np.int32)
+    all_src = np.concatenate([src, dst])
+    all_dst = np.concatenate([dst, src])
+    all_codes = np.tile(np.asarray(rel_codes, dtype=np.int16), 2)
+    all_rel_ids = np.tile(np.asarray(rel_ids, dtype=np.int64), 2)
+    all_weights = np.tile(np.asarray(rel_weights, dtype=np.float32), 2)
+
+    edge_order = np.argsort(all_src, kind="stable")
+    counts = np.bincount(all_src, minlength=len(node_ids))
+    offsets = np.zeros(len(node_ids) + 1, dtype=np.int32)
+    np.cumsum(counts, out=offsets[1:])
+
+    snapshot = GraphSnapshot(
+        node_ids=node_id_array,
+        node_labels=node_labels,
+        node_props=node_props,
+        offsets=offsets,
+        targets=all_dst[edge_order].astype(np.int32),
+        rel_codes=all_codes[edge_order],
+        rel_ids=all_rel_ids[edge_order],
+        rel_weights=all_weights[edge_order],
+        rel_types=rel_types,
+        epoch=epoch
+    )
+    logger.info(f"Loaded graph snapshot with {snapshot.node_count} nodes and "
+                f"{snapshot.relationship_count} relationships in {time.perf_counter() - start:.2f}s (epoch {epoch})")
+    return snapshot
+
+class GraphSnapshotStore:
+    """Holds the current snapshot and swaps in a new one when the graph changes"""
+
+    def __init__(self):
+        self.settings = get_settings()
+        self._snapshot: Optional[GraphSnapshot] = None
+        self._lock = threading.Lock()
+        self._last_epoch_check = 0.0
+        self.reloads = 0
+
+    def reload(self) -> GraphSnapshot:
+        """Rebuild the snapshot from Neo4j and swap it in"""
+        with self._lock:
+            snapshot = load_snapshot()
+            self._snapshot = snapshot
+            self._last_epoch_check = time.monotonic()
+            self.reloads += 1
+            return snapshot
+
+    def get(self) -> Optional[GraphSnapshot]:
+        """Return a current snapshot, loading or refreshing it if needed"""
+        snapshot = self._snapshot
+        try:
+            if snapshot is None:
+                return self.reload()
+
+            if time.monotonic() - self._last_epoch_check >= self.settings.graph_snapshot_refresh_seconds:
+                self._last_epoch_check = time.monotonic()
+                epoch = db.get_ingestion_epoch()
+                if epoch != snapshot.epoch:
+                    logger.info(f"Ingestion epoch changed ({snapshot.epoch} -> {epoch}), reloading graph snapshot")
+                    return self.reload()
+        except Exception as e:
+            logger.error(f"Failed to load graph snapshot: {e}")
+        return snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "engine": self.settings.graph_engine,
+            "loaded": snapshot is not None,
+            "reloads": self.reloads,
+            "snapshot": snapshot.stats() if snapshot is not None else None
+        }
+
+# Global instance
+graph_snapshot_store = GraphSnapshotStore()
@@ -7,15 +7,23 @@ to find related entities and expands the context beyond simple vector similarity
 """
 
 import logging
-from typing import List, Dict, Any, Set, Tuple
+import time
+from typing import List, Dict, Any, Set, Tuple, Optional, Callable
 from dataclasses import dataclass
 import numpy as np
 
 from vector_store import chroma_service
 from database import db
-from core_services import llm_service, embedding_service
+from core_services import llm_service, embedding_service, QueryEmbeddingContext
 from models import Citation
-from utils import serialize_for_json
+from utils import serialize_for_json, extract_query_terms, lucene_escape
+from config import get_settings
+from entity_index import entity_index, entity_text
+from graph_snapshot import graph_snapshot_store
+from graph_ranking import rank_entities
+from entity_document_index import entity_document_index
+from streaming import StageEmitter, EventCallback
+from context_packer import ContextBlock, context_packer, normalized
 
 logger = logging.getLogger(__name__)
 
@@ -36,35 +44,72 @@ class GraphRAGService:
     def __init__(self):
         self.llm_service = llm_service
         self.embedding_service = embedding_service
+        self.settings = get_settings()
+        self._stop_names = {name.lower() for name in self.settings.graph_stop_nodes}
         
     def graphrag_search(self, 
                        query: str, 
                        max_results: int = 10,
-                       graph_depth: int = 2) -> GraphRAGResult:
+                       graph_depth: int = 2,
+                       query_context: Optional[QueryEmbeddingContext] = None,
+                       on_event: Optional[EventCallback] = None) -> GraphRAGResult:
         """
         Perform GraphRAG search by:
         1. Finding relevant entities in the knowledge graph
         2. Expanding context through graph traversal
         3. Retrieving documents connected to these entities
         4. Generating answer with enriched context
+        
+        query_context carries the request's query vector so it is only embedded once.
+        If on_event is given, each stage's results, the reasoning trace and the
+        answer tokens are reported through it as soon as they are available.
         """
         reasoning_trace = ["🔍 Starting GraphRAG search"]
+        emit = StageEmitter(on_event, reasoning_trace)
+        if query_context is None:
+            query_context = QueryEmbeddingContext(query, self.embedding_service)
         
         try:
-            # Step 1: Identify relevant entities from query
-            reasoning_trace.append("📊 Step 1: Identifying relevant entities from query")
-            relevant_entities = self._find_query_entities(query)
-            reasoning_trace.append(f"   Found {len(relevant_entities)} direct entities: {[e['name'] for e in relevant_entities[:3]]}")
+            combined = None
+            if (self.settings.graph_query_mode == "combined" and self.settings.graph_engine == "neo4j"
+                    and self.settings.graph_expansion_mode == "full"):
+                # Steps 1-3 in a single graph round trip
+                reasoning_trace.append("📊 Steps 1-3: Seed lookup, graph expansion and path finding in one graph query")
+                combined = self._combined_graph_phase(query, depth=graph_depth)
+                if combined is None:
+                    reasoning_trace.append("   No full-text seeds found, falling back to staged graph search")
             
-            # Step 2: Expand context through graph traversal
-            reasoning_trace.append("🕸️ Step 2: Expanding context through graph relationships")
-            expanded_entities = self._expand_entities_via_graph(relevant_entities, depth=graph_depth)
-            reasoning_trace.append(f"   Expanded to {len(expanded_entities)} entities via {graph_depth}-hop traversal")
+            if combined is not None:
+                relevant_entities, expanded_entities, path_rows, edges = combined
+                reasoning_trace.append(f"   Found {len(relevant_entities)} direct entities: {[e.get('name') or e.get('title') for e in relevant_entities[:3]]}")
+                reasoning_trace.append(f"   Expanded to {len(expanded_entities)} entities via {graph_depth}-hop traversal")
+                expanded_entities = self._rank_expanded_entities(relevant_entities, expanded_entities, reasoning_trace, edges=edges)
+                # Keep only paths between entities that survived ranking, as the staged search does
+                kept_ids = {e["node_id"] for e in expanded_entities}
+                knowledge_paths = [
+                    self._format_path(row) for row in path_rows
+                    if row["start_id"] in kept_ids and row["end_id"] in kept_ids
+                ][:20]
+                reasoning_trace.append(f"   Discovered {len(knowledge_paths)} relationship paths")
+            else:
+                # Step 1: Identify relevant entities from query
+                reasoning_trace.append("📊 Step 1: Identifying relevant entities from query")
+                relevant_entities = self._find_query_entities(query, query_context)
+                reasoning_trace.append(f"   Found {len(relevant_entities)} direct entities: {[e.get('name') or e.get('title') for e in relevant_entities[:3]]}")
+                
+                # Step 2: Expand context through graph traversal
+                reasoning_trace.append("🕸️ Step 2: Expanding context through graph relationships")
+                expanded_entities = self._expand_entities_via_graph(relevant_entities, depth=graph_depth)
+                reasoning_trace.append(f"   Expanded to {len(expanded_entities)} entities via {graph_depth}-hop traversal")
+                expanded_entities = self._rank_expanded_entities(relevant_entities, expanded_entities, reasoning_trace)
+                
+                # Step 3: Find knowledge paths between entities
+                reasoning_trace.append("🔗 Step 3: Finding knowledge paths between entities")
+                knowledge_paths = self._find_knowledge_paths(expanded_entities)
+                reasoning_trace.append(f"   Discovered {len(knowledge_paths)} relationship paths")
             
-            # Step 3: Find knowledge paths between entities
-            reasoning_trace.append("🔗 Step 3: Finding knowledge paths between entities")
-            knowledge_paths = self._find_knowledge_paths(expanded_entities)
-            reasoning_trace.append(f"   Discovered {len(knowledge_paths)} relationship paths")
+            emit("entities", seed_entities=relevant_entities, graph_entities=expanded_entities)
+            emit("paths", knowledge_paths=knowledge_paths)
             
             # Step 4: Retrieve documents connected to expanded entities
             reasoning_trace.append("📄 Step 4: Retrieving documents connected to entities")
@@ -73,12 +118,13 @@ class GraphRAGService:
             
             # Step 5: Enhance with vector similarity search on documents
             reasoning_trace.append("🔍 Step 5: Enhancing with semantic document search")
-            vector_documents = self._semantic_document_search(query, max_results//2)
+            vector_documents = self._semantic_document_search(query_context, max_results//2)
             reasoning_trace.append(f"   Added {len(vector_documents)} semantically similar documents")
             
             # Step 6: Combine and deduplicate documents
             all_documents = self._merge_document_sources(connected_documents, vector_documents)
             reasoning_trace.append(f"   Final document set: {len(all_documents)} unique documents")
+            emit("documents", documents=all_documents)
             
             # Step 7: Build enriched context with graph relationships
             reasoning_trace.append("🧠 Step 7: Building enriched context with graph relationships")
@@ -88,11 +134,18 @@ class GraphRAGService:
             
             # Step 8: Generate answer with GraphRAG context
             reasoning_trace.append("🤖 Step 8: Generating answer with GraphRAG context")
-            answer = self._generate_graphrag_answer(query, enriched_context)
+            emit()
+            try:
+                answer = self._generate_graphrag_answer(query, enriched_context, on_token=emit.token if emit.enabled else None)
+            except Exception as e:
+                # Only the streaming path raises; flag the partial answer as failed
+                emit("error", status="error", answer=f"Error generating GraphRAG answer: {e}")
+                raise
             
             # Step 9: Extract citations
             citations = self._extract_graphrag_citations(all_documents, expanded_entities)
             reasoning_trace.append(f"✅ GraphRAG search completed with {len(citations)} citations")
+            emit("citations", citations=citations)
             
             return GraphRAGResult(
                 query=query,
@@ -119,36 +172,24 @@ class GraphRAGService:
                 reasoning_trace=reasoning_trace
             )
     
-    def _find_query_entities(self, query: str) -> List[Dict[str, Any]]:
+    def _find_query_entities(self, query: str, query_context: QueryEmbeddingContext) -> List[Dict[str, Any]]:
         """Find entities in the knowledge graph that are relevant to the query"""
         entities = []
-        query_lower = query.lower()
         
         try:
             with db.driver.session() as session:
-                # Search for entities by name/title containing query terms
-                result = session.run("""
-                    MATCH (n)
-                    WHERE 
-                        tolower(coalesce(n.name, '')) CONTAINS $query_term OR
-                        tolower(coalesce(n.title, '')) CONTAINS $query_term OR
-                        tolower(coalesce(n.description, '')) CONTAINS $query_term OR
-                        any(keyword IN $query_words WHERE 
-                            tolower(coalesce(n.name, '')) CONTAINS keyword OR
-                            tolower(coalesce(n.title, '')) CONTAINS keyword
-                        )
-                    RETURN n, labels(n) as labels, id(n) as node_id
-                    LIMIT 20
-                """, query_term=query_lower, query_words=query_lower.split())
-                
-                for record in result:
-                    node = dict(record["n"])
-                    node["labels"] = record["labels"]
-                    node["node_id"] = record["node_id"]
-                    entities.append(node)
+                # Search the full-text index with stopword-filtered query terms
+                try:
+                    entities = self._fulltext_entity_search(session, query)
+                except Exception as e:
+                    logger.warning(f"Full-text entity search unavailable, falling back to scan: {e}")
+                    entities = self._keyword_entity_scan(session, query)
                 
                 # Also search for entities based on semantic similarity if we have embeddings
-                if not entities:
+                if not entities and entity_index.available:
+                    # Top-k lookup over the precomputed embeddings of every entity
+                    entities = self._indexed_entity_matching(session, query_context)
+                elif not entities:
                     # Fallback: get some entities for semantic matching
                     result = session.run("""
                         MATCH (n)
@@ -165,7 +206,7 @@ class GraphRAGService:
                         potential_entities.append(node)
                     
                     # Use embedding similarity to find relevant entities
-                    entities = self._semantic_entity_matching(query, potential_entities)
+                    entities = self._semantic_entity_matching(query_context, potential_entities)
             
             return entities[:10]  # Limit to top 10 relevant entities
             
@@ -173,28 +214,101 @@ class GraphRAGService:
             logger.error(f"Error finding query entities: {e}")
             return []
     
-    def _semantic_entity_matching(self, query: str, entities: List[Dict]) -> List[Dict]:
+    def _build_fulltext_query(self, query: str) -> str:
+        """Build a Lucene query from the stopword-filtered query terms"""
+        terms = extract_query_terms(query)
+        if not terms:
+            return ""
+        
+        clauses = [lucene_escape(term) for term in terms]
+        if len(terms) > 1:
+            # Boost entities whose text contains the whole phrase
+            clauses.append(f'"{lucene_escape(" ".join(terms))}"^2')
+        return " OR ".join(clauses)
+    
+    def _fulltext_entity_search(self, session, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Seed-entity lookup through the Neo4j full-text index, ordered by relevance"""
+        lucene_query = self._build_fulltext_query(query)
+        if not lucene_query:
+            return []
+        
+        result = session.run("""
+            CALL db.index.fulltext.queryNodes($index_name, $lucene_query, {limit: $limit})
+            YIELD node, score
+            RETURN node AS n, labels(node) as labels, id(node) as node_id, score
+        """, index_name=self.settings.fulltext_index_name, lucene_query=lucene_query, limit=limit)
+        
+        entities = []
+        for record in result:
+            node = dict(record["n"])
+            node["labels"] = record["labels"]
+            node["node_id"] = record["node_id"]
+            node["relevance_score"] = record["score"]
+            entities.append(node)
+        return entities
+    
+    def _keyword_entity_scan(self, session, query: str) -> List[Dict[str, Any]]:
+        """Legacy label-less CONTAINS scan, used only when the full-text index is missing"""
+        query_lower = query.lower()
+        result = session.run("""
+            MATCH (n)
+            WHERE 
+                tolower(coalesce(n.name, '')) CONTAINS $query_term OR
+                tolower(coalesce(n.title, '')) CONTAINS $query_term OR
+                tolower(coalesce(n.description, '')) CONTAINS $query_term OR
+                any(keyword IN $query_words WHERE 
+                    tolower(coalesce(n.name, '')) CONTAINS keyword OR
+                    tolower(coalesce(n.title, '')) CONTAINS keyword
+                )
+            RETURN n, labels(n) as labels, id(n) as node_id
+            LIMIT 20
+        """, query_term=query_lower, query_words=extract_query_terms(query))
+        
+        entities = []
+        for record in result:
+            node = dict(record["n"])
+            node["labels"] = record["labels"]
+            node["node_id"] = record["node_id"]
+            entities.append(node)
+        return entities
+    
+    def _indexed_entity_matching(self, session, query_context: QueryEmbeddingContext, top_k: int = 10) -> List[Dict[str, Any]]:
+        """Match seed entities against the precomputed entity embedding index"""
+        threshold = self.settings.entity_index_similarity_threshold
+        matches = [(node_id, score) for node_id, score in entity_index.search(query_context.embedding, top_k)
+                   if score > threshold]
+        if not matches:
+            return []
+        
+        scores = dict(matches)
+        result = session.run("""
+            MATCH (n)
+            WHERE id(n) IN $node_ids
+            RETURN n, labels(n) as labels, id(n) as node_id
+        """, node_ids=list(scores.keys()))
+        
+        entities = []
+        for record in result:
+            node = dict(record["n"])
+            node["labels"] = record["labels"]
+            node["node_id"] = record["node_id"]
+            node["relevance_score"] = scores[record["node_id"]]
+            entities.append(node)
+        
+        entities.sort(key=lambda entity: entity["relevance_score"], reverse=True)
+        return entities
+    
+    def _semantic_entity_matching(self, query_context: QueryEmbeddingContext, entities: List[Dict]) -> List[Dict]:
         """Use semantic similarity to match query with entities"""
         try:
             if not entities:
                 return []
             
             # Create text representations of entities
-            entity_texts = []
-            for entity in entities:
-                text = ""
-                if entity.get("name"):
-                    text += f"Name: {entity['name']} "
-                if entity.get("title"):
-                    text += f"Title: {entity['title']} "
-                if entity.get("description"):
-                    text += f"Description: {entity['description'][:200]} "
-                if entity.get("industry"):
-                    text += f"Industry: {entity['industry']} "
-                entity_texts.append(text.strip())
+            entity_texts = [entity_text(entity) for entity in entities]
             
             # Get embeddings
-            query_embedding = self.embedding_service.encode([query])
+            query_embedding = [query_context.embedding]
             entity_embeddings = self.embedding_service.encode(entity_texts)
             
             # Calculate similarities
@@ -213,10 +327,68 @@ class GraphRAGService:
             logger.error(f"Error in semantic entity matching: {e}")
             return entities[:5]  # Fallback to first 5 entities
     
+    def _graph_snapshot(self):
+        """In-memory graph snapshot when GRAPH_ENGINE=memory, else None"""
+        if self.settings.graph_engine != "memory":
+            return None
+        return graph_snapshot_store.get()
+    
+    def _is_stop_node(self, entity: Dict) -> bool:
+        """Stop-nodes are kept as context but never expanded through"""
+        stop_degree = self.settings.graph_stop_degree
+        if stop_degree and (entity.get("degree") or 0) > stop_degree:
+            return True
+        name = entity.get("name") or entity.get("title")
+        return bool(name) and name.lower() in self._stop_names
+    
     def _expand_entities_via_graph(self, seed_entities: List[Dict], depth: int = 2) -> List[Dict]:
-        """Expand entity set by traversing graph relationships"""
+        """Expand entity set by traversing graph relationships
+        
+        In "sampled" expansion mode every node contributes at most
+        GRAPH_NEIGHBOUR_CAP neighbours, sampled by relationship type weight
+        and confidence, so hub nodes no longer dominate a hop.
+        """
+        sampled = self.settings.graph_expansion_mode == "sampled"
+        snapshot = self._graph_snapshot()
+        if snapshot is not None:
+            return snapshot.expand(
+                seed_entities,
+                depth=depth,
+                hop_limit=self.settings.graph_expansion_limit,
+                neighbour_cap=self.settings.graph_neighbour_cap if sampled else None,
+                type_weights=self.settings.graph_relationship_weights,
+                is_stop_node=self._is_stop_node
+            )
+        
+        if sampled:
+            cypher = """
+                UNWIND $node_ids AS node_id
+                MATCH (n) WHERE id(n) = node_id
+                CALL {
+                    WITH n
+                    MATCH (n)-[r]-(connected)
+                    WITH r, connected,
+                         coalesce($type_weights[type(r)], 1.0) * coalesce(r.confidence, 1.0) AS weight
+                    WHERE weight > 0
+                    RETURN r, connected
+                    ORDER BY rand() ^ (1.0 / weight) DESC
+                    LIMIT $cap
+                }
+                RETURN connected, labels(connected) as labels, id(connected) as node_id,
+                       type(r) as relationship_type, n.name as source_name
+                LIMIT $limit
+            """
+        else:
+            cypher = """
+                MATCH (n)-[r]-(connected)
+                WHERE id(n) IN $node_ids
+                RETURN connected, labels(connected) as labels, id(connected) as node_id,
+                       type(r) as relationship_type, n.name as source_name
+                LIMIT $limit
+            """
+        
         expanded_entities = {entity["node_id"]: entity for entity in seed_entities}
-        current_level = [entity["node_id"] for entity in seed_entities]
+        current_level = [entity["node_id"] for entity in seed_entities if not self._is_stop_node(entity)]
         
         try:
             with db.driver.session() as session:
@@ -225,13 +397,13 @@ class GraphRAGService:
                         break
                     
                     # Find entities connected to current level
-                    result = session.run("""
-                        MATCH (n)-[r]-(connected)
-                        WHERE id(n) IN $node_ids
-                        RETURN connected, labels(connected) as labels, id(connected) as node_id,
-                               type(r) as relationship_type, n.name as source_name
-                        LIMIT 100
-                    """, node_ids=current_level)
+                    result = session.run(
+                        cypher,
+                        node_ids=current_level,
+                        limit=self.settings.graph_expansion_limit,
+                        cap=self.settings.graph_neighbour_cap,
+                        type_weights=self.settings.graph_relationship_weights
+                    )
                     
                     next_level = []
                     for record in result:
@@ -245,7 +417,8 @@ class GraphRAGService:
                             connected_node["source_entity"] = record["source_name"]
                             
                             expanded_entities[connected_id] = connected_node
-                            next_level.append(connected_id)
+                            if not self._is_stop_node(connected_node):
+                                next_level.append(connected_id)
                     
                     current_level = next_level
             
@@ -255,8 +428,53 @@ class GraphRAGService:
             logger.error(f"Error expanding entities via graph: {e}")
             return seed_entities
     
+    def _subgraph_edges(self, node_ids: List[int]) -> List[Tuple[int, int, float]]:
+        """Relationships among node_ids as (source id, target id, confidence) triples"""
+        snapshot = self._graph_snapshot()
+        if snapshot is not None:
+            return snapshot.induced_edges(node_ids)
+        
+        with db.driver.session() as session:
+            result = session.run("""
+                MATCH (a)-[r]-(b)
+                WHERE id(a) IN $node_ids AND id(b) IN $node_ids AND id(a) < id(b)
+                RETURN id(a) AS source, id(b) AS target, coalesce(r.confidence, 1.0) AS weight
+            """, node_ids=node_ids)
+            return [(record["source"], record["target"], record["weight"]) for record in result]
+    
+    def _rank_expanded_entities(self, seed_entities: List[Dict], expanded_entities: List[Dict],
+                                reasoning_trace: List[str],
+                                edges: Optional[List[Tuple[int, int, float]]] = None) -> List[Dict]:
+        """Keep the top-N expanded entities by personalized PageRank from the seeds
+        
+        edges are the relationships among expanded_entities if the caller
+        already has them; otherwise they are fetched with _subgraph_edges.
+        """
+        if not self.settings.graph_ranking_enabled or len(expanded_entities) <= len(seed_entities):
+            return expanded_entities
+        
+        try:
+            start = time.perf_counter()
+            if edges is None:
+                edges = self._subgraph_edges([e["node_id"] for e in expanded_entities])
+            ranked = rank_entities(
+                seed_entities, expanded_entities, edges,
+                top_n=self.settings.graph_ranking_top_n,
+                damping=self.settings.graph_ranking_damping
+            )
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            reasoning_trace.append(f"   Ranked by personalized PageRank over {len(edges)} edges, kept top {len(ranked)} ({elapsed_ms:.1f}ms)")
+            return ranked
+        except Exception as e:
+            logger.error(f"Error ranking expanded entities: {e}")
+            return expanded_entities
+    
     def _find_knowledge_paths(self, entities: List[Dict]) -> List[Dict]:
         """Find interesting paths between entities in the knowledge graph"""
+        snapshot = self._graph_snapshot()
+        if snapshot is not None:
+            return [self._format_path(row) for row in snapshot.find_paths(entities, limit=20)]
+        
         paths = []
         
         try:
@@ -279,15 +497,7 @@ class GraphRAGService:
                 """, entity_ids=entity_ids)
                 
                 for record in result:
-                    path = {
-                        "start": record["start_name"],
-                        "end": record["end_name"],
-                        "intermediate": record["intermediate_name"],
-                        "relationships": [record["rel1_type"], record["rel2_type"]],
-                        "length": record["path_length"],
-                        "path_description": f"{record['start_name']} → {record['rel1_type']} → {record['intermediate_name']} → {record['rel2_type']} → {record['end_name']}"
-                    }
-                    paths.append(path)
+                    paths.append(self._format_path(record))
             
             return paths
             
@@ -295,8 +505,153 @@ class GraphRAGService:
             logger.error(f"Error finding knowledge paths: {e}")
             return []
     
+    def _format_path(self, record) -> Dict[str, Any]:
+        """Turn a 2-hop path row into the knowledge path structure"""
+        return {
+            "start": record["start_name"],
+            "end": record["end_name"],
+            "intermediate": record["intermediate_name"],
+            "relationships": [record["rel1_type"], record["rel2_type"]],
+            "length": record["path_length"],
+            "path_description": f"{record['start_name']} → {record['rel1_type']} → {record['intermediate_name']} → {record['rel2_type']} → {record['end_name']}"
+        }
+    
+    def _combined_graph_phase(self, query: str, depth: int = 2) -> Optional[Tuple[List[Dict], List[Dict], List[Dict], List[Tuple[int, int, float]]]]:
+        """Seed lookup, k-hop expansion and 2-hop path finding in one read transaction
+        
+        Returns (seed_entities, expanded_entities, path_rows, edges), or None
+        when the full-text index yields no seeds so the staged search (with its
+        semantic fallbacks) can take over. path_rows are unformatted 2-hop
+        paths (see _format_path) with the start_id / end_id of their endpoints,
+        and edges are the relationships among the expanded entities as
+        (source id, target id, confidence), ready for ranking.
+        
+        Expansion goes hop by hop over distinct nodes, like the staged search:
+        each frontier node contributes at most GRAPH_EXPANSION_LIMIT
+        relationships and each hop keeps at most GRAPH_EXPANSION_LIMIT new
+        nodes, so a hub seed cannot make the query enumerate every path.
+        Stop-nodes (see _is_stop_node) are returned but left out of the next
+        frontier.
+        """
+        lucene_query = self._build_fulltext_query(query)
+        if not lucene_query:
+            return None
+        
+        depth = max(1, int(depth))
+        # Cypher form of _is_stop_node
+        expandable = ("NOT (toLower(CASE WHEN coalesce(n.name, '') <> '' THEN n.name ELSE coalesce(n.title, '') END) IN $stop_names "
+                      "OR ($stop_degree > 0 AND coalesce(n.degree, 0) > $stop_degree))")
+        hops = "".join(f"""
+            CALL {{
+                WITH frontier, visited
+                UNWIND frontier AS n
+                CALL {{
+                    WITH n
+                    MATCH (n)-[r]-(connected)
+                    RETURN r, connected
+                    LIMIT $hop_limit
+                }}
+                WITH n, r, connected, visited
+                WHERE NOT connected IN visited
+                WITH connected, head(collect({{r: r, source: n}})) AS via
+                LIMIT $hop_limit
+                RETURN collect({{
+                    node: connected,
+                    labels: labels(connected),
+                    node_id: id(connected),
+                    distance: {hop},
+                    relationship_type: type(via.r),
+                    source_name: via.source.name
+                }}) AS hop_entities
+            }}
+            WITH seeds, seed_nodes, expanded + hop_entities AS expanded,
+                 visited + [e IN hop_entities | e.node] AS visited,
+                 [n IN [e IN hop_entities | e.node] WHERE {expandable}] AS frontier""" for hop in range(1, depth + 1))
+        cypher = f"""
+            CALL db.index.fulltext.queryNodes($index_name, $lucene_query, {{limit: $seed_limit}})
+            YIELD node, score
+            WITH collect({{node: node, score: score}}) AS seeds
+            WITH seeds, [s IN seeds | s.node] AS seed_nodes
+            WITH seeds, seed_nodes, [] AS expanded, seed_nodes AS visited,
+                 [n IN seed_nodes WHERE {expandable}] AS frontier{hops}
+            WITH seeds, seed_nodes, expanded,
+                 [s IN seed_nodes | id(s)] + [e IN expanded | e.node_id] AS entity_ids
+            CALL {{
+                WITH entity_ids
+                MATCH (a)-[r1]-(intermediate)-[r2]-(b)
+                WHERE id(a) IN entity_ids AND id(b) IN entity_ids AND id(a) < id(b)
+                WITH a, b, intermediate, r1, r2
+                LIMIT $path_limit
+                RETURN collect({{
+                    start_id: id(a),
+                    end_id: id(b),
+                    start_name: a.name,
+                    end_name: b.name,
+                    intermediate_name: intermediate.name,
+                    rel1_type: type(r1),
+                    rel2_type: type(r2),
+                    path_length: 2
+                }}) AS paths
+            }}
+            CALL {{
+                WITH entity_ids
+                MATCH (a)-[r]-(b)
+                WHERE id(a) IN entity_ids AND id(b) IN entity_ids AND id(a) < id(b)
+                RETURN collect([id(a), id(b), coalesce(r.confidence, 1.0)]) AS edges
+            }}
+            RETURN [s IN seeds | {{node: s.node, labels: labels(s.node), node_id: id(s.node), score: s.score}}] AS seeds,
+                   expanded, paths, edges
+        """
+        
+        try:
+            with db.driver.session() as session:
+                record = session.execute_read(lambda tx: tx.run(
+                    cypher,
+                    index_name=self.settings.fulltext_index_name,
+                    lucene_query=lucene_query,
+                    seed_limit=10,
+                    hop_limit=self.settings.graph_expansion_limit,
+                    stop_names=sorted(self._stop_names),
+                    stop_degree=self.settings.graph_stop_degree or 0,
+                    # Spare paths, since ranking may drop some of their endpoints
+                    path_limit=100 if self.settings.graph_ranking_enabled else 20
+                ).single())
+        except Exception as e:
+            logger.error(f"Combined graph query failed, falling back to staged search: {e}")
+            return None
+        
+        if record is None or not record["seeds"]:
+            return None
+        
+        seeds = []
+        for row in record["seeds"]:
+            node = dict(row["node"])
+            node["labels"] = row["labels"]
+            node["node_id"] = row["node_id"]
+            node["relevance_score"] = row["score"]
+            seeds.append(node)
+        
+        expanded = list(seeds)
+        for row in record["expanded"]:
+            node = dict(row["node"])
+            node["labels"] = row["labels"]
+            node["node_id"] = row["node_id"]
+            node["graph_distance"] = row["distance"]
+            node["source_relationship"] = row["relationship_type"]
+            node["source_entity"] = row["source_name"]
+            expanded.append(node)
+        
+        edges = [(source, target, weight) for source, target, weight in record["edges"]]
+        return seeds, expanded, record["paths"], edges
+    
     def _find_entity_documents(self, entities: List[Dict], max_docs: int) -> List[Dict]:
         """Find documents connected to the expanded entities"""
+        if entity_document_index.available:
+            try:
+                return self._indexed_entity_documents(entities, max_docs)
+            except Exception as e:
+                logger.error(f"Entity-document index lookup failed, falling back to vector search: {e}")
+        
         try:
             # Get entity names for document search
             entity_names = []
@@ -337,12 +692,25 @@ class GraphRAGService:
             logger.error(f"Error finding entity documents: {e}")
             return []
     
-    def _semantic_document_search(self, query: str, max_docs: int) -> List[Dict]:
-        """Perform semantic search on documents"""
+    def _indexed_entity_documents(self, entities: List[Dict], max_docs: int) -> List[Dict]:
+        """Look up documents that mention the entities in the entity-document index"""
+        links = entity_document_index.lookup(entities, max_docs=max_docs)
+        documents = chroma_service.get_documents([link["doc_id"] for link in links])
+        
+        by_id = {link["doc_id"]: link for link in links}
+        for doc in documents:
+            link = by_id[doc["id"]]
+            doc["entity_link_score"] = link["score"]
+            doc["connected_entities"] = link["connected_entities"]
+        return documents
+    
+    def _semantic_document_search(self, query_context: QueryEmbeddingContext, max_docs: int) -> List[Dict]:
+        """Perform semantic search on documents using the request's query vector"""
         try:
             return chroma_service.search_documents(
-                query=query,
-                n_results=max_docs
+                query=query_context.query,
+                n_results=max_docs,
+                query_embeddings=query_context.embedding
             )
         except Exception as e:
             logger.error(f"Error in semantic document search: {e}")
@@ -377,7 +745,65 @@ class GraphRAGService:
                                entities: List[Dict], 
                                paths: List[Dict], 
                                documents: List[Dict]) -> str:
-        """Build enriched context using graph structure and documents"""
+        """Build enriched context using graph structure and documents
+        
+        Entities, paths and documents compete for one token budget by
+        relevance; see context_packer.
+        """
+        
+        blocks = []
+        
+        # Knowledge graph entities: PageRank score when ranked, else closeness to the seeds
+        rank_scores = normalized([e.get("graph_rank_score", 0.0) for e in entities])
+        for entity, rank_score in zip(entities, rank_scores):
+            entity_info = f"{entity.get('name') or entity.get('title', 'Unknown')}"
+            if entity.get("labels"):
+                entity_info += f" ({', '.join(entity['labels'])})"
+            if entity.get("graph_distance", 0) > 0:
+                entity_info += f" [Distance: {entity['graph_distance']}]"
+            if entity.get("source_relationship"):
+                entity_info += f" [Via: {entity['source_relationship']}]"
+            
+            header = [entity_info]
+            if entity.get("industry"):
+                header.append(f"   Industry: {entity['industry']}")
+            relevance = rank_score if "graph_rank_score" in entity else 1 / (1 + entity.get("graph_distance", 0))
+            blocks.append(ContextBlock(
+                section="entities",
+                header=header,
+                body=str(entity.get("description") or ""),
+                body_prefix="   Description: ",
+                score=self.settings.context_entity_weight * relevance
+            ))
+        
+        # Knowledge paths in discovery order
+        for i, path in enumerate(paths):
+            blocks.append(ContextBlock(
+                section="paths",
+                header=[path["path_description"]],
+                score=self.settings.context_path_weight * (1 - i / (len(paths) + 1))
+            ))
+        
+        # Documents: vector similarity, or the entity-link score for graph-connected documents
+        link_scores = normalized([doc.get("entity_link_score", 0.0) for doc in documents])
+        for i, (doc, link_score) in enumerate(zip(documents, link_scores), 1):
+            doc_info = f"{doc.get('metadata', {}).get('title', f'Document {i}')}"
+            if doc.get("source_type"):
+                doc_info += f" [{doc['source_type'].replace('_', ' ').title()}]"
+            
+            header = [doc_info]
+            if doc.get("connected_entities"):
+                entity_names = [e["name"] for e in doc["connected_entities"][:3]]
+                header.append(f"   Connected Entities: {', '.join(entity_names)}")
+            relevance = max(doc.get("similarity") or 0.0, link_score)
+            blocks.append(ContextBlock(
+                section="documents",
+                header=header,
+                body=doc.get("content", ""),
+                score=self.settings.context_document_weight * min(1.0, relevance)
+            ))
+        
+        packed = context_packer(self.settings).pack(blocks)
         
         context_parts = [
             f"USER QUERY: {query}",
@@ -386,58 +812,24 @@ class GraphRAGService:
             ""
         ]
         
-        # Add knowledge graph entities with relationships
-        if entities:
-            context_parts.append("KNOWLEDGE GRAPH ENTITIES:")
-            for i, entity in enumerate(entities[:15], 1):
-                entity_info = f"{i}. {entity.get('name') or entity.get('title', 'Unknown')}"
-                if entity.get("labels"):
-                    entity_info += f" ({', '.join(entity['labels'])})"
-                if entity.get("graph_distance", 0) > 0:
-                    entity_info += f" [Distance: {entity['graph_distance']}]"
-                if entity.get("source_relationship"):
-                    entity_info += f" [Via: {entity['source_relationship']}]"
-                
-                context_parts.append(entity_info)
-                
-                if entity.get("description"):
-                    context_parts.append(f"   Description: {entity['description'][:200]}")
-                if entity.get("industry"):
-                    context_parts.append(f"   Industry: {entity['industry']}")
-                    
-            context_parts.append("")
-        
-        # Add knowledge paths showing relationships
-        if paths:
-            context_parts.append("KNOWLEDGE RELATIONSHIPS:")
-            for i, path in enumerate(paths[:10], 1):
-                context_parts.append(f"{i}. {path['path_description']}")
-            context_parts.append("")
-        
-        # Add documents with entity connections
-        if documents:
-            context_parts.append("RELEVANT DOCUMENTS:")
-            for i, doc in enumerate(documents[:8], 1):
-                doc_info = f"{i}. {doc.get('metadata', {}).get('title', f'Document {i}')}"
-                if doc.get("source_type"):
-                    doc_info += f" [{doc['source_type'].replace('_', ' ').title()}]"
-                
-                context_parts.append(doc_info)
-                
-                # Add connected entities
-                if doc.get("connected_entities"):
-                    entity_names = [e["name"] for e in doc["connected_entities"][:3]]
-                    context_parts.append(f"   Connected Entities: {', '.join(entity_names)}")
-                
-                # Add document content
-                content = doc.get("content", "")[:800]
-                context_parts.append(f"   Content: {content}...")
+        for section, title in (("entities", "KNOWLEDGE GRAPH ENTITIES:"),
+                               ("paths", "KNOWLEDGE RELATIONSHIPS:"),
+                               ("documents", "RELEVANT DOCUMENTS:")):
+            if not packed.get(section):
+                continue
+            context_parts.append(title)
+            for i, block in enumerate(packed[section], 1):
+                context_parts.extend(block.render(i))
+                if section == "documents":
+                    context_parts.append("")
+            if section != "documents":
                 context_parts.append("")
         
         return "\n".join(context_parts)
     
-    def _generate_graphrag_answer(self, query: str, context: str) -> str:
-        """Generate answer using GraphRAG-enhanced context"""
+    def _generate_graphrag_answer(self, query: str, context: str,
+                                  on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Generate answer using GraphRAG-enhanced context, streaming tokens to on_token if given"""
         
         system_prompt = """You are a GraphRAG assistant that provides comprehensive answers using both document content and knowledge graph relationships.
 
@@ -457,20 +849,15 @@ Guidelines for GraphRAG responses:
 
 Your goal is to provide the most comprehensive and accurate answer possible using the combined document and graph information."""
 
+        user_content = f"Query: {query}\n\nGraphRAG Context:\n{context}\n\nProvide a comprehensive answer leveraging both the document content and knowledge graph relationships:"
+        
+        if on_token is not None:
+            # Errors propagate: tokens already streamed are not a complete answer
+            return self.llm_service.stream_completion(user_content, on_token, system=system_prompt,
+                                                       cache_site="graphrag_answer")
+        
         try:
-            response = self.llm_service.client.messages.create(
-                model=self.llm_service.settings.anthropic_model,
-                max_tokens=self.llm_service.settings.max_tokens,
-                temperature=self.llm_service.settings.temperature,
-                system=system_prompt,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": f"Query: {query}\n\nGraphRAG Context:\n{context}\n\nProvide a comprehensive answer leveraging both the document content and knowledge graph relationships:"
-                    }
-                ]
-            )
-            return response.content[0].text
+            return self.llm_service.complete(user_content, system=system_prompt, cache_site="graphrag_answer")
         except Exception as e:
             logger.error(f"Error generating GraphRAG answer: {e}")
             return f"Error generating GraphRAG answer: {str(e)}"
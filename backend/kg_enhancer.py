@@ -11,10 +11,33 @@ from typing import List, Dict, Set, Tuple, Optional
 from collections import defaultdict, Counter
 import json
 
+from graph_writer import BatchedGraphWriter, ENTITY_LABEL
 from database import db
 
 logger = logging.getLogger(__name__)
 
+# entity type -> (node label, merge key, entity_type property)
+ENTITY_NODE_SPECS = {
+    'companies': ('Company', 'name', 'company'),
+    'people': ('Person', 'name', 'person'),
+    'technologies': ('Technology', 'name', 'technology'),
+    'research_areas': ('Topic', 'name', 'research_area'),
+    'venues': ('Venue', 'name', 'venue'),
+    'papers': ('Document', 'title', 'paper')
+}
+
+# relationship type -> (Cypher type, start label, start key, end label, end key)
+# Endpoints of any entity type are matched through the indexed :Entity label
+RELATIONSHIP_SPECS = {
+    'collaboration': ('COLLABORATES_WITH', ENTITY_LABEL, 'name', ENTITY_LABEL, 'name'),
+    'competition': ('COMPETES_WITH', ENTITY_LABEL, 'name', ENTITY_LABEL, 'name'),
+    'investment': ('INVESTS_IN', ENTITY_LABEL, 'name', ENTITY_LABEL, 'name'),
+    'acquisition': ('ACQUIRED', ENTITY_LABEL, 'name', ENTITY_LABEL, 'name'),
+    'authorship': ('AUTHORED', 'Person', 'name', 'Document', 'title'),
+    'employment': ('WORKS_AT', 'Person', 'name', 'Company', 'name'),
+    'technology_usage': ('USES_TECHNOLOGY', ENTITY_LABEL, 'name', 'Technology', 'name')
+}
+
 class KnowledgeGraphEnhancer:
     """Enhanced knowledge graph builder with advanced entity extraction and relationship discovery"""
     
@@ -258,184 +281,86 @@ class KnowledgeGraphEnhancer:
         
         return min(confidence, 1.0)
     
-    def build_enhanced_knowledge_graph(self, extracted_data: Dict) -> Dict:
-        """Build enhanced knowledge graph in Neo4j"""
+    def build_enhanced_knowledge_graph(self, extracted_data: Dict, chunk_size: Optional[int] = None) -> Dict:
+        """Build enhanced knowledge graph in Neo4j using batched UNWIND writes"""
         logger.info("Building enhanced knowledge graph...")
         
         try:
-            with db.driver.session() as session:
-                stats = {
-                    'nodes_created': 0,
-                    'relationships_created': 0,
-                    'entities_by_type': {}
-                }
+            writer = BatchedGraphWriter(chunk_size=chunk_size)
+            writer.ensure_index(ENTITY_LABEL, 'name')
+            writer.ensure_index(ENTITY_LABEL, 'title')
+            stats = {
+                'nodes_created': 0,
+                'relationships_created': 0,
+                'entities_by_type': {}
+            }
+            
+            # Create entity nodes, one batched MERGE per label
+            for entity_type, entities in extracted_data['entities'].items():
+                if entity_type not in ENTITY_NODE_SPECS:
+                    continue
                 
-                # Create entity nodes
-                for entity_type, entities in extracted_data['entities'].items():
-                    created_count = 0
-                    
-                    if entity_type == 'companies':
-                        for company in entities:
-                            session.run("""
-                                MERGE (c:Company {name: $name})
-                                ON CREATE SET c.source = 'enhanced_extraction', 
-                                             c.created_date = datetime(),
-                                             c.entity_type = 'company'
-                            """, name=company)
-                            created_count += 1
-                    
-                    elif entity_type == 'people':
-                        for person in entities:
-                            session.run("""
-                                MERGE (p:Person {name: $name})
-                                ON CREATE SET p.source = 'enhanced_extraction', 
-                                             p.created_date = datetime(),
-                                             p.entity_type = 'person'
-                            """, name=person)
-                            created_count += 1
-                    
-                    elif entity_type == 'technologies':
-                        for tech in entities:
-                            session.run("""
-                                MERGE (t:Technology {name: $name})
-                                ON CREATE SET t.source = 'enhanced_extraction', 
-                                             t.created_date = datetime(),
-                                             t.entity_type = 'technology'
-                            """, name=tech)
-                            created_count += 1
-                    
-                    elif entity_type == 'research_areas':
-                        for area in entities:
-                            session.run("""
-                                MERGE (r:Topic {name: $name})
-                                ON CREATE SET r.description = $description,
-                                             r.source = 'enhanced_extraction', 
-                                             r.created_date = datetime(),
-                                             r.entity_type = 'research_area'
-                            """, name=area, description=f"Research area: {area}")
-                            created_count += 1
-                    
-                    elif entity_type == 'venues':
-                        for venue in entities:
-                            session.run("""
-                                MERGE (v:Venue {name: $name})
-                                ON CREATE SET v.source = 'enhanced_extraction', 
-                                             v.created_date = datetime(),
-                                             v.entity_type = 'venue'
-                            """, name=venue)
-                            created_count += 1
-                    
+                label, key, kind = ENTITY_NODE_SPECS[entity_type]
+                rows = []
+                for entity in entities:
+                    props = {'source': 'enhanced_extraction', 'entity_type': kind}
+                    if entity_type == 'research_areas':
+                        props['description'] = f"Research area: {entity}"
                     elif entity_type == 'papers':
-                        for paper in entities:
-                            session.run("""
-                                MERGE (p:Document {title: $title})
-                                ON CREATE SET p.source = 'enhanced_extraction', 
-                                             p.created_date = datetime(),
-                                             p.entity_type = 'paper',
-                                             p.document_type = 'research_paper'
-                            """, title=paper)
-                            created_count += 1
-                    
-                    stats['entities_by_type'][entity_type] = created_count
-                    stats['nodes_created'] += created_count
-                
-                # Create relationships
-                relationship_counts = defaultdict(int)
-                
-                for rel in extracted_data['relationships']:
-                    rel_type = rel['type']
-                    entity1 = rel['entity1']
-                    entity2 = rel['entity2']
-                    confidence = rel.get('confidence', 0.5)
-                    
-                    if rel_type == 'collaboration':
-                        session.run("""
-                            MATCH (e1), (e2)
-                            WHERE e1.name = $entity1 AND e2.name = $entity2
-                            MERGE (e1)-[r:COLLABORATES_WITH]->(e2)
-                            ON CREATE SET r.source = 'enhanced_extraction',
-                                         r.confidence = $confidence,
-                                         r.created_date = datetime()
-                        """, entity1=entity1, entity2=entity2, confidence=confidence)
-                    
-                    elif rel_type == 'competition':
-                        session.run("""
-                            MATCH (e1), (e2)
-                            WHERE e1.name = $entity1 AND e2.name = $entity2
-                            MERGE (e1)-[r:COMPETES_WITH]->(e2)
-                            ON CREATE SET r.source = 'enhanced_extraction',
-                                         r.confidence = $confidence,
-                                         r.created_date = datetime()
-                        """, entity1=entity1, entity2=entity2, confidence=confidence)
-                    
-                    elif rel_type == 'investment':
-                        session.run("""
-                            MATCH (e1), (e2)
-                            WHERE e1.name = $entity1 AND e2.name = $entity2
-                            MERGE (e1)-[r:INVESTS_IN]->(e2)
-                            ON CREATE SET r.source = 'enhanced_extraction',
-                                         r.confidence = $confidence,
-                                         r.created_date = datetime()
-                        """, entity1=entity1, entity2=entity2, confidence=confidence)
-                    
-                    elif rel_type == 'acquisition':
-                        session.run("""
-                            MATCH (e1), (e2)
-                            WHERE e1.name = $entity1 AND e2.name = $entity2
-                            MERGE (e1)-[r:ACQUIRED]->(e2)
-                            ON CREATE SET r.source = 'enhanced_extraction',
-                                         r.confidence = $confidence,
-                                         r.created_date = datetime()
-                        """, entity1=entity1, entity2=entity2, confidence=confidence)
-                    
-                    elif rel_type == 'authorship':
-                        session.run("""
-                            MATCH (p:Person), (d:Document)
-                            WHERE p.name = $entity1 AND d.title = $entity2
-                            MERGE (p)-[r:AUTHORED]->(d)
-                            ON CREATE SET r.source = 'enhanced_extraction',
-                                         r.confidence = $confidence,
-                                         r.created_date = datetime()
-                        """, entity1=entity1, entity2=entity2, confidence=confidence)
-                    
-                    elif rel_type == 'employment':
-                        session.run("""
-                            MATCH (p:Person), (c:Company)
-                            WHERE p.name = $entity1 AND c.name = $entity2
-                            MERGE (p)-[r:WORKS_AT]->(c)
-                            ON CREATE SET r.source = 'enhanced_extraction',
-                                         r.confidence = $confidence,
-                                         r.created_date = datetime()
-                        """, entity1=entity1, entity2=entity2, confidence=confidence)
-                    
-                    elif rel_type == 'technology_usage':
-                        session.run("""
-                            MATCH (e1), (t:Technology)
-                            WHERE e1.name = $entity1 AND t.name = $entity2
-                            MERGE (e1)-[r:USES_TECHNOLOGY]->(t)
-                            ON CREATE SET r.source = 'enhanced_extraction',
-                                         r.confidence = $confidence,
-                                         r.created_date = datetime()
-                        """, entity1=entity1, entity2=entity2, confidence=confidence)
-                    
-                    relationship_counts[rel_type] += 1
-                    stats['relationships_created'] += 1
-                
-                logger.info(f"Enhanced knowledge graph created:")
-                logger.info(f"  Nodes created: {stats['nodes_created']}")
-                logger.info(f"  Relationships created: {stats['relationships_created']}")
+                        props['document_type'] = 'research_paper'
+                    rows.append({'key': entity, 'props': props})
                 
-                for entity_type, count in stats['entities_by_type'].items():
-                    logger.info(f"    {entity_type}: {count}")
-                
-                for rel_type, count in relationship_counts.items():
-                    logger.info(f"    {rel_type}: {count}")
-                
-                return {
-                    'success': True,
-                    'stats': stats,
-                    'relationship_counts': dict(relationship_counts)
-                }
+                writer.merge_nodes(label, key, rows, extra_labels=(ENTITY_LABEL,))
+                stats['entities_by_type'][entity_type] = len(rows)
+                stats['nodes_created'] += len(rows)
+            
+            # Group relationships by type and write each group in batches
+            relationship_counts = defaultdict(int)
+            rows_by_type = defaultdict(list)
+            
+            for rel in extracted_data['relationships']:
+                rel_type = rel['type']
+                rows_by_type[rel_type].append({
+                    'start': rel['entity1'],
+                    'end': rel['entity2'],
+                    'props': {
+                        'source': 'enhanced_extraction',
+                        'confidence': rel.get('confidence', 0.5)
+                    }
+                })
+                relationship_counts[rel_type] += 1
+                stats['relationships_created'] += 1
+            
+            for rel_type, rows in rows_by_type.items():
+                spec = RELATIONSHIP_SPECS.get(rel_type)
+                if spec is None:
+                    continue
+                cypher_type, start_label, start_key, end_label, end_key = spec
+                writer.merge_relationships(
+                    cypher_type, rows,
+                    start_label=start_label, start_key=start_key,
+                    end_label=end_label, end_key=end_key
+                )
+            
+            throughput = writer.throughput()
+            stats['write_throughput'] = throughput
+            db.bump_ingestion_epoch()
+            
+            logger.info(f"Enhanced knowledge graph created:")
+            logger.info(f"  Nodes created: {stats['nodes_created']} ({throughput['nodes_per_second']} nodes/sec)")
+            logger.info(f"  Relationships created: {stats['relationships_created']} ({throughput['relationships_per_second']} rels/sec)")
+            
+            for entity_type, count in stats['entities_by_type'].items():
+                logger.info(f"    {entity_type}: {count}")
+            
+            for rel_type, count in relationship_counts.items():
+                logger.info(f"    {rel_type}: {count}")
+            
+            return {
+                'success': True,
+                'stats': stats,
+                'relationship_counts': dict(relationship_counts)
+            }
                 
         except Exception as e:
             error_msg = f"Error building enhanced knowledge graph: {e}"
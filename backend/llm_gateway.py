@@ -0,0 +1,274 @@
+"""
+LLM Gateway
+
+Single entry point for every Claude call in the backend. Requests run on one
+AsyncAnthropic client owned by a background event loop, so synchronous
+callers (FastAPI worker threads, the extraction scripts) and async callers
+share the same limits:
+
+- a token-bucket limiter for requests/minute and tokens/minute
+- a cap on concurrent in-flight requests
+- jittered exponential retry on 429 / 529 / 5xx and connection errors,
+  honouring retry-after
+- a per-call timeout
+
+Use llm_gateway.create(...) from synchronous code, submit(...) to fan out
+many calls concurrently, or await create_async(...) from any event loop.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import anthropic
+
+from config import get_settings
+from utils import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+class TokenBucket:
+    """Continuously refilling bucket holding up to rate_per_minute units"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount units are available (0 if they are now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        """Take amount units; may go negative (debt) and a negative amount refunds"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+class LLMGateway:
+    """Rate-limited, retrying front door to the Anthropic Messages API"""
+
+    def __init__(self):
+        self.settings = get_settings()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[anthropic.AsyncAnthropic] = None
+        self._start_lock = threading.Lock()
+        self.metrics = {
+            'requests': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'attempts': 0,
+            'retries': 0,
+            'rate_limited': 0,
+            'timeouts': 0,
+            'in_flight': 0,
+            'max_in_flight': 0,
+            'input_tokens': 0,
+            'output_tokens': 0,
+            'limiter_wait_seconds': 0.0,
+            'latency_seconds': 0.0
+        }
+
+    # --- event loop ------------------------------------------------------
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        """Start the background loop and client on first use"""
+        if self._loop is not None:
+            return self._loop
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True)
+                thread.start()
+                asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+                self._loop = loop
+        return self._loop
+
+    async def _setup(self):
+        # Retries are handled here so they count against the rate limiter
+        self._client = anthropic.AsyncAnthropic(
+            api_key=self.settings.anthropic_api_key,
+            max_retries=0,
+            timeout=self.settings.llm_timeout_seconds
+        )
+        self._request_bucket = TokenBucket(self.settings.llm_requests_per_minute)
+        self._token_bucket = TokenBucket(self.settings.llm_tokens_per_minute)
+        self._limiter_lock = asyncio.Lock()
+        self._concurrency = asyncio.Semaphore(self.settings.llm_max_concurrency)
+
+    # --- limiting and retry ----------------------------------------------
+
+    @staticmethod
+    def _estimate_request_tokens(request: Dict[str, Any]) -> int:
+        """Input estimate plus the output allowance, for the tokens/minute bucket"""
+        text = request.get("system") or ""
+        if not isinstance(text, str):
+            text = str(text)
+        for message in request.get("messages", []):
+            content = message.get("content", "")
+            text += content if isinstance(content, str) else str(content)
+        return estimate_tokens(text) + int(request.get("max_tokens", 0))
+
+    async def _acquire(self, token_estimate: int):
+        """Wait until both the request and token buckets have room, in FIFO order"""
+        start = time.monotonic()
+        async with self._limiter_lock:
+            while True:
+                wait = max(self._request_bucket.wait_time(1), self._token_bucket.wait_time(token_estimate))
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            self._request_bucket.consume(1)
+            self._token_bucket.consume(token_estimate)
+        self.metrics['limiter_wait_seconds'] += time.monotonic() - start
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, at least the server's retry-after"""
+        delay = random.uniform(0, min(self.settings.llm_retry_max_seconds,
+                                      self.settings.llm_retry_base_seconds * (2 ** attempt)))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            if retry_after:
+                delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+        return delay
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, (anthropic.APIConnectionError, asyncio.TimeoutError)):
+            return True
+        if isinstance(error, anthropic.APIStatusError):
+            return error.status_code in RETRYABLE_STATUS_CODES
+        return False
+
+    async def _call(self, request: Dict[str, Any], send: Callable,
+                    can_retry: Callable[[], bool] = lambda: True):
+        """Run send(request) under the limiter with retries; returns its result
+
+        can_retry is asked after a failed attempt; returning False makes the
+        failure final even if the error is retryable.
+        """
+        token_estimate = self._estimate_request_tokens(request)
+        self.metrics['requests'] += 1
+        attempt = 0
+        while True:
+            await self._acquire(token_estimate)
+            error = None
+            async with self._concurrency:
+                self.metrics['in_flight'] += 1
+                self.metrics['max_in_flight'] = max(self.metrics['max_in_flight'], self.metrics['in_flight'])
+                start = time.monotonic()
+                try:
+                    message = await asyncio.wait_for(send(request), timeout=self.settings.llm_timeout_seconds)
+                except Exception as e:
+                    error = e
+                finally:
+                    self.metrics['in_flight'] -= 1
+                    self.metrics['attempts'] += 1
+                    self.metrics['latency_seconds'] += time.monotonic() - start
+
+            if error is None:
+                break
+            if isinstance(error, anthropic.RateLimitError):
+                self.metrics['rate_limited'] += 1
+            elif isinstance(error, (anthropic.APITimeoutError, asyncio.TimeoutError)):
+                self.metrics['timeouts'] += 1
+            if attempt >= self.settings.llm_max_retries or not self._is_retryable(error) or not can_retry():
+                self.metrics['failed'] += 1
+                raise error
+
+            # Back off outside the concurrency slot so other calls can proceed
+            delay = self._retry_delay(attempt, error)
+            logger.warning(f"LLM call failed ({type(error).__name__}), retry {attempt + 1} in {delay:.1f}s")
+            attempt += 1
+            self.metrics['retries'] += 1
+            await asyncio.sleep(delay)
+
+        self.metrics['succeeded'] += 1
+        usage = getattr(message, "usage", None)
+        if usage is not None:
+            self.metrics['input_tokens'] += usage.input_tokens
+            self.metrics['output_tokens'] += usage.output_tokens
+            # Give back (or charge) the difference between estimate and actual use
+            self._token_bucket.consume(usage.input_tokens + usage.output_tokens - token_estimate)
+        return message
+
+    # --- public API ------------------------------------------------------
+
+    def _with_defaults(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        request = dict(request)
+        request.setdefault("model", self.settings.anthropic_model)
+        request.setdefault("max_tokens", self.settings.max_tokens)
+        request.setdefault("temperature", self.settings.temperature)
+        return request
+
+    def submit(self, **request) -> "concurrent.futures.Future":
+        """Schedule a messages.create call and return a future for the Message"""
+        loop = self._ensure_started()
+        request = self._with_defaults(request)
+        return asyncio.run_coroutine_threadsafe(
+            self._call(request, lambda r: self._client.messages.create(**r)), loop
+        )
+
+    def create(self, **request):
+        """Blocking messages.create through the limiter; returns the Message"""
+        return self.submit(**request).result()
+
+    async def create_async(self, **request):
+        """Awaitable messages.create usable from any event loop"""
+        return await asyncio.wrap_future(self.submit(**request))
+
+    def stream(self, on_token: Callable[[str], None], **request):
+        """Blocking streamed call; on_token gets each text delta, returns the final Message
+
+        on_token runs on the gateway loop thread, so it must be thread-safe.
+        A failure before the first text delta is retried as usual; once text
+        has been passed to on_token the call is not retried, since the
+        consumer cannot take those tokens back, and the error propagates.
+        """
+        loop = self._ensure_started()
+        request = self._with_defaults(request)
+
+        parts: List[str] = []
+
+        async def send(r):
+            async with self._client.messages.stream(**r) as stream:
+                async for text in stream.text_stream:
+                    parts.append(text)
+                    on_token(text)
+                return await stream.get_final_message()
+
+        return asyncio.run_coroutine_threadsafe(self._call(request, send, can_retry=lambda: not parts), loop).result()
+
+    def stats(self) -> Dict[str, Any]:
+        """Throughput, retry and limiter counters"""
+        attempts = self.metrics['attempts']
+        return {
+            **self.metrics,
+            'limiter_wait_seconds': round(self.metrics['limiter_wait_seconds'], 3),
+            'latency_seconds': round(self.metrics['latency_seconds'], 3),
+            'average_latency_seconds': round(self.metrics['latency_seconds'] / attempts, 3) if attempts else 0.0,
+            'requests_per_minute_limit': self.settings.llm_requests_per_minute,
+            'tokens_per_minute_limit': self.settings.llm_tokens_per_minute,
+            'max_concurrency': self.settings.llm_max_concurrency
+        }
+
+# Global instance
+llm_gateway = LLMGateway()
@@ -3,7 +3,10 @@ LLM Judge implementation for comparing search result summaries
 """
 from core_services import llm_service
 from models import EvaluationRequest, EvaluationResponse, CriteriaScores
+from typing import Optional
+import json
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
@@ -56,24 +59,19 @@ Provide your evaluation in this exact JSON format:
 Be objective and focus solely on the quality and usefulness of each summary content. Do not make assumptions about the underlying data sources or methods used."""
 
         try:
-            # Get evaluation from Claude
+            # Get evaluation from Claude; only replies that parse are cached
             evaluation_text = self.llm_service.generate_answer(
                 query="Evaluate summaries",
-                context=evaluation_prompt
+                context=evaluation_prompt,
+                cache_site="judge",
+                validate=lambda text: self._parse_evaluation(text) is not None
             )
             
-            # Parse JSON response
-            import json
-            import re
-            
-            # Extract JSON from the response (sometimes LLM adds extra text)
-            json_match = re.search(r'\{.*\}', evaluation_text, re.DOTALL)
-            if json_match:
-                json_text = json_match.group()
-                evaluation_data = json.loads(json_text)
-                return EvaluationResponse(**evaluation_data)
+            evaluation = self._parse_evaluation(evaluation_text)
+            if evaluation is not None:
+                return evaluation
             else:
-                logger.warning("No JSON found in LLM response, using fallback")
+                logger.warning("No valid JSON evaluation in LLM response, using fallback")
                 return self._fallback_evaluation(request)
             
         except Exception as e:
@@ -82,6 +80,18 @@ Be objective and focus solely on the quality and usefulness of each summary cont
             # Fallback to rule-based evaluation
             return self._fallback_evaluation(request)
     
+    @staticmethod
+    def _parse_evaluation(evaluation_text: str) -> Optional[EvaluationResponse]:
+        """Parse the judge's JSON reply, or None if it is missing or malformed"""
+        # Extract JSON from the response (sometimes LLM adds extra text)
+        json_match = re.search(r'\{.*\}', evaluation_text, re.DOTALL)
+        if not json_match:
+            return None
+        try:
+            return EvaluationResponse(**json.loads(json_match.group()))
+        except (ValueError, TypeError):
+            return None
+    
     def _fallback_evaluation(self, request: EvaluationRequest) -> EvaluationResponse:
         """Fallback evaluation logic when LLM fails"""
         
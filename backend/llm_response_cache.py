@@ -0,0 +1,144 @@
+"""
+LLM Response Cache
+
+Persistent, content-addressed cache of Claude responses. The key is a SHA-256
+of everything that determines the output (model, system prompt, messages,
+max_tokens and temperature), so re-running a comparison or evaluation sweep on
+identical inputs is served from disk instead of paying for a new call.
+
+Backed by SQLite with least-recently-used eviction once the entry limit is
+reached. Call sites opt in by name through the LLM_CACHE_SITES setting.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+def request_key(request: Dict[str, Any]) -> str:
+    """SHA-256 over the fields of a Messages API request that affect the output"""
+    material = {
+        "model": request.get("model"),
+        "system": request.get("system"),
+        "messages": request.get("messages"),
+        "max_tokens": request.get("max_tokens"),
+        "temperature": request.get("temperature")
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class LLMResponseCache:
+    """SQLite store of response text keyed by request hash"""
+
+    def __init__(self, db_path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.settings = get_settings()
+        self.db_path = db_path or self.settings.llm_cache_path
+        self.max_entries = max_entries or self.settings.llm_cache_max_entries
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+        self.tokens_saved = {"input_tokens": 0, "output_tokens": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    site TEXT,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    input_tokens INTEGER,
+                    output_tokens INTEGER,
+                    created_at REAL,
+                    last_used REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self._conn = conn
+        return self._conn
+
+    def enabled_for(self, site: Optional[str]) -> bool:
+        """True if caching is on and the call site has opted in"""
+        return bool(site) and self.settings.llm_cache_enabled and site in self.settings.llm_cache_sites
+
+    def get(self, site: str, request: Dict[str, Any]) -> Optional[str]:
+        """Cached response text for request, or None"""
+        key = request_key(request)
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT response, input_tokens, output_tokens FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses[site] += 1
+                return None
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            self.hits[site] += 1
+            self.tokens_saved["input_tokens"] += row[1] or 0
+            self.tokens_saved["output_tokens"] += row[2] or 0
+            return row[0]
+
+    def put(self, site: str, request: Dict[str, Any], response: str,
+            input_tokens: Optional[int] = None, output_tokens: Optional[int] = None):
+        """Store a response, evicting the least recently used entries over the limit"""
+        key = request_key(request)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, site, request.get("model"), response, input_tokens, output_tokens, now, now)
+            )
+            excess = conn.execute("SELECT count(*) FROM responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute("""
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY last_used LIMIT ?
+                    )
+                """, (excess,))
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters per call site and tokens saved"""
+        with self._lock:
+            entries = self._connection().execute("SELECT count(*) FROM responses").fetchone()[0]
+        hits = sum(self.hits.values())
+        lookups = hits + sum(self.misses.values())
+        return {
+            "enabled": self.settings.llm_cache_enabled,
+            "sites": self.settings.llm_cache_sites,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "by_site": {
+                site: {"hits": self.hits[site], "misses": self.misses[site]}
+                for site in set(self.hits) | set(self.misses)
+            },
+            "tokens_saved": dict(self.tokens_saved)
+        }
+
+# Global instance
+llm_response_cache = LLMResponseCache()
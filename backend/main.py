@@ -1,8 +1,10 @@
+import asyncio
 import logging
+import time
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.exceptions import RequestValidationError
 from dotenv import load_dotenv
 
@@ -10,10 +12,17 @@ load_dotenv()
 
 from config import get_settings
 from database import db
-from graphrag_service import graphrag_service
-from traditional_rag_service import traditional_rag_service
+from graphrag_service import graphrag_service, GraphRAGResult
+from traditional_rag_service import traditional_rag_service, TraditionalRAGResult
 from models import SearchQuery, HealthStatus, EvaluationRequest, EvaluationResponse
 from utils import setup_logging, safe_json_serialize
+from embedding_models import get_registry_stats
+from core_services import QueryEmbeddingContext, embedding_service
+from vector_store import chroma_service
+from graph_snapshot import graph_snapshot_store
+from streaming import sse_frame
+from llm_gateway import llm_gateway
+from llm_response_cache import llm_response_cache
 
 # Setup logging
 setup_logging()
@@ -26,6 +35,9 @@ settings = get_settings()
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     logger.info("Starting Knowledge Graph RAG API")
+    db.ensure_fulltext_index()
+    if settings.graph_engine == "memory":
+        await asyncio.to_thread(graph_snapshot_store.reload)
     yield
     logger.info("Shutting down Knowledge Graph RAG API")
     db.close()
@@ -73,29 +85,148 @@ def health_check():
         logger.error(f"Health check failed: {e}")
         raise HTTPException(status_code=500, detail=f"Health check failed: {str(e)}")
 
+@app.get("/stats/embeddings")
+def embedding_stats():
+    """Report loaded embedding models and their resident memory"""
+    return get_registry_stats()
 
+@app.get("/stats/cache")
+def cache_stats():
+    """Report hit/miss counters for the embedding and retrieval caches"""
+    caches = [embedding_service.cache, chroma_service.search_cache]
+    return {
+        "enabled": settings.query_cache_enabled,
+        "caches": [cache.stats() for cache in caches if cache is not None]
+    }
 
+@app.get("/stats/llm")
+def llm_stats():
+    """Report LLM gateway throughput, retries, rate-limiter waits and response cache hits"""
+    return {**llm_gateway.stats(), "response_cache": llm_response_cache.stats()}
 
+@app.get("/stats/graph-snapshot")
+def graph_snapshot_stats():
+    """Report the in-memory graph snapshot size and ingestion epoch"""
+    return graph_snapshot_store.stats()
 
+@app.post("/graph-snapshot/reload")
+def reload_graph_snapshot():
+    """Rebuild the in-memory graph snapshot from Neo4j"""
+    try:
+        snapshot = graph_snapshot_store.reload()
+        return snapshot.stats()
+    except Exception as e:
+        logger.error(f"Graph snapshot reload failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Graph snapshot reload failed: {str(e)}")
+
+@app.post("/graph/degrees")
+def recount_node_degrees():
+    """Recount n.degree for every node, e.g. after loading a graph written by older code"""
+    if not db.update_node_degrees():
+        raise HTTPException(status_code=500, detail="Node degree recount failed")
+    return {"status": "ok", "ingestion_epoch": db.bump_ingestion_epoch()}
+
+def _graphrag_error_result(query: str, message: str) -> GraphRAGResult:
+    """Build an empty GraphRAG result for a failed or timed-out run"""
+    return GraphRAGResult(
+        query=query,
+        graph_entities=[],
+        related_documents=[],
+        knowledge_paths=[],
+        answer=f"GraphRAG search encountered an error: {message}",
+        citations=[],
+        reasoning_trace=["🔍 Starting GraphRAG search", f"❌ Error: {message}"]
+    )
 
+def _traditional_error_result(query: str, message: str) -> TraditionalRAGResult:
+    """Build an empty Traditional RAG result for a failed or timed-out run"""
+    return TraditionalRAGResult(
+        query=query,
+        documents=[],
+        answer=f"Traditional RAG search encountered an error: {message}",
+        citations=[],
+        reasoning_trace=["🔍 Starting Traditional RAG search", f"❌ Error: {message}"],
+        similarity_scores=[]
+    )
+
+async def _run_rag_mode(mode: str, search_fn, error_fn, query: str, **kwargs):
+    """Run one blocking RAG pipeline in a worker thread with its own timeout.
+    
+    Returns a (result, status, elapsed_ms) tuple. A timeout or exception in one
+    mode is converted into an error result so the other mode is unaffected.
+    """
+    timeout = settings.rag_mode_timeout_seconds
+    start = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(
+            asyncio.to_thread(search_fn, query=query, **kwargs),
+            timeout=timeout
+        )
+        status = "ok"
+    except asyncio.TimeoutError:
+        logger.error(f"{mode} search timed out after {timeout}s for query: '{query}'")
+        result = error_fn(query, f"{mode} search timed out after {timeout}s")
+        status = "timeout"
+    except Exception as e:
+        logger.error(f"{mode} search failed: {e}")
+        result = error_fn(query, str(e))
+        status = "error"
+    
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return result, status, elapsed_ms
 
+def _comparison_metrics(graphrag_result: GraphRAGResult,
+                        traditional_result: TraditionalRAGResult,
+                        graphrag_status: str,
+                        traditional_status: str,
+                        graphrag_ms: float,
+                        traditional_ms: float,
+                        total_ms: float) -> dict:
+    """Side-by-side counts, statuses and timings for a comparison"""
+    return {
+        "graphrag_entities": len(graphrag_result.graph_entities),
+        "graphrag_documents": len(graphrag_result.related_documents),
+        "graphrag_paths": len(graphrag_result.knowledge_paths),
+        "traditional_documents": len(traditional_result.documents),
+        "graphrag_answer_length": len(graphrag_result.answer),
+        "traditional_answer_length": len(traditional_result.answer),
+        "graphrag_status": graphrag_status,
+        "traditional_status": traditional_status,
+        "graphrag_time_ms": round(graphrag_ms, 1),
+        "traditional_time_ms": round(traditional_ms, 1),
+        "total_time_ms": round(total_ms, 1)
+    }
 
 @app.post("/compare-rag-modes")
-def compare_rag_modes(search_query: SearchQuery):
+async def compare_rag_modes(search_query: SearchQuery):
     """Compare GraphRAG vs Traditional RAG side-by-side"""
     try:
         logger.info(f"RAG comparison requested: '{search_query.query}' (max_results: {search_query.max_results})")
+        comparison_start = time.perf_counter()
         
-        # Run both searches in parallel
-        graphrag_result = graphrag_service.graphrag_search(
-            query=search_query.query,
-            max_results=search_query.max_results
-        )
+        # Embed the query once and share the vector between both pipelines
+        query_context = QueryEmbeddingContext(search_query.query)
         
-        traditional_result = traditional_rag_service.traditional_rag_search(
-            query=search_query.query,
-            max_results=search_query.max_results
+        # Run both searches in parallel, each isolated with its own timeout
+        (graphrag_result, graphrag_status, graphrag_ms), (traditional_result, traditional_status, traditional_ms) = await asyncio.gather(
+            _run_rag_mode(
+                "GraphRAG",
+                graphrag_service.graphrag_search,
+                _graphrag_error_result,
+                query=search_query.query,
+                max_results=search_query.max_results,
+                query_context=query_context
+            ),
+            _run_rag_mode(
+                "Traditional RAG",
+                traditional_rag_service.traditional_rag_search,
+                _traditional_error_result,
+                query=search_query.query,
+                max_results=search_query.max_results,
+                query_context=query_context
+            )
         )
+        total_ms = (time.perf_counter() - comparison_start) * 1000
         
         # Format comparison response
         comparison_response = {
@@ -118,17 +249,14 @@ def compare_rag_modes(search_query: SearchQuery):
                 "similarity_scores": traditional_result.similarity_scores,
                 "total_sources": len(traditional_result.documents)
             },
-            "comparison_metrics": {
-                "graphrag_entities": len(graphrag_result.graph_entities),
-                "graphrag_documents": len(graphrag_result.related_documents),
-                "graphrag_paths": len(graphrag_result.knowledge_paths),
-                "traditional_documents": len(traditional_result.documents),
-                "graphrag_answer_length": len(graphrag_result.answer),
-                "traditional_answer_length": len(traditional_result.answer)
-            }
+            "comparison_metrics": _comparison_metrics(
+                graphrag_result, traditional_result,
+                graphrag_status, traditional_status,
+                graphrag_ms, traditional_ms, total_ms
+            )
         }
         
-        logger.info(f"RAG comparison completed. GraphRAG: {len(graphrag_result.graph_entities)} entities, {len(graphrag_result.related_documents)} docs. Traditional: {len(traditional_result.documents)} docs")
+        logger.info(f"RAG comparison completed in {total_ms:.0f}ms (GraphRAG {graphrag_ms:.0f}ms, Traditional {traditional_ms:.0f}ms). GraphRAG: {len(graphrag_result.graph_entities)} entities, {len(graphrag_result.related_documents)} docs. Traditional: {len(traditional_result.documents)} docs")
         
         # Safely serialize the response to handle Neo4j DateTime objects
         safe_response = safe_json_serialize(comparison_response)
@@ -138,6 +266,90 @@ def compare_rag_modes(search_query: SearchQuery):
         logger.error(f"RAG comparison failed: {e}")
         raise HTTPException(status_code=500, detail=f"RAG comparison failed: {str(e)}")
 
+@app.post("/compare-rag-modes/stream")
+async def compare_rag_modes_stream(search_query: SearchQuery):
+    """Compare GraphRAG vs Traditional RAG, streaming progress as Server-Sent Events
+    
+    Every frame's data carries a "mode" ("graphrag" or "traditional_rag").
+    Events per mode: trace, entities / paths (GraphRAG only), documents,
+    answer_delta (one per token chunk) and citations last. A mode that fails
+    or times out, including one whose answer stream breaks off after some
+    answer_delta frames, sends an error frame instead of citations. The stream ends with a done
+    frame holding the comparison metrics.
+    """
+    logger.info(f"Streaming RAG comparison requested: '{search_query.query}' (max_results: {search_query.max_results})")
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    def callback(mode: str):
+        # Called from the worker threads; hand events to the event loop in order
+        def on_event(event: str, payload: dict):
+            loop.call_soon_threadsafe(queue.put_nowait, (mode, event, payload))
+        return on_event
+    
+    async def run(mode: str, label: str, search_fn, error_fn, query_context):
+        outcome = await _run_rag_mode(
+            label, search_fn, error_fn,
+            query=search_query.query,
+            max_results=search_query.max_results,
+            query_context=query_context,
+            on_event=callback(mode)
+        )
+        queue.put_nowait((mode, None, outcome))
+    
+    async def events():
+        comparison_start = time.perf_counter()
+        query_context = QueryEmbeddingContext(search_query.query)
+        tasks = [
+            asyncio.create_task(run("graphrag", "GraphRAG", graphrag_service.graphrag_search,
+                                    _graphrag_error_result, query_context)),
+            asyncio.create_task(run("traditional_rag", "Traditional RAG", traditional_rag_service.traditional_rag_search,
+                                    _traditional_error_result, query_context))
+        ]
+        
+        outcomes = {}
+        # Modes that already reported their own error frame (e.g. a stream cut off mid-answer)
+        failed = set()
+        try:
+            while len(outcomes) < len(tasks):
+                mode, event, payload = await queue.get()
+                if mode in outcomes:
+                    # Late event from a mode that already timed out
+                    continue
+                if event is None:
+                    result, status, elapsed_ms = payload
+                    if mode in failed:
+                        status = "error"
+                    elif status != "ok":
+                        yield sse_frame("error", {"mode": mode, "status": status, "answer": result.answer})
+                    outcomes[mode] = (result, status, elapsed_ms)
+                    continue
+                if event == "error":
+                    failed.add(mode)
+                yield sse_frame(event, {"mode": mode, **payload})
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        total_ms = (time.perf_counter() - comparison_start) * 1000
+        graphrag_result, graphrag_status, graphrag_ms = outcomes["graphrag"]
+        traditional_result, traditional_status, traditional_ms = outcomes["traditional_rag"]
+        logger.info(f"Streaming RAG comparison completed in {total_ms:.0f}ms")
+        yield sse_frame("done", {
+            "query": search_query.query,
+            "comparison_metrics": _comparison_metrics(
+                graphrag_result, traditional_result,
+                graphrag_status, traditional_status,
+                graphrag_ms, traditional_ms, total_ms
+            )
+        })
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/evaluate-summaries", response_model=EvaluationResponse)
 def evaluate_summaries(evaluation_request: EvaluationRequest):
     """Evaluate and compare summaries using LLM judge"""
@@ -3,17 +3,14 @@
 Preliminary analysis of the first 10 evaluation results
 """
 
-import json
 from evaluation_metrics import EvaluationAnalyzer
+from evaluation_log import open_evaluation_log
 
 def analyze_preliminary_results():
     """Analyze the first 10 evaluation results"""
     
-    # Load the intermediate results
-    with open('evaluation_results/intermediate_results_10.json', 'r') as f:
-        data = json.load(f)
-    
-    results = data['results']
+    # Load the first 10 results of the latest run
+    results = open_evaluation_log('evaluation_results').results()[:10]
     
     # Add them to the analyzer
     analyzer = EvaluationAnalyzer()
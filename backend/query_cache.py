@@ -0,0 +1,94 @@
+"""
+Bounded LRU + TTL cache used in front of the query encoder and ChromaDB search.
+"""
+
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+def normalize_query(text: str) -> str:
+    """Normalize query text for cache keys (case and whitespace insensitive)"""
+    return " ".join(text.lower().split())
+
+def filter_key(where: Optional[Dict]) -> str:
+    """Stable cache-key representation of a Chroma where filter"""
+    return json.dumps(where, sort_keys=True, default=str) if where else ""
+
+class LRUTTLCache:
+    """Thread-safe, size-bounded LRU cache whose entries expire after a TTL.
+
+    Values are deep-copied on the way in and out so callers can mutate the
+    results they get back without corrupting the cache.
+    """
+
+    def __init__(self, name: str, max_entries: int = 1024, ttl_seconds: float = 3600.0):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.generation = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a copy of the cached value, or None on a miss or expired entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(value)
+
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """Store a copy of value, evicting the least recently used entries.
+
+        If generation is given and the cache was cleared since it was read,
+        the value is stale and is dropped instead of stored.
+        """
+        value = copy.deepcopy(value)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (used when the underlying data changes)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+            self.generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
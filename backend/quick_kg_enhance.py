@@ -40,9 +40,9 @@ def enhance_knowledge_graph_sample(sample_size: int = 50) -> Dict:
     
     # Convert to document format
     documents = []
-    for i, (doc_content, metadata) in enumerate(zip(results['documents'], results['metadatas'])):
+    for i, (doc_id, doc_content, metadata) in enumerate(zip(results['ids'], results['documents'], results['metadatas'])):
         documents.append({
-            'id': f"sample_{i}",
+            'id': doc_id,
             'title': metadata.get('title', f'Document {i}'),
             'content': doc_content,
             'source': metadata.get('source', 'unknown'),
@@ -71,6 +71,7 @@ def enhance_knowledge_graph_sample(sample_size: int = 50) -> Dict:
             'documents_processed': len(documents),
             'entities_extracted': extraction_result['stats']['entities_found'],
             'relationships_extracted': extraction_result['stats']['relationships_found'],
+            'extraction_cache': extraction_result['stats']['cache'],
             'nodes_before': current_nodes,
             'nodes_after': new_nodes,
             'nodes_added': new_nodes - current_nodes,
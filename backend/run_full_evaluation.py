@@ -3,28 +3,28 @@
 Script to run the full comprehensive evaluation
 """
 
+import argparse
 import asyncio
 import logging
+from typing import Optional
 from comprehensive_evaluation_runner import ComprehensiveEvaluationRunner
 from evaluation_queries import get_query_count
 
-async def run_full_evaluation():
+async def run_full_evaluation(resume: bool = False, run_id: Optional[str] = None):
     """Run the full comprehensive evaluation"""
     print(f"Starting comprehensive evaluation with {get_query_count()} queries...")
-    print("This will take approximately 15-20 minutes to complete.")
     
-    runner = ComprehensiveEvaluationRunner(max_concurrent=3)
+    runner = ComprehensiveEvaluationRunner(max_concurrent=8)
     
     # Check backend health
-    health = runner._make_request("GET", f"{runner.base_url}/health")
-    if not health:
+    if not await runner.check_health():
         print("Error: Backend is not running. Please start the backend first.")
         return
     
     print("Backend is healthy. Starting evaluation...")
     
     try:
-        results = await runner.run_comprehensive_evaluation()
+        results = await runner.run_comprehensive_evaluation(run_id=run_id, resume=resume)
         print("\n" + "="*80)
         print("COMPREHENSIVE EVALUATION COMPLETED!")
         print("="*80)
@@ -32,6 +32,7 @@ async def run_full_evaluation():
         print(f"Successful evaluations: {results['successful_evaluations']}")
         print(f"Failed queries: {results['failed_queries']}")
         print(f"Results saved to: {results['output_directory']}")
+        print(f"Run log: {results['evaluation_log']} (run {results['run_id']})")
         
         if results['successful_evaluations'] > 0:
             report = results['report']
@@ -46,6 +47,12 @@ async def run_full_evaluation():
         logging.error(f"Full evaluation error: {e}", exc_info=True)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the GraphRAG vs Traditional RAG evaluation")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue a run from the evaluation log, skipping completed queries")
+    parser.add_argument("--run-id", help="Run to create or resume (default: new run, or the latest when resuming)")
+    args = parser.parse_args()
+    
     # Setup logging
     logging.basicConfig(
         level=logging.INFO,
@@ -56,4 +63,4 @@ if __name__ == "__main__":
         ]
     )
     
-    asyncio.run(run_full_evaluation())
\ No newline at end of file
+    asyncio.run(run_full_evaluation(resume=args.resume, run_id=args.run_id))
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""
+Helpers for streaming RAG pipeline progress over Server-Sent Events.
+
+The RAG services are synchronous and run in worker threads; they report
+progress through a plain callback, on_event(event, payload). StageEmitter
+wraps that callback inside a pipeline and sse_frame formats events for the
+wire.
+"""
+
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+from utils import serialize_for_json
+
+EventCallback = Callable[[str, Dict[str, Any]], None]
+
+def sse_frame(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=serialize_for_json)}\n\n"
+
+class StageEmitter:
+    """Forwards stage results and new reasoning-trace lines to an event callback
+
+    Every call first flushes the reasoning-trace lines added since the last
+    call as a 'trace' event, then sends the stage event itself. With no
+    callback it does nothing, so the non-streaming path is unchanged.
+    """
+
+    def __init__(self, callback: Optional[EventCallback], reasoning_trace: List[str]):
+        self.callback = callback
+        self.reasoning_trace = reasoning_trace
+        self._sent = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.callback is not None
+
+    def __call__(self, event: Optional[str] = None, **payload):
+        if self.callback is None:
+            return
+        steps = self.reasoning_trace[self._sent:]
+        self._sent = len(self.reasoning_trace)
+        if steps:
+            self.callback("trace", {"steps": steps})
+        if event:
+            self.callback(event, serialize_for_json(payload))
+
+    def token(self, text: str):
+        """Send one answer text delta"""
+        if self.callback is not None:
+            self.callback("answer_delta", {"text": text})
@@ -7,12 +7,15 @@ This serves as the baseline for comparison with GraphRAG.
 """
 
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Callable
 from dataclasses import dataclass
 
 from vector_store import chroma_service
-from core_services import llm_service
+from core_services import llm_service, QueryEmbeddingContext
 from utils import serialize_for_json
+from streaming import StageEmitter, EventCallback
+from context_packer import ContextBlock, context_packer
+from config import get_settings
 
 logger = logging.getLogger(__name__)
 
@@ -31,24 +34,35 @@ class TraditionalRAGService:
     
     def __init__(self):
         self.llm_service = llm_service
+        self.settings = get_settings()
     
     def traditional_rag_search(self, 
                               query: str, 
-                              max_results: int = 10) -> TraditionalRAGResult:
+                              max_results: int = 10,
+                              query_context: Optional[QueryEmbeddingContext] = None,
+                              on_event: Optional[EventCallback] = None) -> TraditionalRAGResult:
         """
         Perform traditional RAG search by:
         1. Vector similarity search on documents only
         2. Ranking by cosine similarity
         3. Generating answer from top documents
+        
+        query_context carries the request's query vector so it is only embedded once.
+        If on_event is given, retrieved documents, the reasoning trace and the
+        answer tokens are reported through it as soon as they are available.
         """
         reasoning_trace = ["🔍 Starting Traditional RAG search"]
+        emit = StageEmitter(on_event, reasoning_trace)
+        if query_context is None:
+            query_context = QueryEmbeddingContext(query)
         
         try:
             # Step 1: Perform vector similarity search
             reasoning_trace.append("📊 Step 1: Performing vector similarity search on documents")
             documents = chroma_service.search_documents(
                 query=query,
-                n_results=max_results
+                n_results=max_results,
+                query_embeddings=query_context.embedding
             )
             reasoning_trace.append(f"   Retrieved {len(documents)} documents by vector similarity")
             
@@ -56,6 +70,7 @@ class TraditionalRAGService:
             similarity_scores = [doc.get("similarity", 0.0) for doc in documents]
             avg_similarity = sum(similarity_scores) / len(similarity_scores) if similarity_scores else 0
             reasoning_trace.append(f"   Average similarity score: {avg_similarity:.3f}")
+            emit("documents", documents=documents, similarity_scores=similarity_scores)
             
             # Step 3: Build traditional RAG context (documents only)
             reasoning_trace.append("📝 Step 3: Building context from retrieved documents")
@@ -63,11 +78,18 @@ class TraditionalRAGService:
             
             # Step 4: Generate answer using traditional RAG
             reasoning_trace.append("🤖 Step 4: Generating answer with document-only context")
-            answer = self._generate_traditional_answer(query, context)
+            emit()
+            try:
+                answer = self._generate_traditional_answer(query, context, on_token=emit.token if emit.enabled else None)
+            except Exception as e:
+                # Only the streaming path raises; flag the partial answer as failed
+                emit("error", status="error", answer=f"Error generating traditional RAG answer: {e}")
+                raise
             
             # Step 5: Extract citations
             citations = self._extract_traditional_citations(documents)
             reasoning_trace.append(f"✅ Traditional RAG completed with {len(citations)} citations")
+            emit("citations", citations=citations)
             
             return TraditionalRAGResult(
                 query=query,
@@ -103,38 +125,47 @@ class TraditionalRAGService:
             ""
         ]
         
-        if documents:
+        blocks = []
+        for i, doc in enumerate(documents, 1):
+            metadata = doc.get("metadata", {})
+            title = metadata.get("title", f"Document {i}")
+            similarity = doc.get("similarity", 0.0)
+            
+            header = [f"{title} [Similarity: {similarity:.3f}]"]
+            
+            # Add metadata
+            if metadata.get("authors"):
+                header.append(f"   Authors: {metadata['authors']}")
+            if metadata.get("year"):
+                header.append(f"   Year: {metadata['year']}")
+            if metadata.get("source"):
+                header.append(f"   Source: {metadata['source']}")
+            if metadata.get("type"):
+                header.append(f"   Type: {metadata['type']}")
+            
+            blocks.append(ContextBlock(
+                section="documents",
+                header=header,
+                body=doc.get("content", ""),
+                score=similarity or 0.0
+            ))
+        
+        # Fill the token budget by similarity, cutting the last document at a sentence boundary
+        packed = context_packer(self.settings).pack(blocks).get("documents", [])
+        
+        if packed:
             context_parts.append("RETRIEVED DOCUMENTS:")
-            for i, doc in enumerate(documents, 1):
-                metadata = doc.get("metadata", {})
-                title = metadata.get("title", f"Document {i}")
-                similarity = doc.get("similarity", 0.0)
-                
-                context_parts.append(f"{i}. {title} [Similarity: {similarity:.3f}]")
-                
-                # Add metadata
-                if metadata.get("authors"):
-                    context_parts.append(f"   Authors: {metadata['authors']}")
-                if metadata.get("year"):
-                    context_parts.append(f"   Year: {metadata['year']}")
-                if metadata.get("source"):
-                    context_parts.append(f"   Source: {metadata['source']}")
-                if metadata.get("type"):
-                    context_parts.append(f"   Type: {metadata['type']}")
-                
-                # Add document content
-                content = doc.get("content", "")
-                if len(content) > 1000:
-                    content = content[:1000] + "..."
-                context_parts.append(f"   Content: {content}")
+            for i, block in enumerate(packed, 1):
+                context_parts.extend(block.render(i))
                 context_parts.append("")
         else:
             context_parts.append("No relevant documents found.")
         
         return "\n".join(context_parts)
     
-    def _generate_traditional_answer(self, query: str, context: str) -> str:
-        """Generate answer using traditional RAG approach"""
+    def _generate_traditional_answer(self, query: str, context: str,
+                                     on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Generate answer using traditional RAG approach, streaming tokens to on_token if given"""
         
         system_prompt = """You are a document-based RAG assistant that provides comprehensive answers from retrieved documents using vector similarity search.
 
@@ -154,20 +185,15 @@ Guidelines for document-based responses:
 
 Your goal is to provide the most comprehensive and accurate answer possible using the retrieved document collection."""
 
+        user_content = f"Query: {query}\n\nTraditional RAG Context:\n{context}\n\nProvide an answer based solely on the retrieved documents:"
+        
+        if on_token is not None:
+            # Errors propagate: tokens already streamed are not a complete answer
+            return self.llm_service.stream_completion(user_content, on_token, system=system_prompt,
+                                                       cache_site="traditional_answer")
+        
         try:
-            response = self.llm_service.client.messages.create(
-                model=self.llm_service.settings.anthropic_model,
-                max_tokens=self.llm_service.settings.max_tokens,
-                temperature=self.llm_service.settings.temperature,
-                system=system_prompt,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": f"Query: {query}\n\nTraditional RAG Context:\n{context}\n\nProvide an answer based solely on the retrieved documents:"
-                    }
-                ]
-            )
-            return response.content[0].text
+            return self.llm_service.complete(user_content, system=system_prompt, cache_site="traditional_answer")
         except Exception as e:
             logger.error(f"Error generating traditional RAG answer: {e}")
             return f"Error generating traditional RAG answer: {str(e)}"
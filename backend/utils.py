@@ -1,8 +1,9 @@
 import logging
+import re
 import sys
 import json
 from datetime import datetime, date
-from typing import Dict, Any
+from typing import Dict, Any, List
 from neo4j.time import DateTime, Date, Time
 
 def setup_logging(level: str = "INFO") -> None:
@@ -49,3 +50,34 @@ def safe_json_serialize(data):
     """Safely serialize data to JSON, handling Neo4j types"""
     return json.loads(json.dumps(data, default=serialize_for_json))
 
+
+# Common English stopwords dropped from search terms
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers herself him himself his how i if in into is it its itself
+just me more most my myself no nor not now of off on once only or other our ours ourselves out
+over own same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what when where which
+while who whom why will with would you your yours yourself yourselves
+tell show give find explain describe list latest recent new between versus vs
+""".split())
+
+_LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+def extract_query_terms(query: str) -> List[str]:
+    """Lowercased, de-duplicated query terms with stopwords and 1-char tokens removed"""
+    terms = []
+    for token in re.findall(r"[a-z0-9][a-z0-9+#.\-]*", query.lower()):
+        token = token.strip(".-")
+        if len(token) > 1 and token not in STOPWORDS and token not in terms:
+            terms.append(token)
+    return terms
+
+def lucene_escape(term: str) -> str:
+    """Escape Lucene query syntax characters in a single term"""
+    return _LUCENE_SPECIAL.sub(r"\\\1", term)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (about 4 characters per token for English)"""
+    return max(1, (len(text) + 3) // 4) if text else 0
@@ -1,12 +1,14 @@
 import logging
 import chromadb
 from chromadb.config import Settings
-from typing import List, Dict, Any, Optional
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Any, Optional, Iterable, Iterator
 import uuid
 import os
+import time
 
 from config import get_settings
+from embedding_models import get_embedding_model
+from query_cache import LRUTTLCache, normalize_query, filter_key
 
 logger = logging.getLogger(__name__)
 
@@ -20,8 +22,16 @@ class ChromaDBService:
             settings=Settings(anonymized_telemetry=False)
         )
         
-        # Initialize embedding model
-        self.embedding_model = SentenceTransformer(self.settings.embedding_model_name)
+        # Shared embedding model (one copy per process, see embedding_models)
+        self.embedding_model = get_embedding_model(self.settings.embedding_model_name)
+        
+        # Cache of search results, cleared when this process changes the collection
+        # and keyed on the collection size to catch writes from other processes
+        self.search_cache = LRUTTLCache(
+            "chroma_search",
+            max_entries=self.settings.query_cache_max_entries,
+            ttl_seconds=self.settings.query_cache_ttl_seconds
+        ) if self.settings.query_cache_enabled else None
         
         # Create or get collection
         self.collection = self.client.get_or_create_collection(
@@ -31,6 +41,11 @@ class ChromaDBService:
         
         logger.info("ChromaDB service initialized")
     
+    def _invalidate_search_cache(self):
+        """Drop cached search results after the collection changed"""
+        if self.search_cache is not None:
+            self.search_cache.clear()
+    
     def _get_embedding_function(self):
         """Create embedding function for ChromaDB"""
         class SentenceTransformerEmbeddings:
@@ -46,6 +61,15 @@ class ChromaDBService:
         
         return SentenceTransformerEmbeddings(self.embedding_model)
     
+    def _prepare_metadata(self, title: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the metadata stored alongside a document"""
+        return {
+            "title": title,
+            "type": metadata.get("type", "document"),
+            "source": metadata.get("source", "unknown"),
+            **metadata
+        }
+    
     def add_document(self, 
                     title: str,
                     content: str,
@@ -56,20 +80,13 @@ class ChromaDBService:
             if doc_id is None:
                 doc_id = str(uuid.uuid4())
             
-            # Prepare metadata
-            doc_metadata = {
-                "title": title,
-                "type": metadata.get("type", "document"),
-                "source": metadata.get("source", "unknown"),
-                **metadata
-            }
-            
             # Add to collection
             self.collection.add(
                 documents=[content],
-                metadatas=[doc_metadata],
+                metadatas=[self._prepare_metadata(title, metadata)],
                 ids=[doc_id]
             )
+            self._invalidate_search_cache()
             
             logger.info(f"Added document: {title}")
             return doc_id
@@ -78,17 +95,100 @@ class ChromaDBService:
             logger.error(f"Failed to add document {title}: {e}")
             raise
     
+    def add_documents(self,
+                      documents: Iterable[Dict[str, Any]],
+                      batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """Add many documents, encoding and writing them to ChromaDB in chunks
+        
+        Each document is a dict with 'title', 'content', 'metadata' and an
+        optional 'id'. Embeddings are computed once per chunk with the shared
+        model and each chunk is written with a single collection.add call.
+        """
+        batch_size = batch_size or self.settings.ingest_batch_size
+        max_batch_size = getattr(self.client, "get_max_batch_size", lambda: batch_size)()
+        batch_size = max(1, min(batch_size, max_batch_size))
+        
+        added_ids: List[str] = []
+        failed_count = 0
+        start = time.perf_counter()
+        
+        def flush(chunk: List[Dict[str, Any]]):
+            nonlocal failed_count
+            ids = [doc.get("id") or str(uuid.uuid4()) for doc in chunk]
+            contents = [doc.get("content", "") for doc in chunk]
+            metadatas = [self._prepare_metadata(doc.get("title", ""), doc.get("metadata", {})) for doc in chunk]
+            try:
+                embeddings = self.embedding_model.encode(contents, batch_size=len(chunk)).tolist()
+                self.collection.add(
+                    ids=ids,
+                    documents=contents,
+                    metadatas=metadatas,
+                    embeddings=embeddings
+                )
+                added_ids.extend(ids)
+            except Exception as e:
+                failed_count += len(chunk)
+                logger.error(f"Failed to add batch of {len(chunk)} documents: {e}")
+            
+            elapsed = time.perf_counter() - start
+            logger.info(f"Added {len(added_ids)} documents ({len(added_ids) / elapsed if elapsed else 0:.1f} docs/sec)")
+        
+        chunk: List[Dict[str, Any]] = []
+        for doc in documents:
+            chunk.append(doc)
+            if len(chunk) >= batch_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+        
+        if added_ids:
+            self._invalidate_search_cache()
+        
+        elapsed = time.perf_counter() - start
+        return {
+            "ids": added_ids,
+            "added_count": len(added_ids),
+            "failed_count": failed_count,
+            "batch_size": batch_size,
+            "elapsed_seconds": round(elapsed, 3),
+            "docs_per_second": round(len(added_ids) / elapsed, 1) if elapsed else 0.0
+        }
+    
     def search_documents(self, 
                         query: str, 
                         n_results: int = 10,
-                        where: Optional[Dict] = None) -> List[Dict[str, Any]]:
-        """Search documents in ChromaDB"""
+                        where: Optional[Dict] = None,
+                        query_embeddings: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+        """Search documents in ChromaDB
+        
+        If query_embeddings (the precomputed vector for query) is given, Chroma
+        skips re-encoding the query text.
+        """
         try:
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=n_results,
-                where=where
-            )
+            if self.search_cache is not None:
+                # Other processes (e.g. ingestion scripts) write to the same
+                # collection without clearing this cache, so key on its size too
+                cache_key = (normalize_query(query), self.settings.embedding_model_name, n_results,
+                             filter_key(where), self.collection.count())
+                cache_generation = self.search_cache.generation
+                cached = self.search_cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"Found {len(cached)} documents for query (cached): {query}")
+                    return cached
+            
+            if query_embeddings is not None:
+                results = self.collection.query(
+                    query_embeddings=[query_embeddings],
+                    n_results=n_results,
+                    where=where
+                )
+            else:
+                results = self.collection.query(
+                    query_texts=[query],
+                    n_results=n_results,
+                    where=where
+                )
             
             # Format results
             formatted_results = []
@@ -102,6 +202,9 @@ class ChromaDBService:
                         'similarity': 1 - results['distances'][0][i] if results['distances'] else None
                     })
             
+            if self.search_cache is not None:
+                self.search_cache.put(cache_key, formatted_results, generation=cache_generation)
+            
             logger.info(f"Found {len(formatted_results)} documents for query: {query}")
             return formatted_results
             
@@ -126,10 +229,46 @@ class ChromaDBService:
             logger.error(f"Failed to get document {doc_id}: {e}")
             return None
     
+    def get_documents(self, doc_ids: List[str]) -> List[Dict[str, Any]]:
+        """Fetch documents by ID in one call, in the order given"""
+        if not doc_ids:
+            return []
+        try:
+            results = self.collection.get(ids=list(doc_ids))
+            by_id = {
+                doc_id: {
+                    'id': doc_id,
+                    'content': results['documents'][i],
+                    'metadata': results['metadatas'][i] if results['metadatas'] else {}
+                }
+                for i, doc_id in enumerate(results['ids'])
+            }
+            return [by_id[doc_id] for doc_id in doc_ids if doc_id in by_id]
+            
+        except Exception as e:
+            logger.error(f"Failed to get documents: {e}")
+            return []
+    
+    def iter_documents(self, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Yield every document in the collection, paging through it"""
+        offset = 0
+        while True:
+            results = self.collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+            if not results['ids']:
+                return
+            for i, doc_id in enumerate(results['ids']):
+                yield {
+                    'id': doc_id,
+                    'content': results['documents'][i],
+                    'metadata': results['metadatas'][i] if results['metadatas'] else {}
+                }
+            offset += len(results['ids'])
+    
     def delete_document(self, doc_id: str) -> bool:
         """Delete a document from ChromaDB"""
         try:
             self.collection.delete(ids=[doc_id])
+            self._invalidate_search_cache()
             logger.info(f"Deleted document: {doc_id}")
             return True
             
@@ -145,6 +284,7 @@ class ChromaDBService:
                 name="documents",
                 embedding_function=self._get_embedding_function()
             )
+            self._invalidate_search_cache()
             logger.info("Cleared ChromaDB collection")
             return True
             